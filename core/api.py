@@ -0,0 +1,256 @@
+"""
+API JSON de solo lectura (/api/v1/) para las terminales de venta y el catálogo
+en línea, que antes leían el HTML de inventario.
+
+Recursos: productos (con precios y stock), stock, proveedores y tipos. Todos
+aceptan estos parámetros:
+
+- `cursor`: paginación keyset por id (core.paginacion). La respuesta trae
+  `siguiente`, que es null en la última página.
+- `limit`: filas por página. Por defecto API_POR_PAGINA; máximo API_MAX_POR_PAGINA.
+- `fields=id,nombre,stock`: devuelve solo esas columnas. Un campo de otra tabla
+  (proveedor, tipo, stock) solo agrega su JOIN cuando se pide.
+- `updated_since=<ISO 8601>`: filas con `updated_at` >= esa fecha, incluidos
+  los cambios en las tablas de los campos pedidos. Para la siguiente
+  sincronización se usa el `generado` de la primera página.
+
+Tiene ETag (core.condicional). Mientras no haya escrituras, un sondeo responde
+304 sin consultar las tablas de datos.
+
+Las filas salen de values().iterator() y se escriben en un StreamingHttpResponse,
+así que no se crean instancias de modelos ni se arma la respuesta en memoria
+(con ASGI también, ver core.streaming).
+
+Autenticación: cabecera `Authorization: Token <clave>` (core.models.TokenAPI).
+También vale la sesión de un usuario logueado, para probar desde el navegador.
+"""
+import json
+from datetime import datetime, time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.http import require_safe
+
+from core.condicional import condicional
+from core.models import TokenAPI
+from core.paginacion import PaginaKeyset
+from core.streaming import cuerpo
+from producto.models import Producto, ProductoStock
+from proveedor.models import Proveedor
+from tipologia.models import TipoJoya
+
+FILAS_POR_BLOQUE = 200
+
+
+class Recurso:
+    """
+    `campos` es {nombre público: (ruta en values(), updated_at de su tabla)}.
+    El segundo valor es None para las columnas de la tabla principal.
+    """
+
+    def __init__(self, modelo, campos, espacios):
+        self.modelo = modelo
+        self.campos = campos
+        self.espacios = espacios
+
+
+RECURSOS = {
+    "productos": Recurso(
+        Producto,
+        {
+            "id": ("id", None),
+            "nombre": ("nombre", None),
+            "proveedor_id": ("proveedor_id", None),
+            "proveedor": ("proveedor__nombre", "proveedor__updated_at"),
+            "tipo_id": ("tipo_id", None),
+            "tipo": ("tipo__nombre", "tipo__updated_at"),
+            "costo_unitario": ("costo_unitario", None),
+            "precio_venta_unitario": ("precio_venta_unitario", None),
+            "activo": ("activo", None),
+            "stock": ("existencia__stock", "existencia__updated_at"),
+            "updated_at": ("updated_at", None),
+        },
+        ("catalogo", "compras", "ventas"),
+    ),
+    "stock": Recurso(
+        ProductoStock,
+        {
+            "producto_id": ("producto_id", None),
+            "stock": ("stock", None),
+            "updated_at": ("updated_at", None),
+        },
+        # los productos nuevos crean su fila de stock
+        ("catalogo", "compras", "ventas"),
+    ),
+    "proveedores": Recurso(
+        Proveedor,
+        {
+            "id": ("id", None),
+            "nombre": ("nombre", None),
+            "telefono": ("telefono", None),
+            "updated_at": ("updated_at", None),
+        },
+        ("catalogo",),
+    ),
+    "tipos": Recurso(
+        TipoJoya,
+        {
+            "id": ("id", None),
+            "nombre": ("nombre", None),
+            "updated_at": ("updated_at", None),
+        },
+        ("catalogo",),
+    ),
+}
+
+
+# ---------- Autenticación ----------
+
+def clave_cache_token(clave_hash):
+    return f"api:token:{clave_hash}"
+
+
+def _token_valido(request):
+    tipo, _, clave = request.headers.get("Authorization", "").partition(" ")
+    if tipo.lower() not in ("token", "bearer") or not clave.strip():
+        return False
+    clave_hash = TokenAPI.hashear(clave.strip())
+    valido = cache.get(clave_cache_token(clave_hash))
+    if valido is None:
+        valido = TokenAPI.objects.filter(clave_hash=clave_hash, activo=True).exists()
+        # core.signals borra la entrada al editar o eliminar el token
+        cache.set(clave_cache_token(clave_hash), valido, settings.API_TOKEN_CACHE)
+    return valido
+
+
+def token_requerido(vista):
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if "Authorization" in request.headers:
+            autorizado = _token_valido(request)
+        else:
+            autorizado = request.user.is_authenticated
+        if not autorizado:
+            respuesta = JsonResponse({"error": "Token inválido o ausente."}, status=401)
+            respuesta["WWW-Authenticate"] = 'Token realm="api"'
+            return respuesta
+        return vista(request, *args, **kwargs)
+    return envoltura
+
+
+# ---------- Parámetros ----------
+
+class ParametroInvalido(ValueError):
+    pass
+
+
+def _campos(recurso, valor):
+    if not valor:
+        return list(recurso.campos)
+    pedidos = [c.strip() for c in valor.split(",") if c.strip()]
+    desconocidos = [c for c in pedidos if c not in recurso.campos]
+    if desconocidos or not pedidos:
+        raise ParametroInvalido(
+            f"Campos desconocidos: {', '.join(desconocidos) or '(vacío)'}. "
+            f"Disponibles: {', '.join(recurso.campos)}."
+        )
+    return list(dict.fromkeys(pedidos))
+
+
+def _fecha(valor):
+    if not valor:
+        return None
+    # un "+hh:mm" sin codificar en la URL llega como espacio
+    valor = valor.strip().replace(" ", "+")
+    try:
+        fecha = parse_datetime(valor)
+        if fecha is None:
+            dia = parse_date(valor)
+            fecha = None if dia is None else datetime.combine(dia, time.min)
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        raise ParametroInvalido("updated_since debe ser una fecha ISO 8601.")
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def _limite(valor):
+    if not valor:
+        return settings.API_POR_PAGINA
+    try:
+        limite = int(valor)
+    except ValueError:
+        raise ParametroInvalido("limit debe ser un entero.")
+    return max(1, min(limite, settings.API_MAX_POR_PAGINA))
+
+
+# ---------- Respuesta ----------
+
+def _json(valor):
+    return json.dumps(valor, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":"))
+
+
+def _cuerpo(pagina, columnas, generado):
+    yield '{"generado":%s,"resultados":[' % _json(generado)
+    bloque, primera = [], True
+    for fila in pagina.iterar():
+        bloque.append(_json({nombre: fila[ruta] for nombre, ruta in columnas}))
+        if len(bloque) == FILAS_POR_BLOQUE:
+            yield ("" if primera else ",") + ",".join(bloque)
+            bloque, primera = [], False
+    if bloque:
+        yield ("" if primera else ",") + ",".join(bloque)
+    yield '],"siguiente":%s}' % _json(pagina.siguiente_cursor)
+
+
+def listar(request, recurso):
+    generado = timezone.now()
+    try:
+        nombres = _campos(recurso, request.GET.get("fields"))
+        desde = _fecha(request.GET.get("updated_since"))
+        limite = _limite(request.GET.get("limit"))
+    except ParametroInvalido as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    columnas = [(nombre, recurso.campos[nombre][0]) for nombre in nombres]
+    qs = recurso.modelo.objects.all()
+    if desde is not None:
+        rutas = {"updated_at"} | {recurso.campos[n][1] for n in nombres if recurso.campos[n][1]}
+        filtro = Q()
+        for ruta in sorted(rutas):
+            filtro |= Q(**{f"{ruta}__gte": desde})
+        qs = qs.filter(filtro)
+    # solo las columnas pedidas (y la pk del cursor): sin JOINs de más
+    qs = qs.values("pk", *dict.fromkeys(ruta for _, ruta in columnas))
+
+    pagina = PaginaKeyset(qs, ["pk"], cursor=request.GET.get("cursor"), por_pagina=limite)
+    return StreamingHttpResponse(
+        cuerpo(request, _cuerpo(pagina, columnas, generado)), content_type="application/json"
+    )
+
+
+def _vista(nombre):
+    recurso = RECURSOS[nombre]
+
+    @require_safe
+    @token_requerido
+    @condicional(*recurso.espacios)
+    def vista(request):
+        return listar(request, recurso)
+
+    vista.__name__ = vista.__qualname__ = f"api_{nombre}"
+    return vista
+
+
+productos = _vista("productos")
+stock = _vista("stock")
+proveedores = _vista("proveedores")
+tipos = _vista("tipos")
@@ -0,0 +1,73 @@
+"""
+Usuario del request sin consultas a la BD.
+
+BackendConCache es el ModelBackend de Django con get_user() en caché. El
+usuario se guarda con sus permisos ya calculados, bajo una clave por id en el
+nivel compartido de la caché (core.cache.compartida), sin pasar por el L1 de
+cada worker. Un L1 atrasado serviría durante L1_TIMEOUT segundos el usuario
+anterior, con el hash de contraseña viejo: las sesiones cerradas por un cambio
+de contraseña seguirían valiendo en otros workers, y la sesión nueva se
+cerraría al no coincidir con el hash guardado. Con el L2 en la BD, leer el
+usuario cuesta una consulta a core_cache por request, no a auth_user.
+
+core.signals borra la clave de un usuario cuando cambian su contraseña,
+is_active, is_staff, is_superuser, sus grupos o sus permisos (o los de sus
+grupos), y cuando se elimina. Guardar solo last_login (cada login) no la
+toca. Otros datos (nombre, email) se ven al vencer USUARIO_CACHE_TIMEOUT.
+
+Django sigue comparando el hash de sesión con la contraseña en cada request,
+así que cambiar la contraseña cierra las demás sesiones. Las vistas async
+(request.auser(), p. ej. @login_required sobre el dashboard) pasan por el mismo
+get_user: el aget_user de ModelBackend iría directo a auth_user.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.db import DatabaseError
+
+from core import cache as cache_versionada
+
+logger = logging.getLogger(__name__)
+
+# campos que cambian quién puede entrar o qué puede hacer
+CAMPOS_ACCESO = ("password", "is_active", "is_staff", "is_superuser")
+
+
+def clave_usuario(user_id):
+    return f"usuario:{user_id}"
+
+
+def olvidar(*user_ids):
+    """Borra de la caché los usuarios dados; el próximo request los lee de la BD."""
+    if not user_ids:
+        return
+    try:
+        cache_versionada.compartida().delete_many([clave_usuario(i) for i in user_ids])
+    except (DatabaseError, OSError) as e:
+        logger.warning("No se pudo borrar de la caché a los usuarios %s: %s", user_ids, e)
+
+
+class BackendConCache(ModelBackend):
+
+    def get_user(self, user_id):
+        compartida = cache_versionada.compartida()
+        clave = clave_usuario(user_id)
+        try:
+            usuario = compartida.get(clave)
+        except (DatabaseError, OSError) as e:
+            # sin L2 (p. ej. falta la tabla) se sigue sin caché, como en core.cache
+            logger.warning("Caché de usuarios no disponible: %s", e)
+            return super().get_user(user_id)
+        if usuario is None:
+            usuario = super().get_user(user_id)
+            if usuario is None:
+                return None
+            # deja _perm_cache en el objeto: has_perm() tampoco consulta
+            self.get_all_permissions(usuario)
+            compartida.set(clave, usuario, settings.USUARIO_CACHE_TIMEOUT)
+        return usuario
+
+    async def aget_user(self, user_id):
+        return await sync_to_async(self.get_user)(user_id)
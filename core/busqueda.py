@@ -0,0 +1,150 @@
+"""
+Búsqueda de productos por nombre, sin acentos ni mayúsculas y con índice.
+
+- PostgreSQL: índice GIN pg_trgm sobre f_unaccent(lower(nombre)). Cada palabra
+  debe aparecer como subcadena (LIKE) o parecerse por trigramas (`<%`, tolera
+  errores de tipeo). La relevancia es word_similarity.
+- SQLite: tabla FTS5 `producto_busqueda` (tokenizer unicode61 sin diacríticos),
+  sincronizada por triggers, así que también cubre bulk_create e importaciones.
+  Cada palabra se busca como prefijo ("coraz" encuentra "Corazón"); la
+  relevancia es el bm25 de FTS5.
+- Otros motores: icontains, sin índice.
+
+Las tablas, funciones e índices los crea core/migrations/0004_busqueda_productos.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import BooleanField, Case, CharField, F, FloatField, Func, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower
+
+from producto.models import Producto
+
+_PALABRAS = re.compile(r"\w+", re.UNICODE)
+MAX_PALABRAS = 8
+LIMITE_RELEVANCIA = 200
+
+
+def normalizar(texto):
+    """Minúsculas y sin diacríticos: 'Corazón' -> 'corazon'."""
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def palabras(q):
+    return _PALABRAS.findall(normalizar(q))[:MAX_PALABRAS]
+
+
+# ---------- PostgreSQL ----------
+
+class _SinAcentos(Func):
+    function = "f_unaccent"
+    output_field = CharField()
+
+
+class _Operador(Func):
+    """`a <op> b` como expresión booleana (se puede pasar a filter())."""
+    template = "(%(expressions)s)"
+    output_field = BooleanField()
+
+    def __init__(self, izquierda, operador, derecha):
+        super().__init__(izquierda, derecha)
+        # % literal para el driver
+        self.arg_joiner = f" {operador.replace('%', '%%')} "
+
+
+class _SimilitudPalabra(Func):
+    function = "word_similarity"
+    output_field = FloatField()
+
+
+def _like(palabra):
+    escapada = palabra.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return Value(f"%{escapada}%")
+
+
+def _postgres(queryset, terminos, ordenar, limite):
+    filtro = Q()
+    for palabra in terminos:
+        filtro &= Q(_Operador(F("nombre_busqueda"), "LIKE", _like(palabra))) | Q(
+            _Operador(Value(palabra), "<%", F("nombre_busqueda"))
+        )
+    coincidencias = Producto.objects.annotate(nombre_busqueda=_SinAcentos(Lower("nombre"))).filter(filtro)
+    if not ordenar:
+        return queryset.filter(pk__in=coincidencias.values("pk"))
+
+    relevancia = _SimilitudPalabra(Value(" ".join(terminos)), F("nombre_busqueda"))
+    mejores = coincidencias.annotate(relevancia=relevancia).order_by("-relevancia", "id").values("pk")[:limite]
+    return (
+        queryset.filter(pk__in=mejores)
+        .annotate(relevancia=_SimilitudPalabra(Value(" ".join(terminos)), _SinAcentos(Lower("nombre"))))
+        .order_by("-relevancia", "nombre", "id")
+    )
+
+
+# ---------- SQLite ----------
+
+def _consulta_fts(terminos):
+    return " ".join(f'"{palabra}"*' for palabra in terminos)
+
+
+def _sqlite(queryset, terminos, ordenar, limite):
+    consulta = _consulta_fts(terminos)
+    if not ordenar:
+        return queryset.filter(
+            pk__in=RawSQL("SELECT rowid FROM producto_busqueda WHERE producto_busqueda MATCH %s", [consulta])
+        )
+
+    # bm25 de FTS5 (rank: más negativo = más relevante) de los mejores resultados.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT rowid, -rank FROM producto_busqueda WHERE producto_busqueda MATCH %s "
+            "ORDER BY rank LIMIT %s",
+            [consulta, limite],
+        )
+        puntajes = cursor.fetchall()
+    if not puntajes:
+        return queryset.none().annotate(relevancia=Value(0.0, output_field=FloatField()))
+    return (
+        queryset.filter(pk__in=[pid for pid, _ in puntajes])
+        .annotate(relevancia=Case(
+            *[When(pk=pid, then=Value(puntaje)) for pid, puntaje in puntajes],
+            output_field=FloatField(),
+        ))
+        .order_by("-relevancia", "nombre", "id")
+    )
+
+
+# ---------- API ----------
+
+def buscar_productos(q, queryset=None, ordenar=True, limite=LIMITE_RELEVANCIA):
+    """
+    Productos cuyo nombre coincide con `q`.
+
+    Con `ordenar=True` devuelve solo los `limite` más relevantes, anotados con
+    `relevancia` y ordenados por ella. Con `ordenar=False` filtra sin límite y
+    deja el orden al llamador (p. ej. la paginación de inventario).
+    """
+    if queryset is None:
+        queryset = Producto.objects.all()
+    terminos = palabras(q)
+    if not terminos:
+        return queryset
+    if connection.vendor == "postgresql":
+        return _postgres(queryset, terminos, ordenar, limite)
+    if connection.vendor == "sqlite":
+        return _sqlite(queryset, terminos, ordenar, limite)
+    filtro = Q()
+    for palabra in (q or "").split()[:MAX_PALABRAS]:
+        filtro &= Q(nombre__icontains=palabra)
+    return queryset.filter(filtro)
+
+
+def filtrar_por_producto(queryset, q, campo="producto"):
+    """Filtra cualquier queryset por los productos que coinciden con `q` (subconsulta)."""
+    if not palabras(q):
+        return queryset
+    ids = buscar_productos(q, ordenar=False).values("pk")
+    return queryset.filter(**{f"{campo}__in": ids})
@@ -0,0 +1,295 @@
+"""
+Caché en dos niveles para varios workers de gunicorn.
+
+- L1: LocMemCache del proceso, con TTL corto (segundos).
+- L2: caché compartida entre workers (por defecto la tabla `core_cache` de la BD),
+  configurada como otro alias de CACHES.
+
+Los fragmentos {% cache %} de las tablas usan otra instancia (alias
+"fragmentos", con su propio L1 y su tabla core_cache_fragmentos), para que el
+culling de esa tabla no borre sesiones, usuarios ni versiones.
+
+Las claves que dependen de datos usan espacios versionados (`clave()`): cuando
+se escribe un producto, compra o venta, `invalidar()` cambia la versión en L2 y
+todas las claves viejas dejan de leerse en todos los workers. Como mucho, otro
+worker ve la versión anterior durante L1_TIMEOUT segundos.
+"""
+import logging
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DatabaseError
+
+from core.instrumentacion import registrar_fragmento
+
+logger = logging.getLogger(__name__)
+
+_FALTA = object()
+
+# ---------- Contadores (por proceso) ----------
+
+_contadores_lock = threading.Lock()
+_contadores = {
+    "l1_hits": 0, "l2_hits": 0, "misses": 0, "sets": 0, "errores_l2": 0,
+    "fragmentos_hits": 0, "fragmentos_misses": 0,
+}
+
+# prefijo de las claves de {% cache %} (django.core.cache.utils.make_template_fragment_key)
+PREFIJO_FRAGMENTOS = "template.cache."
+
+
+def _contar(nombre, n=1):
+    with _contadores_lock:
+        _contadores[nombre] += n
+
+
+def estadisticas():
+    with _contadores_lock:
+        datos = dict(_contadores)
+    lecturas = datos["l1_hits"] + datos["l2_hits"] + datos["misses"]
+    datos["hit_ratio"] = round((datos["l1_hits"] + datos["l2_hits"]) / lecturas, 4) if lecturas else None
+    fragmentos = datos["fragmentos_hits"] + datos["fragmentos_misses"]
+    datos["fragmentos_hit_ratio"] = round(datos["fragmentos_hits"] / fragmentos, 4) if fragmentos else None
+    return datos
+
+
+def reiniciar_estadisticas():
+    with _contadores_lock:
+        for k in _contadores:
+            _contadores[k] = 0
+
+
+# ---------- Backend ----------
+
+class CacheEscalonada(BaseCache):
+    """
+    OPTIONS:
+        L2:              alias de CACHES usado como nivel compartido (default "compartida")
+        L1_TIMEOUT:      segundos máximos en memoria del proceso (default 5)
+        L1_MAX_ENTRIES:  tamaño del L1 (default 1000)
+
+    Si L2 falla (p. ej. falta la tabla), se registra y se trata como miss:
+    la app sigue funcionando solo con L1.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        opciones = params.get("OPTIONS", {})
+        self.alias_l2 = opciones.get("L2", "compartida")
+        self.l1_timeout = int(opciones.get("L1_TIMEOUT", 5))
+        self.l1 = LocMemCache(
+            f"l1-{location or 'default'}",
+            {"TIMEOUT": self.l1_timeout, "OPTIONS": {"MAX_ENTRIES": opciones.get("L1_MAX_ENTRIES", 1000)}},
+        )
+
+    @property
+    def l2(self):
+        return caches[self.alias_l2]
+
+    def _timeouts(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        l1 = self.l1_timeout if timeout is None else min(timeout, self.l1_timeout)
+        return timeout, l1
+
+    def _l2(self, metodo, *args, por_defecto=None, **kwargs):
+        try:
+            return getattr(self.l2, metodo)(*args, **kwargs)
+        except (DatabaseError, OSError) as e:
+            _contar("errores_l2")
+            logger.warning("Caché L2 no disponible (%s): %s", metodo, e)
+            return por_defecto
+
+    def get(self, key, default=None, version=None):
+        valor = self._get(key, version)
+        if isinstance(key, str) and key.startswith(PREFIJO_FRAGMENTOS):
+            acierto = valor is not _FALTA
+            _contar("fragmentos_hits" if acierto else "fragmentos_misses")
+            registrar_fragmento(acierto)
+        return default if valor is _FALTA else valor
+
+    def _get(self, key, version):
+        valor = self.l1.get(key, _FALTA, version=version)
+        if valor is not _FALTA:
+            _contar("l1_hits")
+            return valor
+        valor = self._l2("get", key, _FALTA, version=version, por_defecto=_FALTA)
+        if valor is not _FALTA:
+            _contar("l2_hits")
+            self.l1.set(key, valor, self.l1_timeout, version=version)
+            return valor
+        _contar("misses")
+        return _FALTA
+
+    def get_many(self, keys, version=None):
+        encontrados = {}
+        faltan = []
+        for key in keys:
+            valor = self.l1.get(key, _FALTA, version=version)
+            if valor is _FALTA:
+                faltan.append(key)
+            else:
+                encontrados[key] = valor
+        _contar("l1_hits", len(encontrados))
+        if faltan:
+            desde_l2 = self._l2("get_many", faltan, version=version, por_defecto={})
+            _contar("l2_hits", len(desde_l2))
+            _contar("misses", len(faltan) - len(desde_l2))
+            for key, valor in desde_l2.items():
+                self.l1.set(key, valor, self.l1_timeout, version=version)
+            encontrados.update(desde_l2)
+        return encontrados
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout, l1 = self._timeouts(timeout)
+        _contar("sets")
+        self._l2("set", key, value, timeout, version=version)
+        self.l1.set(key, value, l1, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout, l1 = self._timeouts(timeout)
+        _contar("sets", len(data))
+        fallidas = self._l2("set_many", data, timeout, version=version, por_defecto=[])
+        self.l1.set_many(data, l1, version=version)
+        return fallidas
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout, l1 = self._timeouts(timeout)
+        agregado = self._l2("add", key, value, timeout, version=version, por_defecto=False)
+        if agregado:
+            self.l1.set(key, value, l1, version=version)
+        return agregado
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout, l1 = self._timeouts(timeout)
+        self.l1.touch(key, l1, version=version)
+        return self._l2("touch", key, timeout, version=version, por_defecto=False)
+
+    def incr(self, key, delta=1, version=None):
+        self.l1.delete(key, version=version)
+        return self.l2.incr(key, delta, version=version)
+
+    def has_key(self, key, version=None):
+        return self.l1.has_key(key, version=version) or self._l2(
+            "has_key", key, version=version, por_defecto=False
+        )
+
+    def delete(self, key, version=None):
+        self.l1.delete(key, version=version)
+        return self._l2("delete", key, version=version, por_defecto=False)
+
+    def delete_many(self, keys, version=None):
+        self.l1.delete_many(keys, version=version)
+        self._l2("delete_many", keys, version=version)
+
+    def clear(self):
+        self.l1.clear()
+        self._l2("clear")
+
+    def close(self, **kwargs):
+        self._l2("close", **kwargs)
+
+
+# ---------- Espacios versionados ----------
+#
+# catalogo: Producto, Proveedor, TipoJoya
+# compras:  Movimiento
+# ventas:   Venta, PagoVenta
+# tasa:     nueva TasaCambio guardada
+#
+# Los usuarios no van en un espacio: core.autenticacion los guarda por id en
+# el nivel compartido y core.signals borra solo la clave del que cambió.
+#
+# La versión es un timestamp en microsegundos: si la clave se pierde de la
+# caché, la nueva versión nunca coincide con una anterior.
+
+ESPACIOS = ("catalogo", "compras", "ventas", "tasa")
+
+
+def _clave_version(espacio):
+    return f"ver:{espacio}"
+
+
+def _ahora_us():
+    return time.time_ns() // 1000
+
+
+def compartida():
+    """
+    Nivel compartido entre workers: el L2 si la caché por defecto es
+    escalonada, o la propia caché si no lo es.
+    """
+    # caches["default"] y no django.core.cache.cache: ese es un proxy y
+    # isinstance() no ve la clase del backend detrás
+    actual = caches["default"]
+    return actual.l2 if isinstance(actual, CacheEscalonada) else actual
+
+
+def _origen(fresca):
+    return compartida() if fresca else caches["default"]
+
+
+def version(espacio, fresca=False):
+    """Versión actual del espacio. `fresca=True` salta el L1 del proceso."""
+    from django.core.cache import cache
+
+    valor = _origen(fresca).get(_clave_version(espacio))
+    if valor is None:
+        cache.add(_clave_version(espacio), _ahora_us(), None)
+        valor = cache.get(_clave_version(espacio))
+    return valor
+
+
+def versiones(espacios, fresca=False):
+    """{espacio: versión} de varios espacios en una sola lectura (get_many)."""
+    claves = {_clave_version(e): e for e in espacios}
+    try:
+        encontradas = _origen(fresca).get_many(list(claves))
+    except (DatabaseError, OSError):
+        encontradas = {}
+    resultado = {claves[k]: v for k, v in encontradas.items()}
+    for espacio in espacios:
+        if espacio not in resultado:
+            resultado[espacio] = version(espacio, fresca=fresca)
+    return resultado
+
+
+def invalidar(*espacios):
+    """Nueva versión para cada espacio: las claves anteriores quedan huérfanas."""
+    from django.core.cache import cache
+
+    for espacio in espacios:
+        anterior = cache.get(_clave_version(espacio)) or 0
+        cache.set(_clave_version(espacio), max(_ahora_us(), anterior + 1), None)
+
+
+def sello(*espacios, instantanea=None):
+    """
+    Versiones de los espacios en un solo texto, para {% cache %} en plantillas.
+
+    `instantanea` es un {espacio: versión} ya leído, normalmente el del ETag
+    del request (core.condicional.versiones_del_request). Sin ella se leen
+    frescas de L2: el L1 de este proceso puede ir atrasado.
+    """
+    if instantanea is None:
+        instantanea = versiones(espacios, fresca=True)
+    return ".".join(str(instantanea[e]) for e in espacios)
+
+
+def clave(espacios, *partes, instantanea=None, fresca=False):
+    """
+    Clave que cambia sola cuando cambia cualquiera de los espacios.
+
+    Con `instantanea` la clave usa esas versiones. Con `fresca=True` se leen
+    de L2 (para contenido que se sirve bajo un ETag, ver sello()).
+    """
+    if isinstance(espacios, str):
+        espacios = (espacios,)
+    if instantanea is None:
+        instantanea = versiones(espacios, fresca=fresca)
+    texto = ".".join(str(instantanea[e]) for e in espacios)
+    sufijo = ":".join(str(p) for p in partes)
+    return f"{'+'.join(espacios)}:{texto}:{sufijo}"
@@ -0,0 +1,173 @@
+"""
+Carga concurrente de lecturas y escrituras sobre copias de una BD SQLite, para
+comparar el perfil por defecto con SQLITE_PRODUCCION_OPCIONES (settings).
+
+Cada perfil trabaja sobre su propia copia, hecha con la API de backup de
+SQLite, así la BD real no se toca. Hay dos tipos de hilos:
+
+- Lectores: lo que hace el dashboard, sumas sobre el libro de stock y un
+  conteo de productos.
+- Escritores: lo que hace una venta, leer el stock de un producto y
+  actualizarlo dentro de una transacción.
+
+Se cuentan las operaciones completadas, su latencia y los errores "database
+is locked".
+"""
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from copy import deepcopy
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from producto.models import Producto, ProductoStock
+from proveedor.models import Proveedor
+from tipologia.models import TipoJoya
+
+PRODUCTOS_MINIMOS = 200
+
+
+def perfiles():
+    """{nombre: OPTIONS de la conexión}: el de Django por defecto y el de producción."""
+    return {
+        "por_defecto": {},
+        "produccion": dict(settings.SQLITE_PRODUCCION_OPCIONES),
+    }
+
+
+def _copiar(origen, destino, journal_mode):
+    import sqlite3
+
+    copia = sqlite3.connect(destino)
+    try:
+        origen.backup(copia)
+        # el modo WAL queda guardado en el archivo: cada copia arranca en el suyo
+        copia.execute(f"PRAGMA journal_mode={journal_mode}")
+    finally:
+        copia.close()
+
+
+def _registrar(alias, nombre_bd, opciones):
+    ajustes = deepcopy(connections["default"].settings_dict)
+    ajustes.update(NAME=nombre_bd, OPTIONS=opciones, CONN_MAX_AGE=0)
+    connections.settings[alias] = ajustes
+
+
+def _preparar(alias):
+    """Asegura productos con fila de stock en la copia (sin señales: bulk_create)."""
+    ids = list(ProductoStock.objects.using(alias).values_list("producto_id", flat=True)[:PRODUCTOS_MINIMOS])
+    if len(ids) >= PRODUCTOS_MINIMOS:
+        return ids
+    proveedor, _ = Proveedor.objects.using(alias).get_or_create(nombre="Proveedor carga")
+    tipo, _ = TipoJoya.objects.using(alias).get_or_create(nombre="Tipo carga")
+    nuevos = Producto.objects.using(alias).bulk_create([
+        Producto(nombre=f"Carga {i}", proveedor=proveedor, tipo=tipo, costo_unitario=Decimal("1.00"))
+        for i in range(PRODUCTOS_MINIMOS - len(ids))
+    ])
+    ProductoStock.objects.using(alias).bulk_create([
+        ProductoStock(producto_id=p.pk, cantidad_entrada=1000, stock=1000, valor_costo=Decimal("1000.00"))
+        for p in nuevos
+    ])
+    return list(ProductoStock.objects.using(alias).values_list("producto_id", flat=True)[:PRODUCTOS_MINIMOS])
+
+
+def _leer(alias, rng, ids):
+    ProductoStock.objects.using(alias).aggregate(valor=Sum("valor_costo"), unidades=Sum("stock"))
+    Producto.objects.using(alias).aggregate(n=Count("id"))
+
+
+def _escribir(alias, rng, ids):
+    pid = rng.choice(ids)
+    with transaction.atomic(using=alias):
+        filas = ProductoStock.objects.using(alias).filter(producto_id=pid)
+        actual = filas.values_list("stock", flat=True).first()
+        # +1/-1 alternados: el stock de la copia no se va a negativo
+        delta = -1 if actual and rng.random() < 0.5 else 1
+        filas.update(stock=F("stock") + delta, updated_at=timezone.now())
+
+
+def _hilo(alias, operacion, ids, hasta, semilla, resultado, lock):
+    rng = random.Random(semilla)
+    latencias, bloqueos, otros = [], 0, 0
+    try:
+        while time.perf_counter() < hasta:
+            inicio = time.perf_counter()
+            try:
+                operacion(alias, rng, ids)
+            except OperationalError as e:
+                if "locked" in str(e) or "busy" in str(e):
+                    bloqueos += 1
+                else:
+                    otros += 1
+                continue
+            latencias.append((time.perf_counter() - inicio) * 1000)
+    finally:
+        connections[alias].close()
+        with lock:
+            resultado["latencias"].extend(latencias)
+            resultado["bloqueos"] += bloqueos
+            resultado["otros_errores"] += otros
+
+
+def _resumen(datos, segundos):
+    latencias = datos["latencias"]
+    return {
+        "operaciones": len(latencias),
+        "por_segundo": round(len(latencias) / segundos, 1),
+        "p50_ms": round(statistics.median(latencias), 2) if latencias else None,
+        "p95_ms": round(statistics.quantiles(latencias, n=20)[-1], 2) if len(latencias) > 1 else None,
+        "database_is_locked": datos["bloqueos"],
+        "otros_errores": datos["otros_errores"],
+    }
+
+
+def medir_perfil(nombre, opciones, segundos=5.0, lectores=4, escritores=2, directorio=None):
+    """Corre la carga mixta sobre una copia de la BD con las `opciones` dadas."""
+    if connection.vendor != "sqlite":
+        raise ValueError("La carga de SQLite solo corre con una BD SQLite.")
+    alias = f"carga_{nombre}"
+    with tempfile.TemporaryDirectory(dir=directorio) as carpeta:
+        nombre_bd = os.path.join(carpeta, f"{nombre}.sqlite3")
+        journal = "wal" if "journal_mode=WAL" in opciones.get("init_command", "") else "delete"
+        connection.ensure_connection()
+        _copiar(connection.connection, nombre_bd, journal)
+        _registrar(alias, nombre_bd, opciones)
+        try:
+            ids = _preparar(alias)
+            connections[alias].close()
+
+            lock = threading.Lock()
+            lecturas = {"latencias": [], "bloqueos": 0, "otros_errores": 0}
+            escrituras = {"latencias": [], "bloqueos": 0, "otros_errores": 0}
+            hasta = time.perf_counter() + segundos
+            hilos = [
+                threading.Thread(target=_hilo, args=(alias, _leer, ids, hasta, i, lecturas, lock))
+                for i in range(lectores)
+            ] + [
+                threading.Thread(target=_hilo, args=(alias, _escribir, ids, hasta, 1000 + i, escrituras, lock))
+                for i in range(escritores)
+            ]
+            for h in hilos:
+                h.start()
+            for h in hilos:
+                h.join()
+        finally:
+            connections[alias].close()
+            del connections.settings[alias]
+
+    return {
+        "perfil": nombre,
+        "opciones": opciones,
+        "segundos": segundos,
+        "lectores": lectores,
+        "escritores": escritores,
+        "lecturas": _resumen(lecturas, segundos),
+        "escrituras": _resumen(escrituras, segundos),
+    }
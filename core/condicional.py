@@ -0,0 +1,114 @@
+"""
+GET condicional (ETag / Last-Modified) para páginas que se recargan todo el día.
+
+El ETag sale de las versiones de los espacios de caché (core.cache), que cambian
+con cada escritura de Producto, Proveedor, TipoJoya, Movimiento, Venta o
+PagoVenta, más los parámetros de la URL y el usuario. Si el navegador manda un
+If-None-Match que coincide, se responde 304 antes de ejecutar la vista: la
+única lectura es la de las versiones en L2 (una consulta a core_cache con el
+L2 en la BD) y no se renderiza la plantilla.
+
+No se responde 304 cuando hay mensajes pendientes (messages framework): la
+página tiene que mostrarse para consumirlos.
+
+Las versiones con las que se armó el ETag quedan en el request. La vista las
+usa (versiones_del_request) para las claves de lo que saca de caché, como los
+fragmentos de tabla o los reportes. Así el contenido y el ETag salen de la
+misma lectura: un L1 atrasado no puede dejar contenido viejo bajo un ETag nuevo.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from core import cache as cache_versionada
+
+
+def _leer_versiones(request, espacios):
+    """Lee de L2 las versiones de los espacios y las deja en el request."""
+    leidas = cache_versionada.versiones(espacios, fresca=True)
+    request.versiones_cache = {**getattr(request, "versiones_cache", {}), **leidas}
+    return leidas
+
+
+def versiones_del_request(request, *espacios):
+    """
+    {espacio: versión} con el que se validó el ETag de este request. Si la
+    vista no pasó por @condicional para alguno de los espacios, se leen
+    frescas de L2 y se guardan para el resto del request.
+    """
+    guardadas = getattr(request, "versiones_cache", {})
+    if all(e in guardadas for e in espacios):
+        return {e: guardadas[e] for e in espacios}
+    return _leer_versiones(request, espacios)
+
+
+def _firma(request, espacios, extra):
+    """(etag, last_modified) o None si la petición no admite 304."""
+    versiones = _leer_versiones(request, espacios)
+    if request.method not in ("GET", "HEAD") or len(get_messages(request)):
+        return None
+    partes = [
+        request.resolver_match.view_name if request.resolver_match else request.path,
+        ",".join(f"{e}={versiones[e]}" for e in espacios),
+        request.GET.urlencode(),
+        str(request.user.pk),
+        # el HTML lleva el token CSRF: si la cookie cambia, la página también
+        request.COOKIES.get("csrftoken", ""),
+    ]
+    if extra is not None:
+        partes.append(str(extra(request)))
+    etag = '"%s"' % hashlib.sha1("|".join(partes).encode()).hexdigest()
+    # las versiones son microsegundos desde epoch (core.cache)
+    return etag, max(versiones.values()) // 1_000_000
+
+
+def _no_modificado(request, firma):
+    etag, ultima = firma
+    return get_conditional_response(request, etag=etag, last_modified=ultima)
+
+
+def _cabeceras(respuesta, firma):
+    if firma is None:
+        return respuesta
+    etag, ultima = firma
+    if respuesta.status_code == 200:
+        respuesta.headers.setdefault("ETag", etag)
+        respuesta.headers.setdefault("Last-Modified", http_date(ultima))
+    # siempre revalidar con el servidor; nunca en cachés compartidas
+    patch_cache_control(respuesta, private=True, no_cache=True)
+    patch_vary_headers(respuesta, ("Cookie",))
+    return respuesta
+
+
+def condicional(*espacios, extra=None):
+    """
+    Decorador para vistas GET que dependen de los espacios dados, p. ej.
+    @condicional("catalogo", "compras"). `extra(request)` agrega al ETag datos
+    que cambian sin escrituras (como el vencimiento de la tasa).
+    Funciona con vistas síncronas y async.
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura(request, *args, **kwargs):
+                firma = await sync_to_async(_firma)(request, espacios, extra)
+                if firma is not None:
+                    no_modificado = _no_modificado(request, firma)
+                    if no_modificado is not None:
+                        return _cabeceras(no_modificado, firma)
+                return _cabeceras(await vista(request, *args, **kwargs), firma)
+        else:
+            @wraps(vista)
+            def envoltura(request, *args, **kwargs):
+                firma = _firma(request, espacios, extra)
+                if firma is not None:
+                    no_modificado = _no_modificado(request, firma)
+                    if no_modificado is not None:
+                        return _cabeceras(no_modificado, firma)
+                return _cabeceras(vista(request, *args, **kwargs), firma)
+        return envoltura
+    return decorador
@@ -0,0 +1,145 @@
+"""
+Datos del dashboard, cargados en paralelo.
+
+Cada componente (conteos, dinero en stock, vendido, deuda, productos, tasa) es
+una función síncrona independiente. `cargar()` los corre a la vez con
+asyncio.gather en hilos del pool de asgiref, cada uno con su propia conexión a
+la BD, y con un timeout por componente: la espera total es la del más lento,
+no la suma de todos. Un componente que falla o se pasa del tiempo queda en
+None y la plantilla lo muestra como "no disponible" en vez de un 0.
+
+Los hilos son de un pool propio del proceso (DASHBOARD_HILOS): con WSGI cada
+request crea su event loop, y el pool por defecto del loop esperaría al
+componente lento al cerrarse. Un hilo que se pasó del timeout no se puede
+cancelar: termina su consulta en segundo plano, con su conexión a la BD, y su
+resultado se descarta.
+
+Para que esos hilos no llenen el pool, un componente solo se lanza si hay un
+hilo libre (`_libres`, que se devuelve cuando la función termina de verdad, no
+al vencer el timeout). Si no lo hay, queda en None en el acto en vez de
+esperar en la cola detrás de consultas lentas. Así el dashboard nunca tiene
+más de DASHBOARD_HILOS consultas ni conexiones abiertas por proceso; ese
+número hay que contarlo en DB_POOL_MAX / max_connections.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Sum
+
+from core import instrumentacion
+from core.services import obtener_tasa
+from movimiento.models import Venta, VentaDiaria
+from producto.models import Producto, ProductoStock
+from proveedor.models import Proveedor
+
+logger = logging.getLogger(__name__)
+
+PRODUCTOS_RECIENTES = 15
+
+_pool = ThreadPoolExecutor(max_workers=settings.DASHBOARD_HILOS, thread_name_prefix="dashboard")
+_libres = threading.BoundedSemaphore(settings.DASHBOARD_HILOS)
+
+
+def _productos():
+    return list(Producto.objects.select_related("proveedor").order_by("nombre")[:PRODUCTOS_RECIENTES])
+
+
+def _total_productos():
+    return Producto.objects.count()
+
+
+def _total_proveedores():
+    return Proveedor.objects.count()
+
+
+def _dinero_stock():
+    # SUM(max(stock, 0) * costo_unitario), ya calculado por fila en el libro de stock
+    return ProductoStock.objects.aggregate(s=Sum("valor_costo"))["s"] or Decimal("0.00")
+
+
+def _dinero_vendido():
+    return VentaDiaria.objects.aggregate(s=Sum("ingresos"))["s"] or Decimal("0.00")
+
+
+def _dinero_deuda():
+    # Solo ventas a plazos con saldo abierto
+    return Venta.objects.filter(a_plazos=True, saldo__gt=0).aggregate(s=Sum("saldo"))["s"] or Decimal("0.00")
+
+
+def _tasa():
+    # Nunca espera a dolarapi (core.services.obtener_tasa); puede ser None.
+    return obtener_tasa()
+
+
+# nombre -> (función, timeout en segundos; None usa DASHBOARD_TIMEOUT)
+COMPONENTES = {
+    "productos": (_productos, None),
+    "total_productos": (_total_productos, None),
+    "total_proveedores": (_total_proveedores, None),
+    "dinero_stock_usd": (_dinero_stock, None),
+    "dinero_vendido_usd": (_dinero_vendido, None),
+    "dinero_deuda_usd": (_dinero_deuda, None),
+    "tasa": (_tasa, 1.0),
+}
+
+
+def _en_hilo(funcion, medicion):
+    """Corre `funcion` en un hilo del pool, midiendo sus consultas si hay medición activa."""
+    def _correr():
+        try:
+            if medicion is None:
+                return funcion()
+            with connection.execute_wrapper(medicion.envoltorio):
+                return funcion()
+        finally:
+            # Mismo trato que al terminar un request: respeta CONN_MAX_AGE.
+            close_old_connections()
+    return _correr
+
+
+async def _cargar_componente(nombre, funcion, timeout, medicion):
+    if not _libres.acquire(blocking=False):
+        logger.warning("Dashboard: %s sin hilo libre (DASHBOARD_HILOS ocupados)", nombre)
+        return None
+    try:
+        # con las contextvars del request, como haría sync_to_async
+        futuro = _pool.submit(contextvars.copy_context().run, _en_hilo(funcion, medicion))
+    except BaseException:
+        _libres.release()
+        raise
+    # al terminar o cancelarse (si nunca llegó a correr), no al vencer el timeout
+    futuro.add_done_callback(lambda _: _libres.release())
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(futuro), timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Dashboard: %s no respondió en %.1fs", nombre, timeout)
+    except Exception:
+        logger.exception("Dashboard: falló %s", nombre)
+    return None
+
+
+async def cargar(componentes=None):
+    """
+    {nombre: valor} de todos los componentes; None si falló o no llegó a
+    tiempo. `no_disponibles` lista los que quedaron en None, salvo la tasa
+    (que puede no existir todavía).
+    """
+    componentes = componentes or COMPONENTES
+    por_defecto = settings.DASHBOARD_TIMEOUT
+    medicion = instrumentacion.actual()
+    nombres = list(componentes)
+    valores = await asyncio.gather(*[
+        _cargar_componente(nombre, funcion, timeout or por_defecto, medicion)
+        for nombre, (funcion, timeout) in componentes.items()
+    ])
+    datos = dict(zip(nombres, valores))
+    datos["no_disponibles"] = [
+        n for n, v in datos.items() if v is None and n != "tasa"
+    ]
+    return datos
@@ -0,0 +1,106 @@
+"""
+Exportaciones CSV en streaming.
+
+Las filas salen de `values_list(...).iterator(chunk_size=...)` y se escriben
+una a una en un StreamingHttpResponse: la memoria no crece con el tamaño de la
+tabla y el primer byte sale en cuanto llega el primer bloque de la BD (en
+PostgreSQL, iterator() usa un cursor del lado del servidor).
+
+Con ASGI el cuerpo pasa por core.streaming, que lo mantiene por partes.
+
+Los montos van en USD y en Bs con la última tasa guardada; sin tasa, las
+columnas en Bs quedan vacías.
+"""
+import csv
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from core.streaming import cuerpo
+
+CHUNK_SIZE = 2000
+_Q = Decimal("0.01")
+
+
+class _Eco:
+    """Pseudo-buffer: csv.writer escribe y la fila se devuelve tal cual."""
+
+    def write(self, valor):
+        return valor
+
+
+def _celda(valor):
+    # Evita que Excel interprete un texto como fórmula.
+    if isinstance(valor, str) and valor[:1] in ("=", "+", "-", "@"):
+        return "'" + valor
+    return valor
+
+
+def _bs(monto, tasa):
+    if tasa is None or monto is None:
+        return ""
+    return (monto * tasa).quantize(_Q)
+
+
+def respuesta_csv(request, nombre, filas):
+    """`filas` es un iterable cuya primera fila es el encabezado."""
+    escritor = csv.writer(_Eco())
+
+    def _contenido():
+        yield "\ufeff"  # BOM para que Excel lea bien los acentos
+        for fila in filas:
+            yield escritor.writerow([_celda(v) for v in fila])
+
+    fecha = timezone.localtime().strftime("%Y%m%d-%H%M")
+    respuesta = StreamingHttpResponse(cuerpo(request, _contenido()), content_type="text/csv; charset=utf-8")
+    respuesta["Content-Disposition"] = f'attachment; filename="{nombre}-{fecha}.csv"'
+    return respuesta
+
+
+# ---------- Filas por listado ----------
+
+def filas_inventario(productos, tasa):
+    campos = (
+        "id", "nombre", "proveedor__nombre", "tipo__nombre", "stock", "costo_prom",
+        "costo_unitario", "precio_venta_unitario", "existencia__valor_costo",
+    )
+    yield ["id", "producto", "proveedor", "tipo", "stock", "costo_prom_usd", "costo_unitario_usd",
+           "precio_venta_usd", "valor_costo_usd", "valor_costo_bs"]
+    for pid, nombre, prov, tipo, stock, costo_prom, costo, venta, valor in (
+        productos.order_by("nombre", "id").values_list(*campos).iterator(chunk_size=CHUNK_SIZE)
+    ):
+        valor = valor or Decimal("0.00")
+        costo_prom = Decimal(costo_prom).quantize(_Q) if costo_prom is not None else ""
+        yield [pid, nombre, prov, tipo, stock, costo_prom, costo, venta, valor, _bs(valor, tasa)]
+
+
+def filas_compras(compras, tasa):
+    campos = (
+        "id", "fecha", "producto__nombre", "producto__proveedor__nombre", "producto__tipo__nombre",
+        "cantidad", "precio_unitario", "nota",
+    )
+    yield ["id", "fecha", "producto", "proveedor", "tipo", "cantidad", "precio_unitario_usd",
+           "total_usd", "total_bs", "nota"]
+    for mid, fecha, prod, prov, tipo, cantidad, precio, nota in (
+        compras.order_by("-fecha", "-id").values_list(*campos).iterator(chunk_size=CHUNK_SIZE)
+    ):
+        total = (precio or Decimal("0.00")) * cantidad
+        yield [mid, timezone.localtime(fecha).strftime("%Y-%m-%d %H:%M"), prod, prov, tipo,
+               cantidad, precio, total, _bs(total, tasa), nota]
+
+
+def filas_ventas(ventas, tasa):
+    campos = (
+        "id", "fecha", "producto__nombre", "producto__proveedor__nombre", "cantidad",
+        "precio_unitario", "a_plazos", "monto_pagado", "saldo", "nota",
+    )
+    yield ["id", "fecha", "producto", "proveedor", "cantidad", "precio_unitario_usd", "total_usd",
+           "total_bs", "a_plazos", "pagado_usd", "saldo_usd", "saldo_bs", "nota"]
+    for vid, fecha, prod, prov, cantidad, precio, a_plazos, pagado, saldo, nota in (
+        ventas.order_by("-fecha", "-id").values_list(*campos).iterator(chunk_size=CHUNK_SIZE)
+    ):
+        total = (precio or Decimal("0.00")) * cantidad
+        yield [vid, timezone.localtime(fecha).strftime("%Y-%m-%d %H:%M"), prod, prov, cantidad,
+               precio, total, _bs(total, tasa), "si" if a_plazos else "no", pagado, saldo,
+               _bs(saldo, tasa), nota]
@@ -1,12 +1,11 @@
 from django import forms
 from decimal import Decimal
 from django.core.exceptions import ValidationError
-from django.db.models import Sum
 
 import producto
 from proveedor.models import Proveedor
 from tipologia.models import TipoJoya
-from producto.models import Producto
+from producto.models import Producto, ProductoStock
 from movimiento.models import Movimiento, Venta, PagoVenta
 
 
@@ -102,12 +101,13 @@ class VentaForm(forms.ModelForm):
         cantidad = cleaned.get("cantidad")
 
         if producto and cantidad:
-            entradas = Movimiento.objects.filter(producto=producto, tipo="IN", anulada=False).aggregate(s=Sum("cantidad"))["s"] or 0
-            salidas = Venta.objects.filter(producto=producto).aggregate(s=Sum("cantidad"))["s"] or 0
-            stock = int(entradas) - int(salidas)
-
-        if cantidad > stock:
-            raise ValidationError(f"Stock insuficiente. Disponible: {stock}")
+            # Una sola fila del libro de stock en vez de agregar compras y ventas.
+            stock = (
+                ProductoStock.objects.filter(producto=producto).values_list("stock", flat=True).first()
+                or 0
+            )
+            if cantidad > stock:
+                raise ValidationError(f"Stock insuficiente. Disponible: {stock}")
         return cleaned
 
 
@@ -197,3 +197,34 @@ class CompraUnificadaForm(forms.Form):
         )
 
         return producto, mov
+
+
+class ImportarComprasForm(forms.Form):
+    archivo = forms.FileField(label="Archivo (.csv o .xlsx)")
+    crear_catalogo = forms.BooleanField(
+        required=False,
+        initial=False,
+        label="Crear proveedores y tipos que no existan",
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _bootstrapify(self)
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data["archivo"]
+        if not archivo.name.lower().endswith((".csv", ".txt", ".xlsx")):
+            raise ValidationError("Usa un archivo .csv o .xlsx.")
+        return archivo
+
+
+class RangoFechasForm(forms.Form):
+    desde = forms.DateField(required=False, label="Desde", widget=forms.DateInput(attrs={"type": "date"}))
+    hasta = forms.DateField(required=False, label="Hasta", widget=forms.DateInput(attrs={"type": "date"}))
+
+    def clean(self):
+        datos = super().clean()
+        desde, hasta = datos.get("desde"), datos.get("hasta")
+        if desde and hasta and desde > hasta:
+            raise ValidationError("La fecha inicial no puede ser posterior a la final.")
+        return datos
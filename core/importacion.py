@@ -0,0 +1,325 @@
+"""
+Importación masiva de compras desde CSV o XLSX (nota de entrega del proveedor).
+
+El archivo se lee fila por fila y se procesa en lotes. Por lote:
+
+- una consulta para Proveedor, una para TipoJoya y una para Producto (por nombre);
+- los productos nuevos o con costo/precio distinto se escriben con un solo
+  bulk_create(update_conflicts=...) sobre `uniq_producto_por_proveedor_tipo`;
+- las compras se insertan con bulk_create y el libro de stock se ajusta con un
+  solo UPDATE (core.stock.aplicar_deltas).
+
+Cada lote va en su propia transacción. Las filas con errores no se importan y
+se devuelven en el reporte; el resto del lote sí.
+
+Columnas (la primera fila es el encabezado):
+    nombre, proveedor, tipo, cantidad, precio_unitario
+    opcionales: costo_unitario, precio_venta_unitario, nota
+
+Si un producto nuevo no trae costo_unitario se usa el precio de compra.
+
+Los CSV pueden venir en UTF-8 o en Windows-1252 (lo que guarda Excel en
+Windows). La codificación se decide recorriendo el archivo antes de importar.
+"""
+import codecs
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from core import stock
+from core import cache as cache_versionada
+from movimiento.models import Movimiento
+from producto.models import Producto, ProductoStock
+from proveedor.models import Proveedor
+from tipologia.models import TipoJoya
+
+COLUMNAS_REQUERIDAS = ("nombre", "proveedor", "tipo", "cantidad", "precio_unitario")
+COLUMNAS_OPCIONALES = ("costo_unitario", "precio_venta_unitario", "nota")
+TAMANO_LOTE = 500
+CODIFICACIONES = ("utf-8-sig", "cp1252")
+
+
+class ErrorImportacion(Exception):
+    """El archivo completo no se puede leer (formato, encabezado, dependencia)."""
+
+
+class ResultadoImportacion:
+    def __init__(self):
+        self.filas = 0
+        self.compras = 0
+        self.productos_nuevos = 0
+        self.productos_actualizados = 0
+        self.errores = []  # [(numero_de_fila, mensaje)]
+
+    def agregar_error(self, fila, mensaje):
+        self.errores.append((fila, mensaje))
+
+    @property
+    def ok(self):
+        return not self.errores
+
+
+# ---------- Lectura ----------
+
+def _normalizar_encabezado(valor):
+    return str(valor or "").strip().lower().replace(" ", "_")
+
+
+def _codificacion(archivo):
+    """
+    La primera de CODIFICACIONES que decodifica el archivo completo. Se revisa
+    antes de importar: un error de decodificación a mitad del archivo dejaría
+    los lotes anteriores ya guardados.
+    """
+    primer_error = None
+    for nombre in CODIFICACIONES:
+        decodificador = codecs.getincrementaldecoder(nombre)()
+        fila = 1
+        try:
+            for bloque in iter(lambda: archivo.read(64 * 1024), b""):
+                try:
+                    decodificador.decode(bloque)
+                except UnicodeDecodeError as e:
+                    fila += bloque[: max(e.start, 0)].count(b"\n")
+                    raise
+                fila += bloque.count(b"\n")
+            decodificador.decode(b"", final=True)
+            return nombre
+        except UnicodeDecodeError as e:
+            primer_error = primer_error or (fila, e)
+        finally:
+            archivo.seek(0)
+    fila, e = primer_error
+    raise ErrorImportacion(
+        f"Fila {fila}: el archivo no está en UTF-8 ni en Windows-1252 ({e.reason}). "
+        "Guárdalo como «CSV UTF-8»."
+    )
+
+
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding=_codificacion(archivo), newline="")
+    muestra = texto.readline()
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+    except csv.Error:
+        dialecto = csv.excel
+    yield from csv.reader(_encadenar(muestra, texto), dialecto)
+
+
+def _encadenar(primera, resto):
+    yield primera
+    yield from resto
+
+
+def _filas_xlsx(archivo):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ErrorImportacion("Para importar .xlsx hay que instalar openpyxl.")
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        for fila in libro.active.iter_rows(values_only=True):
+            yield ["" if v is None else v for v in fila]
+    finally:
+        libro.close()
+
+
+def leer_filas(archivo, nombre):
+    """
+    Genera (numero_de_fila, dict) sin cargar el archivo completo en memoria.
+    `archivo` es binario; `nombre` decide el formato por la extensión.
+    """
+    if nombre.lower().endswith(".xlsx"):
+        crudas = _filas_xlsx(archivo)
+    elif nombre.lower().endswith((".csv", ".txt")):
+        crudas = _filas_csv(archivo)
+    else:
+        raise ErrorImportacion("Formato no soportado: usa .csv o .xlsx.")
+
+    encabezado = [_normalizar_encabezado(c) for c in next(crudas, [])]
+    faltan = [c for c in COLUMNAS_REQUERIDAS if c not in encabezado]
+    if faltan:
+        raise ErrorImportacion(f"Faltan columnas: {', '.join(faltan)}.")
+
+    for numero, valores in enumerate(crudas, start=2):
+        if not any(str(v).strip() for v in valores):
+            continue
+        yield numero, dict(zip(encabezado, valores))
+
+
+# ---------- Validación (sin consultas) ----------
+
+def _decimal(valor):
+    if isinstance(valor, (int, float, Decimal)):
+        return Decimal(str(valor)).quantize(Decimal("0.01"))
+    texto = str(valor).strip()
+    if "," in texto and "." not in texto:
+        texto = texto.replace(",", ".")
+    return Decimal(texto).quantize(Decimal("0.01"))
+
+
+def _validar(datos):
+    """Devuelve (fila_limpia, None) o (None, mensaje)."""
+    limpia = {c: str(datos.get(c, "") or "").strip() for c in ("nombre", "proveedor", "tipo", "nota")}
+    for c in ("nombre", "proveedor", "tipo"):
+        if not limpia[c]:
+            return None, f"'{c}' es requerido."
+    if len(limpia["nombre"]) > Producto._meta.get_field("nombre").max_length:
+        return None, "'nombre' es demasiado largo."
+    limpia["nota"] = limpia["nota"][: Movimiento._meta.get_field("nota").max_length]
+
+    try:
+        cantidad = Decimal(str(datos.get("cantidad", "")).strip())
+        if cantidad != cantidad.to_integral_value() or cantidad < 1:
+            raise InvalidOperation
+        limpia["cantidad"] = int(cantidad)
+    except (InvalidOperation, ValueError):
+        return None, "'cantidad' debe ser un entero mayor que 0."
+
+    for c in ("precio_unitario", "costo_unitario", "precio_venta_unitario"):
+        valor = datos.get(c, "")
+        if c != "precio_unitario" and str(valor).strip() == "":
+            limpia[c] = None
+            continue
+        try:
+            limpia[c] = _decimal(valor)
+        except (InvalidOperation, ValueError):
+            return None, f"'{c}' no es un número."
+        if limpia[c] < 0:
+            return None, f"'{c}' no puede ser negativo."
+    return limpia, None
+
+
+# ---------- Resolución por lote ----------
+
+def _por_nombre(modelo, nombres, crear):
+    existentes = dict(modelo.objects.filter(nombre__in=nombres).values_list("nombre", "id"))
+    faltan = set(nombres) - set(existentes)
+    if crear and faltan:
+        modelo.objects.bulk_create([modelo(nombre=n) for n in faltan], ignore_conflicts=True)
+        existentes.update(modelo.objects.filter(nombre__in=faltan).values_list("nombre", "id"))
+    return existentes
+
+
+def _procesar_lote(lote, resultado, crear_catalogo):
+    validas = []
+    for numero, datos in lote:
+        limpia, error = _validar(datos)
+        if error:
+            resultado.agregar_error(numero, error)
+        else:
+            validas.append((numero, limpia))
+    if not validas:
+        return
+
+    with transaction.atomic():
+        proveedores = _por_nombre(Proveedor, {f["proveedor"] for _, f in validas}, crear_catalogo)
+        tipos = _por_nombre(TipoJoya, {f["tipo"] for _, f in validas}, crear_catalogo)
+
+        filas = []
+        for numero, f in validas:
+            prov_id, tipo_id = proveedores.get(f["proveedor"]), tipos.get(f["tipo"])
+            if prov_id is None:
+                resultado.agregar_error(numero, f"Proveedor '{f['proveedor']}' no existe.")
+            elif tipo_id is None:
+                resultado.agregar_error(numero, f"Tipo '{f['tipo']}' no existe.")
+            else:
+                filas.append((numero, (f["nombre"], prov_id, tipo_id), f))
+        if not filas:
+            return
+
+        claves = {clave for _, clave, _ in filas}
+        existentes = {
+            (p.nombre, p.proveedor_id, p.tipo_id): p
+            for p in Producto.objects.filter(
+                nombre__in={c[0] for c in claves},
+                proveedor_id__in={c[1] for c in claves},
+                tipo_id__in={c[2] for c in claves},
+            ).only("id", "nombre", "proveedor_id", "tipo_id", "costo_unitario", "precio_venta_unitario")
+        }
+
+        # Un objeto por producto; si se repite en el archivo, gana la última fila.
+        escribir = {}
+        for _, clave, f in filas:
+            actual = escribir.get(clave) or existentes.get(clave)
+            if actual is None:
+                costo = f["costo_unitario"] if f["costo_unitario"] is not None else f["precio_unitario"]
+                venta = f["precio_venta_unitario"] or Decimal("0.00")
+            else:
+                costo = f["costo_unitario"] if f["costo_unitario"] is not None else actual.costo_unitario
+                venta = f["precio_venta_unitario"] if f["precio_venta_unitario"] is not None else actual.precio_venta_unitario
+                if (costo, venta) == (actual.costo_unitario, actual.precio_venta_unitario):
+                    continue
+            escribir[clave] = Producto(
+                nombre=clave[0], proveedor_id=clave[1], tipo_id=clave[2],
+                costo_unitario=costo, precio_venta_unitario=venta,
+            )
+
+        nuevas = [c for c in escribir if c not in existentes]
+        cambiadas = [existentes[c].id for c in escribir if c in existentes]
+        if escribir:
+            Producto.objects.bulk_create(
+                list(escribir.values()),
+                update_conflicts=True,
+                unique_fields=["nombre", "proveedor", "tipo"],
+                update_fields=["costo_unitario", "precio_venta_unitario", "updated_at"],
+            )
+        if nuevas:
+            # No todos los backends devuelven el id tras un upsert: se vuelven a leer.
+            existentes.update(
+                ((p.nombre, p.proveedor_id, p.tipo_id), p)
+                for p in Producto.objects.filter(
+                    nombre__in={c[0] for c in nuevas},
+                    proveedor_id__in={c[1] for c in nuevas},
+                    tipo_id__in={c[2] for c in nuevas},
+                ).only("id", "nombre", "proveedor_id", "tipo_id")
+            )
+            # bulk_create no dispara señales: filas del libro para los productos nuevos.
+            ProductoStock.objects.bulk_create(
+                [ProductoStock(producto_id=existentes[c].id) for c in nuevas],
+                ignore_conflicts=True,
+            )
+        if cambiadas:
+            stock.actualizar_valor(cambiadas)
+
+        compras = [
+            Movimiento(
+                tipo=Movimiento.Tipo.ENTRADA,
+                producto_id=existentes[clave].id,
+                cantidad=f["cantidad"],
+                precio_unitario=f["precio_unitario"],
+                nota=f["nota"],
+            )
+            for _, clave, f in filas
+        ]
+        Movimiento.objects.bulk_create(compras)
+        stock.aplicar_deltas(stock.agrupar_deltas(
+            (pid, cant, 0, costo) for pid, cant, costo in map(stock.aporte_movimiento, compras)
+        ))
+        transaction.on_commit(lambda: cache_versionada.invalidar("catalogo", "compras"))
+
+    resultado.compras += len(compras)
+    resultado.productos_nuevos += len(nuevas)
+    resultado.productos_actualizados += len(cambiadas)
+
+
+def importar_compras(archivo, nombre, crear_catalogo=False, tamano_lote=TAMANO_LOTE):
+    """
+    Importa el archivo y devuelve un ResultadoImportacion. Lanza ErrorImportacion
+    solo si el archivo completo es ilegible; los errores por fila van al reporte.
+
+    `crear_catalogo=True` crea los proveedores y tipos que no existan.
+    """
+    resultado = ResultadoImportacion()
+    filas = leer_filas(archivo, nombre)
+    while True:
+        lote = list(islice(filas, tamano_lote))
+        if not lote:
+            break
+        resultado.filas += len(lote)
+        _procesar_lote(lote, resultado, crear_catalogo)
+    resultado.errores.sort()
+    return resultado
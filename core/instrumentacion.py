@@ -0,0 +1,111 @@
+"""
+Medición por request: consultas SQL, tiempo en BD y llamadas salientes.
+
+InstrumentacionMiddleware abre una Medicion en un ContextVar; el
+execute_wrapper de la conexión, `core.services.medir` y los fragmentos de
+plantilla en caché (core.cache) van sumando en ella.
+Fuera de un request (comandos, hilos en segundo plano) no hay medición activa
+y `registrar_externo` no hace nada.
+
+`estadisticas_pool` lee el estado del pool de conexiones de psycopg (solo
+PostgreSQL con DB_POOL), que es del proceso y no del request.
+"""
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+_actual = ContextVar("medicion_actual", default=None)
+
+_LISTA_IN = re.compile(r"IN \((?:%s, )*%s\)")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def huella(sql):
+    """SQL sin valores: dos consultas con la misma huella solo cambian parámetros."""
+    sql = _LISTA_IN.sub("IN (...)", sql)
+    return _ESPACIOS.sub(" ", sql).strip()
+
+
+class Medicion:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tiempo_bd = 0.0
+        self.huellas = Counter()
+        self.externos = defaultdict(lambda: [0, 0.0])  # nombre -> [llamadas, segundos]
+        self.fragmentos = [0, 0]  # {% cache %}: [aciertos, fallos]
+        # el dashboard consulta desde varios hilos a la vez (core.dashboard)
+        self._lock = threading.Lock()
+
+    def envoltorio(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            with self._lock:
+                self.tiempo_bd += duracion
+                self.consultas += 1
+                self.huellas[huella(sql)] += 1
+
+    def externo(self, nombre, duracion):
+        with self._lock:
+            datos = self.externos[nombre]
+            datos[0] += 1
+            datos[1] += duracion
+
+    def fragmento(self, acierto):
+        with self._lock:
+            self.fragmentos[0 if acierto else 1] += 1
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.inicio
+
+    def duplicadas(self, minimo=2):
+        """[(veces, huella)] de las consultas repetidas, de más a menos."""
+        return [(n, sql) for sql, n in self.huellas.most_common() if n >= minimo]
+
+
+def actual():
+    return _actual.get()
+
+
+def iniciar():
+    medicion = Medicion()
+    return medicion, _actual.set(medicion)
+
+
+def terminar(token):
+    _actual.reset(token)
+
+
+def registrar_externo(nombre, duracion):
+    medicion = _actual.get()
+    if medicion is not None:
+        medicion.externo(nombre, duracion)
+
+
+def registrar_fragmento(acierto):
+    medicion = _actual.get()
+    if medicion is not None:
+        medicion.fragmento(acierto)
+
+
+def estadisticas_pool():
+    """
+    {alias: stats} de cada base con pool de psycopg; vacío en SQLite o sin pool.
+    Los contadores (requests_num, connections_num, ...) son acumulados del
+    proceso desde que se creó el pool.
+    """
+    from django.db import connections
+
+    datos = {}
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is not None:
+            datos[alias] = pool.get_stats()
+    return datos
+
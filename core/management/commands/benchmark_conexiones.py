@@ -0,0 +1,106 @@
+import json
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, connections
+from django.db.backends.signals import connection_created
+
+from core.instrumentacion import estadisticas_pool
+
+
+def _percentil(valores, p):
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100, method="inclusive")[p - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el costo de conseguir conexión a la BD: varios hilos simulan requests cortos "
+        "(abrir, SELECT 1, cerrar como al final de un request) y se informa el ritmo, la "
+        "latencia y cuántas conexiones nuevas se abrieron. Correr con DB_POOL=1 y DB_POOL=0 "
+        "(o CONN_MAX_AGE distinto) contra el mismo PostgreSQL para comparar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hilos", type=int, default=8, help="Requests simultáneos (como workers/hilos).")
+        parser.add_argument("--requests", type=int, default=200, help="Requests por hilo.")
+        parser.add_argument("--pausa-ms", type=float, default=0.0, help="Espera entre requests de un hilo.")
+        parser.add_argument("--salida", default=None, help="Archivo JSON con los resultados.")
+
+    def handle(self, *args, **opts):
+        hilos, por_hilo, pausa = opts["hilos"], opts["requests"], opts["pausa_ms"] / 1000
+        latencias, errores = [], []
+        abiertas = [0]
+        lock = threading.Lock()
+
+        def _contar_conexion(sender, **kwargs):
+            with lock:
+                abiertas[0] += 1
+
+        def _trabajador():
+            propias = []
+            try:
+                for _ in range(por_hilo):
+                    inicio = time.perf_counter()
+                    try:
+                        close_old_connections()  # request_started
+                        with connection.cursor() as cursor:
+                            cursor.execute("SELECT 1")
+                            cursor.fetchone()
+                    except Exception as e:
+                        with lock:
+                            errores.append(repr(e))
+                    finally:
+                        close_old_connections()  # request_finished
+                    propias.append((time.perf_counter() - inicio) * 1000)
+                    if pausa:
+                        time.sleep(pausa)
+            finally:
+                connections.close_all()
+                with lock:
+                    latencias.extend(propias)
+
+        pool_antes = estadisticas_pool().get("default", {})
+        connection_created.connect(_contar_conexion)
+        try:
+            inicio = time.perf_counter()
+            trabajadores = [threading.Thread(target=_trabajador) for _ in range(hilos)]
+            for t in trabajadores:
+                t.start()
+            for t in trabajadores:
+                t.join()
+            duracion = time.perf_counter() - inicio
+        finally:
+            connection_created.disconnect(_contar_conexion)
+        pool_despues = estadisticas_pool().get("default")
+
+        ajustes = connection.settings_dict
+        resultado = {
+            "motor": connection.vendor,
+            "pool": bool(ajustes.get("OPTIONS", {}).get("pool")),
+            "conn_max_age": ajustes["CONN_MAX_AGE"],
+            "hilos": hilos,
+            "requests": len(latencias),
+            "errores": len(errores),
+            "requests_por_segundo": round(len(latencias) / duracion, 1),
+            "p50_ms": round(_percentil(latencias, 50), 2),
+            "p95_ms": round(_percentil(latencias, 95), 2),
+            # con pool, connection_created cuenta préstamos; las conexiones
+            # físicas nuevas salen de las estadísticas del pool
+            "conexiones_nuevas": (
+                pool_despues.get("connections_num", 0) - pool_antes.get("connections_num", 0)
+                if pool_despues is not None else abiertas[0]
+            ),
+            "pool_stats": pool_despues,
+        }
+        if errores:
+            resultado["primer_error"] = errores[0]
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        self.stdout.write(texto)
+        if opts["salida"]:
+            with open(opts["salida"], "w", encoding="utf-8") as f:
+                f.write(texto + "\n")
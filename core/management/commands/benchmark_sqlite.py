@@ -0,0 +1,43 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.carga_sqlite import medir_perfil, perfiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga concurrente de lecturas (dashboard) y escrituras (ventas) sobre copias de la BD "
+        "SQLite: compara el perfil por defecto de Django con SQLITE_PRODUCCION_OPCIONES "
+        "(WAL, busy_timeout, BEGIN IMMEDIATE...). No modifica la BD real."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--segundos", type=float, default=5.0, help="Duración de cada perfil.")
+        parser.add_argument("--lectores", type=int, default=4)
+        parser.add_argument("--escritores", type=int, default=2)
+        parser.add_argument("--salida", default=None, help="Archivo JSON con los resultados.")
+
+    def handle(self, *args, **opts):
+        if connection.vendor != "sqlite":
+            raise CommandError("Solo aplica a SQLite; la BD configurada es " + connection.vendor + ".")
+
+        resultados = []
+        for nombre, opciones in perfiles().items():
+            self.stdout.write(f"Perfil {nombre}: {opts['segundos']:.0f}s, {opts['lectores']} lectores, {opts['escritores']} escritores...")
+            resultado = medir_perfil(
+                nombre, opciones, segundos=opts["segundos"], lectores=opts["lectores"], escritores=opts["escritores"]
+            )
+            resultados.append(resultado)
+            for tipo in ("lecturas", "escrituras"):
+                r = resultado[tipo]
+                self.stdout.write(
+                    f"  {tipo:<10} {r['por_segundo']:>8}/s  p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  "
+                    f"locked {r['database_is_locked']}"
+                )
+
+        if opts["salida"]:
+            with open(opts["salida"], "w", encoding="utf-8") as f:
+                json.dump(resultados, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Resultados en {opts['salida']}"))
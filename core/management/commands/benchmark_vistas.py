@@ -0,0 +1,203 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from core.forms import VentaForm
+from core.instrumentacion import iniciar, terminar
+from core.models import TasaCambio
+from core.semilla import sembrar
+from movimiento.models import Venta
+from producto.models import ProductoStock
+
+# filas de compras por tamaño; el resto escala con ellas
+TAMANOS = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def _escala(compras):
+    return {
+        "productos": max(50, compras // 20),
+        "compras": compras,
+        "ventas": compras // 2,
+        "pagos": compras // 4,
+    }
+
+
+def _percentil(valores, p):
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100, method="inclusive")[p - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide dashboard, inventario, compra_list, deudas_list, venta_detalle y la validación de "
+        "VentaForm: p50/p95, consultas y memoria pico por vista y tamaño de datos. Por defecto "
+        "crea una BD de prueba por tamaño y la llena con seed; --bd-actual mide los datos que ya hay."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tamanos", default="1k", help=f"Lista separada por comas: {', '.join(TAMANOS)}.")
+        parser.add_argument("--repeticiones", type=int, default=20)
+        parser.add_argument("--bd-actual", action="store_true", help="No crea BD de prueba ni siembra datos.")
+        parser.add_argument("--salida", default=None, help="Archivo JSON con los resultados.")
+        parser.add_argument("--comparar", default=None, help="JSON de una corrida anterior para mostrar la diferencia.")
+        parser.add_argument("--semilla", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        tamanos = [t.strip().lower() for t in opts["tamanos"].split(",") if t.strip()]
+        desconocidos = [t for t in tamanos if t not in TAMANOS]
+        if desconocidos and not opts["bd_actual"]:
+            raise CommandError(f"Tamaños desconocidos: {', '.join(desconocidos)}.")
+
+        setup_test_environment()
+        resultados = []
+        try:
+            if opts["bd_actual"]:
+                resultados += self._medir_todo("actual", opts["repeticiones"])
+            else:
+                for tamano in tamanos:
+                    resultados += self._con_bd_de_prueba(tamano, opts)
+        finally:
+            teardown_test_environment()
+
+        informe = {
+            "fecha": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "bd": connection.vendor,
+            "repeticiones": opts["repeticiones"],
+            "resultados": resultados,
+        }
+        anterior = self._cargar(opts["comparar"]) if opts["comparar"] else None
+        self._imprimir(resultados, anterior)
+        if opts["salida"]:
+            with open(opts["salida"], "w", encoding="utf-8") as f:
+                json.dump(informe, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultados guardados en {opts['salida']}")
+
+    # ---------- BD y datos ----------
+
+    def _con_bd_de_prueba(self, tamano, opts):
+        nombre_original = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            cache.clear()
+            escala = _escala(TAMANOS[tamano])
+            self.stdout.write(f"Sembrando {tamano}: {escala}")
+            inicio = time.perf_counter()
+            sembrar(semilla=opts["semilla"], **escala)
+            # tasa fija: el dashboard no debe salir a buscarla durante la medición
+            TasaCambio.objects.create(tasa="36.5000", fuente="benchmark")
+            self.stdout.write(f"  sembrado en {time.perf_counter() - inicio:.1f}s")
+            return self._medir_todo(tamano, opts["repeticiones"])
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+    @staticmethod
+    def _cargar(ruta):
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                return {(r["tamano"], r["vista"]): r for r in json.load(f)["resultados"]}
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"No se pudo leer {ruta}: {e}")
+
+    # ---------- Medición ----------
+
+    def _medir_todo(self, tamano, repeticiones):
+        usuario, _ = get_user_model().objects.get_or_create(
+            username="benchmark", defaults={"is_staff": True}
+        )
+        cliente = Client()
+        cliente.force_login(usuario)
+
+        venta = (
+            Venta.objects.filter(a_plazos=True, pagos__isnull=False).order_by("-id").first()
+            or Venta.objects.order_by("-id").first()
+        )
+        con_stock = ProductoStock.objects.filter(stock__gt=0).order_by("-stock").first()
+
+        casos = [
+            ("dashboard", lambda: cliente.get(reverse("dashboard"))),
+            ("inventario", lambda: cliente.get(reverse("inventario"))),
+            ("compra_list", lambda: cliente.get(reverse("compra_list"))),
+            ("deudas_list", lambda: cliente.get(reverse("deudas_list"))),
+        ]
+        if venta is not None:
+            casos.append(("venta_detalle", lambda: cliente.get(reverse("venta_detalle", args=[venta.id]))))
+        if con_stock is not None:
+            datos = {
+                "producto": con_stock.producto_id, "cantidad": 1, "precio_unitario": "10.00",
+                "a_plazos": "", "nota": "", "pago_inicial": "0.00",
+            }
+            casos.append(("VentaForm.is_valid", lambda: VentaForm(data=datos).is_valid()))
+
+        resultados = []
+        for nombre, llamar in casos:
+            resultados.append(self._medir(tamano, nombre, llamar, repeticiones))
+        return resultados
+
+    @staticmethod
+    def _medir(tamano, nombre, llamar, repeticiones):
+        # primera llamada: consultas, memoria pico y tiempo en frío
+        # también como medición activa: el dashboard consulta desde otros hilos
+        medicion, token = iniciar()
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        try:
+            with connection.execute_wrapper(medicion.envoltorio):
+                respuesta = llamar()
+        finally:
+            terminar(token)
+        primera = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            llamar()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+
+        return {
+            "tamano": tamano,
+            "vista": nombre,
+            "status": getattr(respuesta, "status_code", None),
+            "primera_ms": round(primera * 1000, 2),
+            "p50_ms": round(_percentil(tiempos, 50), 2) if tiempos else None,
+            "p95_ms": round(_percentil(tiempos, 95), 2) if tiempos else None,
+            "consultas": medicion.consultas,
+            "consultas_repetidas": sum(n for n, _ in medicion.duplicadas()),
+            "bd_ms": round(medicion.tiempo_bd * 1000, 2),
+            # {% cache %} en la primera llamada (en frío, normalmente fallos)
+            "fragmentos": {"aciertos": medicion.fragmentos[0], "fallos": medicion.fragmentos[1]},
+            "memoria_pico_kb": round(pico / 1024, 1),
+        }
+
+    def _imprimir(self, resultados, anterior):
+        self.stdout.write(
+            f"{'tamaño':<8}{'vista':<22}{'status':>7}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'1ª ms':>10}{'consultas':>11}{'repetidas':>11}{'mem KB':>10}"
+        )
+        for r in resultados:
+            linea = (
+                f"{r['tamano']:<8}{r['vista']:<22}{str(r['status'] or '-'):>7}{r['p50_ms']:>10}"
+                f"{r['p95_ms']:>10}{r['primera_ms']:>10}{r['consultas']:>11}{r['consultas_repetidas']:>11}"
+                f"{r['memoria_pico_kb']:>10}"
+            )
+            previo = anterior.get((r["tamano"], r["vista"])) if anterior else None
+            if previo and previo.get("p50_ms"):
+                cambio = (r["p50_ms"] - previo["p50_ms"]) / previo["p50_ms"] * 100
+                linea += f"   p50 {cambio:+.0f}%, consultas {r['consultas'] - previo['consultas']:+d}"
+            self.stdout.write(linea)
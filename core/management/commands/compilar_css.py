@@ -0,0 +1,38 @@
+import subprocess
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+CORE = Path(__file__).resolve().parents[2]
+ENTRADA = CORE / "estilos" / "app.css"
+SALIDA = CORE / "static" / "core" / "css" / "app.css"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compila core/estilos/app.css con Tailwind (binario del paquete tailwindcss-bin) "
+        "y deja el CSS purgado y minificado en core/static/core/css/app.css. "
+        "Correr después de usar clases nuevas en las plantillas, antes de collectstatic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--watch", action="store_true", help="Recompila al cambiar una plantilla (desarrollo).")
+
+    def handle(self, *args, **opts):
+        try:
+            from tailwindcss_bin import find_tailwindcss_bin
+
+            binario = find_tailwindcss_bin()
+        except (ImportError, FileNotFoundError):
+            raise CommandError("Falta el compilador de Tailwind: pip install tailwindcss-bin")
+
+        comando = [binario, "--input", str(ENTRADA), "--output", str(SALIDA), "--minify"]
+        if opts["watch"]:
+            comando.append("--watch")
+        try:
+            subprocess.run(comando, cwd=CORE, check=True)
+        except subprocess.CalledProcessError as e:
+            raise CommandError(f"Tailwind terminó con código {e.returncode}.")
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(f"CSS compilado: {SALIDA.relative_to(CORE.parent)} ({SALIDA.stat().st_size // 1024} KB)."))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import TokenAPI
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea un token para la API JSON (/api/v1/) y muestra la clave una sola vez. "
+        "Con --revocar desactiva el token de ese nombre."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("nombre", help="Para quién es el token, p. ej. 'caja-1' o 'catalogo-web'.")
+        parser.add_argument("--revocar", action="store_true", help="Desactiva el token en vez de crearlo.")
+
+    def handle(self, *args, **opts):
+        nombre = opts["nombre"]
+        if opts["revocar"]:
+            token = TokenAPI.objects.filter(nombre=nombre).first()
+            if token is None:
+                raise CommandError(f"No existe un token llamado {nombre!r}.")
+            token.activo = False
+            token.save(update_fields=["activo"])
+            self.stdout.write(self.style.SUCCESS(f"Token {nombre!r} revocado."))
+            return
+
+        if TokenAPI.objects.filter(nombre=nombre).exists():
+            raise CommandError(f"Ya existe un token llamado {nombre!r}.")
+        _, clave = TokenAPI.crear(nombre)
+        self.stdout.write(self.style.SUCCESS(f"Token {nombre!r} creado. Guarde la clave; no se vuelve a mostrar:"))
+        self.stdout.write(clave)
+        self.stdout.write("Uso: Authorization: Token <clave>")
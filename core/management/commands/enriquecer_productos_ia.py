@@ -0,0 +1,118 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Q
+from groq import RateLimitError
+
+from core import cache as cache_versionada
+from core.services import (
+    CuboDeTokens, espera_sugerida, redactar_descripcion_ia, calcular_precio_sugerido_ia, sin_reintentos_groq,
+)
+from producto.models import Producto
+
+
+class Command(BaseCommand):
+    help = (
+        "Completa descripcion_ia y precio_sugerido_ia de los productos que no los tienen, "
+        "en paralelo y respetando la cuota de Groq. Se puede cortar y volver a lanzar: "
+        "solo procesa lo que sigue vacío."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--campos", choices=["todo", "descripcion", "precio"], default="todo")
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--rpm", type=int, default=30, help="Solicitudes por minuto permitidas por Groq.")
+        parser.add_argument("--rafaga", type=int, default=None, help="Tamaño máximo de ráfaga (default rpm/6).")
+        parser.add_argument("--lote", type=int, default=50, help="Productos por lote de bulk_update.")
+        parser.add_argument("--reintentos", type=int, default=5)
+        parser.add_argument("--limite", type=int, default=None, help="Procesar como mucho N productos.")
+        parser.add_argument("--desde-id", type=int, default=0)
+
+    def handle(self, *args, **opts):
+        hacer_desc = opts["campos"] in ("todo", "descripcion")
+        hacer_precio = opts["campos"] in ("todo", "precio")
+
+        faltan = Q()
+        if hacer_desc:
+            faltan |= Q(descripcion_ia__isnull=True) | Q(descripcion_ia="")
+        if hacer_precio:
+            faltan |= Q(precio_sugerido_ia__isnull=True)
+
+        pendientes = Producto.objects.filter(faltan).select_related("proveedor", "tipo")
+        self.cubo = CuboDeTokens(opts["rpm"], opts["rafaga"])
+        self.reintentos = opts["reintentos"]
+
+        ultimo_id = opts["desde_id"]
+        procesados = fallidos = 0
+        with ThreadPoolExecutor(max_workers=max(1, opts["workers"])) as pool:
+            while opts["limite"] is None or procesados < opts["limite"]:
+                tam = opts["lote"]
+                if opts["limite"] is not None:
+                    tam = min(tam, opts["limite"] - procesados)
+                lote = list(pendientes.filter(id__gt=ultimo_id).order_by("id")[:tam])
+                if not lote:
+                    break
+                ultimo_id = lote[-1].id
+
+                futuros = {
+                    pool.submit(self._enriquecer, p, hacer_desc, hacer_precio): p
+                    for p in lote
+                }
+                cambiados, campos = [], set()
+                for futuro in as_completed(futuros):
+                    producto = futuros[futuro]
+                    actualizados, errores = futuro.result()
+                    if errores:
+                        fallidos += 1
+                        self.stderr.write(f"  producto {producto.id}: {'; '.join(errores)}")
+                    if actualizados:
+                        cambiados.append(producto)
+                        campos |= actualizados
+
+                if cambiados:
+                    Producto.objects.bulk_update(cambiados, sorted(campos))
+                    # bulk_update no dispara señales
+                    cache_versionada.invalidar("catalogo")
+                procesados += len(lote)
+                self.stdout.write(f"Lote hasta id {ultimo_id}: {len(cambiados)}/{len(lote)} actualizados.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {procesados} productos revisados, {fallidos} con error. "
+            f"Vuelve a ejecutar para reintentar los pendientes."
+        ))
+
+    def _llamar(self, funcion, producto):
+        for intento in range(self.reintentos + 1):
+            self.cubo.tomar()
+            try:
+                # los reintentos los hace este bucle, pasando por el cubo
+                with sin_reintentos_groq():
+                    return funcion(producto)
+            except RateLimitError as e:
+                if intento == self.reintentos:
+                    raise
+                # el próximo tomar() de cualquier hilo espera lo que pidió Groq
+                self.cubo.vaciar(espera_sugerida(e, intento))
+
+    def _enriquecer(self, producto, hacer_desc, hacer_precio):
+        """(campos completados, errores): si falla el precio, la descripción se guarda igual."""
+        close_old_connections()
+        actualizados, errores = set(), []
+        if hacer_desc and not producto.descripcion_ia:
+            try:
+                producto.descripcion_ia = self._llamar(redactar_descripcion_ia, producto)
+            except Exception as e:
+                errores.append(f"descripción: {e}")
+            else:
+                actualizados.add("descripcion_ia")
+        if hacer_precio and producto.precio_sugerido_ia is None:
+            try:
+                precio = self._llamar(calcular_precio_sugerido_ia, producto)
+            except Exception as e:
+                errores.append(f"precio: {e}")
+            else:
+                if precio is not None:
+                    producto.precio_sugerido_ia = precio
+                    actualizados.add("precio_sugerido_ia")
+        return actualizados, errores
@@ -0,0 +1,43 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importacion import importar_compras, ErrorImportacion, TAMANO_LOTE
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa compras desde un .csv o .xlsx (columnas: nombre, proveedor, tipo, cantidad, "
+        "precio_unitario; opcionales: costo_unitario, precio_venta_unitario, nota)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo")
+        parser.add_argument(
+            "--crear-catalogo",
+            action="store_true",
+            help="Crea los proveedores y tipos que no existan (por defecto la fila se reporta como error).",
+        )
+        parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Filas por transacción.")
+
+    def handle(self, *args, **opts):
+        ruta = opts["archivo"]
+        if not os.path.exists(ruta):
+            raise CommandError(f"No existe el archivo {ruta}.")
+
+        with open(ruta, "rb") as archivo:
+            try:
+                resultado = importar_compras(
+                    archivo, ruta, crear_catalogo=opts["crear_catalogo"], tamano_lote=opts["lote"]
+                )
+            except ErrorImportacion as e:
+                raise CommandError(str(e))
+
+        for fila, mensaje in resultado.errores:
+            self.stderr.write(f"  fila {fila}: {mensaje}")
+        estilo = self.style.SUCCESS if resultado.ok else self.style.WARNING
+        self.stdout.write(estilo(
+            f"{resultado.filas} filas: {resultado.compras} compras, "
+            f"{resultado.productos_nuevos} productos nuevos, "
+            f"{resultado.productos_actualizados} actualizados, {len(resultado.errores)} con error."
+        ))
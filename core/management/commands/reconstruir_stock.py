@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import stock
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el libro de stock (ProductoStock) desde compras y ventas, y lo verifica."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--solo-verificar",
+            action="store_true",
+            help="No reescribe nada; solo compara el libro con las tablas crudas.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        if not opts["solo_verificar"]:
+            with transaction.atomic():
+                total = stock.reconstruir(batch_size=opts["batch_size"])
+            self.stdout.write(f"Libro reconstruido: {total} productos.")
+
+        diferencias = stock.verificar()
+        for pid, campo, esperado, actual in diferencias[:50]:
+            self.stdout.write(f"  producto {pid}: {campo} esperado={esperado} actual={actual}")
+        if diferencias:
+            raise CommandError(f"El libro de stock no cuadra ({len(diferencias)} diferencias).")
+        self.stdout.write(self.style.SUCCESS("El libro de stock cuadra con compras y ventas."))
@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import ventas_diarias
+from core import cache as cache_versionada
+
+
+def _fecha(texto):
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {texto} (use AAAA-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el resumen diario de ventas (VentaDiaria) desde ventas y pagos, por rango de días."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", default=None, help="Primer día (AAAA-MM-DD). Por defecto, desde el inicio.")
+        parser.add_argument("--hasta", default=None, help="Último día (AAAA-MM-DD). Por defecto, hasta hoy.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        desde = _fecha(opts["desde"]) if opts["desde"] else None
+        hasta = _fecha(opts["hasta"]) if opts["hasta"] else None
+        if desde and hasta and desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta.")
+
+        filas = ventas_diarias.reconstruir(desde, hasta, batch_size=opts["batch_size"])
+        cache_versionada.invalidar("ventas")
+        rango = f"{desde or 'inicio'} a {hasta or 'hoy'}"
+        self.stdout.write(self.style.SUCCESS(f"Resumen diario reconstruido ({rango}): {filas} filas."))
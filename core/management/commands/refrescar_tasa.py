@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import refrescar_tasa, tasa_actual
+
+
+class Command(BaseCommand):
+    help = (
+        "Consulta dolarapi (DOLAR_API_URL) y guarda una nueva TasaCambio. Pensado para cron; "
+        "los requests solo leen la última tasa guardada."
+    )
+
+    def handle(self, *args, **opts):
+        tasa = refrescar_tasa()
+        if tasa is None:
+            anterior = tasa_actual()
+            detalle = (
+                f"se sigue usando Bs. {anterior.tasa} del {anterior.created_at:%Y-%m-%d %H:%M}"
+                if anterior else "no hay ninguna tasa guardada"
+            )
+            raise CommandError(f"No se pudo refrescar la tasa (fuente caída u otro refresco en curso); {detalle}.")
+        self.stdout.write(self.style.SUCCESS(f"Tasa guardada: Bs. {tasa.tasa} ({tasa.fuente})."))
@@ -0,0 +1,62 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core import tareas
+
+
+class Command(BaseCommand):
+    help = "Ejecuta la cola de tareas de IA (core.TareaIA) con un pool de workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "AI_WORKERS", 2),
+            help="Hilos que procesan tareas en paralelo (default: settings.AI_WORKERS).",
+        )
+        parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos de espera cuando la cola está vacía.")
+        parser.add_argument("--una-vez", action="store_true", help="Vacía la cola y termina.")
+
+    def handle(self, *args, **opts):
+        self.detener = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *a: self.detener.set())
+
+        reencoladas = tareas.reencolar_colgadas()
+        if reencoladas:
+            self.stdout.write(f"{reencoladas} tareas colgadas devueltas a la cola.")
+
+        hilos = [
+            threading.Thread(target=self._bucle, args=(opts,), name=f"ai-worker-{i}", daemon=True)
+            for i in range(max(1, opts["workers"]))
+        ]
+        for h in hilos:
+            h.start()
+        self.stdout.write(f"run_ai_worker: {len(hilos)} workers.")
+        try:
+            for h in hilos:
+                while h.is_alive():
+                    h.join(timeout=1)
+        except KeyboardInterrupt:
+            self.detener.set()
+            for h in hilos:
+                h.join()
+
+    def _bucle(self, opts):
+        try:
+            while not self.detener.is_set():
+                close_old_connections()
+                tarea = tareas.tomar_siguiente()
+                if tarea is None:
+                    if opts["una_vez"]:
+                        return
+                    self.detener.wait(opts["intervalo"])
+                    continue
+                tareas.ejecutar(tarea)
+                self.stdout.write(f"[{threading.current_thread().name}] {tarea}")
+        finally:
+            connection.close()
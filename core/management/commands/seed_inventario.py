@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.semilla import sembrar
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos (productos, compras, ventas y pagos) con bulk_create, "
+        "para probar y medir con volumen de producción. No borra nada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=1000)
+        parser.add_argument("--compras", type=int, default=5000)
+        parser.add_argument("--ventas", type=int, default=2000)
+        parser.add_argument("--pagos", type=int, default=1000)
+        parser.add_argument("--proveedores", type=int, default=25)
+        parser.add_argument("--semilla", type=int, default=None, help="Para repetir exactamente los mismos datos.")
+
+    def handle(self, *args, **opts):
+        inicio = time.perf_counter()
+        creado = sembrar(
+            productos=opts["productos"],
+            compras=opts["compras"],
+            ventas=opts["ventas"],
+            pagos=opts["pagos"],
+            proveedores=opts["proveedores"],
+            semilla=opts["semilla"],
+            salida=lambda texto: self.stdout.write(f"  {texto}"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo en {time.perf_counter() - inicio:.1f}s: {creado['productos']} productos, "
+            f"{creado['compras']} compras, {creado['ventas']} ventas, {creado['pagos']} pagos."
+        ))
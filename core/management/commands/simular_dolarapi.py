@@ -0,0 +1,51 @@
+import json
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Servidor local que responde como ve.dolarapi.com/v1/dolares, para probar el "
+        "refresco de la tasa sin internet. Usar con DOLAR_API_URL=http://127.0.0.1:<puerto>/v1/dolares"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--puerto", type=int, default=8765)
+        parser.add_argument("--promedio", type=str, default="36.50")
+        parser.add_argument("--fallar", action="store_true", help="Responde 503 para simular la fuente caída.")
+
+    def handle(self, *args, **opts):
+        promedio = float(opts["promedio"])
+        fallar = opts["fallar"]
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if fallar:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                ahora = datetime.now(timezone.utc).isoformat()
+                cuerpo = json.dumps([
+                    {"fuente": "oficial", "nombre": "Oficial", "promedio": promedio, "fechaActualizacion": ahora},
+                    {"fuente": "paralelo", "nombre": "Paralelo", "promedio": round(promedio * 1.1, 2),
+                     "fechaActualizacion": ahora},
+                ]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, formato, *args):
+                pass
+
+        servidor = ThreadingHTTPServer(("127.0.0.1", opts["puerto"]), Manejador)
+        self.stdout.write(f"dolarapi simulada en http://127.0.0.1:{opts['puerto']}/v1/dolares (Ctrl+C para salir)")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
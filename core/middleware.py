@@ -1,36 +1,122 @@
+import json
+import logging
+from contextlib import ExitStack
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.conf import settings
 
+from core import instrumentacion
+
+logger = logging.getLogger("core.instrumentacion")
+
 class LoginRequiredMiddleware:
     """
     Fuerza login en todo excepto:
     - login/logout
     - admin (Django ya protege)
     - staticfiles
+    - API (core.api pide su propio token)
     """
     def __init__(self, get_response):
         self.get_response = get_response
+        # Se resuelven una vez al arrancar, no en cada request.
+        self.login_url = reverse("login")
+        self.exentas = (
+            settings.STATIC_URL,
+            "/admin/",  # Django maneja auth ahí
+            "/api/",  # responde 401 en JSON, no redirige al login
+            self.login_url,
+            reverse("logout"),
+        )
 
     def __call__(self, request):
-        path = request.path
-
-        # Permitir estáticos
-        if path.startswith(getattr(settings, "STATIC_URL", "/static/")):
-            return self.get_response(request)
-
-        # Permitir admin (Django maneja auth ahí)
-        if path.startswith("/admin/"):
-            return self.get_response(request)
-
-        # Permitir login/logout
-        login_url = reverse("login")
-        logout_url = reverse("logout")
-        if path.startswith(login_url) or path.startswith(logout_url):
+        if request.path.startswith(self.exentas):
             return self.get_response(request)
 
         # Si no está logeado, redirigir
         if not request.user.is_authenticated:
-            return redirect(f"{login_url}?next={request.get_full_path()}")
+            return redirect(f"{self.login_url}?next={request.get_full_path()}")
 
         return self.get_response(request)
+
+
+class InstrumentacionMiddleware:
+    """
+    Opcional (settings.INSTRUMENTACION). Por cada request cuenta las consultas
+    y el tiempo en BD, y suma las llamadas salientes de core.services (Groq,
+    dolarapi). Los resultados salen en la cabecera Server-Timing.
+
+    Si el request pasa de INSTRUMENTACION_LENTA_MS, o alguna consulta se repite
+    INSTRUMENTACION_REPETIDAS veces o más (el típico N+1), se escribe una línea
+    JSON en el logger "core.instrumentacion".
+
+    Con el pool de psycopg activo (PostgreSQL) también se informa cuántas
+    conexiones del pool están libres y cuántos requests esperan una.
+
+    En respuestas en streaming solo se cuenta lo que corre antes de empezar a
+    enviar el cuerpo.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, "INSTRUMENTACION", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.lenta_ms = getattr(settings, "INSTRUMENTACION_LENTA_MS", 500)
+        self.repetidas = getattr(settings, "INSTRUMENTACION_REPETIDAS", 5)
+
+    def __call__(self, request):
+        medicion, token = instrumentacion.iniciar()
+        try:
+            with ExitStack() as pila:
+                for alias in settings.DATABASES:
+                    pila.enter_context(connections[alias].execute_wrapper(medicion.envoltorio))
+                response = self.get_response(request)
+        finally:
+            instrumentacion.terminar(token)
+
+        total_ms = medicion.total * 1000
+        response["Server-Timing"] = self._server_timing(medicion, total_ms)
+
+        duplicadas = medicion.duplicadas(self.repetidas)
+        if total_ms >= self.lenta_ms or duplicadas:
+            self._registrar(request, response, medicion, total_ms, duplicadas)
+        return response
+
+    @staticmethod
+    def _server_timing(medicion, total_ms):
+        partes = [f'db;dur={medicion.tiempo_bd * 1000:.1f};desc="{medicion.consultas} consultas"']
+        for nombre, (llamadas, segundos) in medicion.externos.items():
+            partes.append(f'{nombre};dur={segundos * 1000:.1f};desc="{llamadas} llamadas"')
+        aciertos, fallos = medicion.fragmentos
+        if aciertos or fallos:
+            partes.append(f'fragmentos;desc="{aciertos}/{aciertos + fallos} en caché"')
+        for alias, stats in instrumentacion.estadisticas_pool().items():
+            partes.append(
+                f'pool-{alias};desc="{stats.get("pool_available", 0)}/{stats.get("pool_size", 0)} libres, '
+                f'{stats.get("requests_waiting", 0)} esperando"'
+            )
+        partes.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(partes)
+
+    @staticmethod
+    def _registrar(request, response, medicion, total_ms, duplicadas):
+        match = getattr(request, "resolver_match", None)
+        logger.warning(json.dumps({
+            "evento": "request_lento" if not duplicadas else "consultas_repetidas",
+            "vista": match.view_name if match else None,
+            "metodo": request.method,
+            "ruta": request.path,
+            "status": response.status_code,
+            "total_ms": round(total_ms, 1),
+            "consultas": medicion.consultas,
+            "bd_ms": round(medicion.tiempo_bd * 1000, 1),
+            "externos": {
+                nombre: {"llamadas": n, "ms": round(s * 1000, 1)}
+                for nombre, (n, s) in medicion.externos.items()
+            },
+            "fragmentos": {"aciertos": medicion.fragmentos[0], "fallos": medicion.fragmentos[1]},
+            "pool": instrumentacion.estadisticas_pool(),
+            "repetidas": [{"veces": n, "sql": sql[:300]} for n, sql in duplicadas[:10]],
+        }, ensure_ascii=False))
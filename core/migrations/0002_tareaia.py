@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_cache_table'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareaIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('descripcion', 'Descripción de producto'), ('precio', 'Precio sugerido'), ('riesgo', 'Riesgo de cobro'), ('resumen', 'Resumen del negocio'), ('asistente', 'Asistente de inventario')], max_length=20)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('completada', 'Completada'), ('fallida', 'Fallida')], default='pendiente', max_length=20)),
+                ('objeto_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('prompt', models.TextField(blank=True)),
+                ('resultado', models.TextField(blank=True)),
+                ('error', models.TextField(blank=True)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('iniciada_at', models.DateTimeField(blank=True, null=True)),
+                ('terminada_at', models.DateTimeField(blank=True, null=True)),
+                ('creada_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tareas_ia', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['estado', 'created_at'], name='tareaia_estado_idx')],
+            },
+        ),
+    ]
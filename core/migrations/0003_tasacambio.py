@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_tareaia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TasaCambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tasa', models.DecimalField(decimal_places=4, max_digits=14)),
+                ('fuente', models.CharField(default='oficial', max_length=40)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Tasa de cambio',
+                'verbose_name_plural': 'Tasas de cambio',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
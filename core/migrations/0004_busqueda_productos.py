@@ -0,0 +1,78 @@
+from django.db import migrations
+
+# Ver core/busqueda.py. Cada motor tiene su propio índice de búsqueda; en los
+# demás no se crea nada y la búsqueda usa icontains.
+
+POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() no es IMMUTABLE y no sirve en un índice: se envuelve.
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS producto_nombre_trgm_idx
+    ON producto_producto USING gin (f_unaccent(lower(nombre)) gin_trgm_ops)
+    """,
+]
+
+POSTGRES_REVERSA = [
+    "DROP INDEX IF EXISTS producto_nombre_trgm_idx",
+    "DROP FUNCTION IF EXISTS f_unaccent(text)",
+]
+
+SQLITE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS producto_busqueda
+    USING fts5(nombre, tokenize = 'unicode61 remove_diacritics 2')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS producto_busqueda_ai AFTER INSERT ON producto_producto BEGIN
+        INSERT INTO producto_busqueda(rowid, nombre) VALUES (new.id, new.nombre);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS producto_busqueda_ad AFTER DELETE ON producto_producto BEGIN
+        DELETE FROM producto_busqueda WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS producto_busqueda_au AFTER UPDATE OF nombre ON producto_producto BEGIN
+        UPDATE producto_busqueda SET nombre = new.nombre WHERE rowid = old.id;
+    END
+    """,
+    "DELETE FROM producto_busqueda",
+    "INSERT INTO producto_busqueda(rowid, nombre) SELECT id, nombre FROM producto_producto",
+]
+
+SQLITE_REVERSA = [
+    "DROP TRIGGER IF EXISTS producto_busqueda_ai",
+    "DROP TRIGGER IF EXISTS producto_busqueda_ad",
+    "DROP TRIGGER IF EXISTS producto_busqueda_au",
+    "DROP TABLE IF EXISTS producto_busqueda",
+]
+
+
+def _ejecutar(sentencias):
+    def _correr(apps, schema_editor):
+        por_motor = sentencias.get(schema_editor.connection.vendor, [])
+        for sql in por_motor:
+            schema_editor.execute(sql)
+    return _correr
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_tasacambio"),
+        ("producto", "0006_producto_nombre_id_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _ejecutar({"postgresql": POSTGRES, "sqlite": SQLITE}),
+            _ejecutar({"postgresql": POSTGRES_REVERSA, "sqlite": SQLITE_REVERSA}),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_busqueda_productos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenAPI',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=80, unique=True)),
+                ('clave_hash', models.CharField(editable=False, max_length=64, unique=True)),
+                ('activo', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Token de API',
+                'verbose_name_plural': 'Tokens de API',
+                'ordering': ['nombre'],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:45
+
+import importlib
+
+from django.db import migrations
+
+# En SQLite, agregar producto.updated_at reconstruye la tabla producto_producto
+# y se pierden los triggers que mantienen producto_busqueda (core 0004). Se
+# vuelven a crear y se repuebla el índice; en los demás motores no hace nada.
+busqueda = importlib.import_module("core.migrations.0004_busqueda_productos")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_tokenapi"),
+        ("producto", "0008_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(busqueda._ejecutar({"sqlite": busqueda.SQLITE}), migrations.RunPython.noop),
+    ]
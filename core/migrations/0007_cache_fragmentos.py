@@ -0,0 +1,19 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def crear_tablas_cache(apps, schema_editor):
+    # Crea core_cache_fragmentos (L2 de la caché "fragmentos"); las tablas que
+    # ya existen no se tocan.
+    call_command("createcachetable", database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_busqueda_productos_triggers"),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_tablas_cache, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_cache_fragmentos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tareaia',
+            name='reintentar_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,3 +1,110 @@
+import hashlib
+import secrets
+
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class TareaIA(models.Model):
+    """
+    Trabajo de IA (Groq) encolado desde una vista y ejecutado por
+    `manage.py run_ai_worker`, fuera del ciclo request/response.
+    """
+    class Tipo(models.TextChoices):
+        DESCRIPCION = "descripcion", "Descripción de producto"
+        PRECIO = "precio", "Precio sugerido"
+        RIESGO = "riesgo", "Riesgo de cobro"
+        RESUMEN = "resumen", "Resumen del negocio"
+        ASISTENTE = "asistente", "Asistente de inventario"
+
+    class Estado(models.TextChoices):
+        PENDIENTE = "pendiente", "Pendiente"
+        EN_PROCESO = "en_proceso", "En proceso"
+        COMPLETADA = "completada", "Completada"
+        FALLIDA = "fallida", "Fallida"
+
+    tipo = models.CharField(max_length=20, choices=Tipo.choices)
+    estado = models.CharField(max_length=20, choices=Estado.choices, default=Estado.PENDIENTE)
+
+    # Producto o Venta según el tipo; vacío para resumen/asistente
+    objeto_id = models.PositiveBigIntegerField(null=True, blank=True)
+    prompt = models.TextField(blank=True)
+
+    resultado = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    intentos = models.PositiveIntegerField(default=0)
+
+    creada_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='tareas_ia'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    iniciada_at = models.DateTimeField(null=True, blank=True)
+    terminada_at = models.DateTimeField(null=True, blank=True)
+    # tras un límite de Groq (429) la tarea vuelve a la cola, pero no antes de esto
+    reintentar_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            # cola: pendientes en orden de llegada
+            models.Index(fields=["estado", "created_at"], name="tareaia_estado_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} ({self.estado})"
+
+    @property
+    def terminada(self):
+        return self.estado in (self.Estado.COMPLETADA, self.Estado.FALLIDA)
+
+
+class TasaCambio(models.Model):
+    """
+    Historial de la tasa USD -> Bs. La lee el request (última fila) y la
+    escribe el refresco en segundo plano o `manage.py refrescar_tasa`.
+    """
+    tasa = models.DecimalField(max_digits=14, decimal_places=4)
+    fuente = models.CharField(max_length=40, default="oficial")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Tasa de cambio"
+        verbose_name_plural = "Tasas de cambio"
+
+    def __str__(self):
+        return f"{self.tasa} ({self.fuente}, {self.created_at:%Y-%m-%d %H:%M})"
+
+
+class TokenAPI(models.Model):
+    """
+    Credencial de la API JSON (/api/v1/) para terminales de venta y el
+    catálogo en línea. Solo se guarda el SHA-256 de la clave; la clave en
+    claro se muestra una vez, al crearla con `manage.py crear_token_api`.
+    """
+    nombre = models.CharField(max_length=80, unique=True)
+    clave_hash = models.CharField(max_length=64, unique=True, editable=False)
+    activo = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["nombre"]
+        verbose_name = "Token de API"
+        verbose_name_plural = "Tokens de API"
+
+    def __str__(self):
+        return self.nombre
+
+    @staticmethod
+    def hashear(clave):
+        return hashlib.sha256(clave.encode()).hexdigest()
+
+    @classmethod
+    def crear(cls, nombre):
+        """Crea el token y devuelve (token, clave en claro)."""
+        clave = secrets.token_urlsafe(32)
+        return cls.objects.create(nombre=nombre, clave_hash=cls.hashear(clave)), clave
@@ -0,0 +1,139 @@
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+En vez de OFFSET, cada página filtra "después de la última fila vista" sobre
+las columnas de orden, así que el costo de cualquier página es el mismo con
+100 o con 100k filas (siempre que exista un índice sobre esas columnas).
+"""
+import base64
+import datetime
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def _a_json(valor):
+    # isoformat() completo: DjangoJSONEncoder recorta microsegundos y el cursor
+    # sobre fechas podría saltarse filas.
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f"No serializable en cursor: {type(valor).__name__}")
+
+
+def codificar_cursor(valores):
+    crudo = json.dumps(list(valores), default=_a_json, separators=(",", ":"))
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    """Devuelve la lista de valores del cursor, o None si es inválido."""
+    if not cursor:
+        return None
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode())
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return valores if isinstance(valores, list) else None
+
+
+def _filtro_despues(orden, valores):
+    """
+    (a, b) > (va, vb)  ==>  a >= va  AND  (a > va  OR  (a = va AND b > vb))
+    Un "-" delante del campo invierte la comparación.
+
+    El `a >= va` de adelante es redundante para el resultado, pero es el rango
+    con el que la BD busca en el índice (a, b) en vez de recorrerlo desde el
+    principio: sin él, SQLite no puede usar el OR para acotar la búsqueda.
+    """
+    filtro = Q()
+    iguales = {}
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip("-")
+        lookup = "lt" if campo.startswith("-") else "gt"
+        filtro |= Q(**iguales, **{f"{nombre}__{lookup}": valor})
+        iguales[nombre] = valor
+    if len(orden) > 1:
+        primero = orden[0]
+        lookup = "lte" if primero.startswith("-") else "gte"
+        filtro &= Q(**{f"{primero.lstrip('-')}__{lookup}": valores[0]})
+    return filtro
+
+
+class PaginaKeyset:
+    """
+    Página perezosa: la consulta solo corre al iterar (o al pedir el cursor
+    siguiente), así una plantilla con fragmentos en caché puede saltársela.
+
+    `orden` debe terminar en una columna única (normalmente "id" / "-id").
+    """
+
+    def __init__(self, queryset, orden, cursor=None, por_pagina=50):
+        self.orden = list(orden)
+        self.por_pagina = por_pagina
+        self.cursor = cursor or ""
+        valores = decodificar_cursor(cursor)
+        if valores is not None and len(valores) != len(self.orden):
+            valores = None
+        qs = queryset.order_by(*self.orden)
+        if valores is not None:
+            try:
+                qs = qs.filter(_filtro_despues(self.orden, valores))
+            except (ValueError, TypeError, ValidationError):
+                self.cursor = ""
+        self._queryset = qs
+        self._filas = None
+        self._hay_mas = False
+        self._ultima = None
+
+    def _cargar(self):
+        if self._filas is None:
+            filas = list(self._queryset[: self.por_pagina + 1])
+            self._hay_mas = len(filas) > self.por_pagina
+            self._filas = filas[: self.por_pagina]
+            self._ultima = self._filas[-1] if self._filas else None
+        return self._filas
+
+    def iterar(self, chunk_size=500):
+        """
+        Recorre la página sin guardarla en memoria (QuerySet.iterator()), para
+        respuestas en streaming. `siguiente_cursor` se puede leer al terminar.
+        """
+        self._filas = []
+        for n, fila in enumerate(self._queryset[: self.por_pagina + 1].iterator(chunk_size=chunk_size)):
+            if n == self.por_pagina:
+                self._hay_mas = True
+                break
+            self._ultima = fila
+            yield fila
+
+    def __iter__(self):
+        return iter(self._cargar())
+
+    def __len__(self):
+        return len(self._cargar())
+
+    def __bool__(self):
+        return bool(self._cargar())
+
+    @property
+    def es_primera(self):
+        return not self.cursor
+
+    @property
+    def siguiente_cursor(self):
+        if self._filas is None:
+            self._cargar()
+        if not self._hay_mas or self._ultima is None:
+            return None
+        return codificar_cursor(self._valor(self._ultima, campo.lstrip("-")) for campo in self.orden)
+
+    @staticmethod
+    def _valor(fila, campo):
+        if isinstance(fila, dict):
+            return fila[campo]
+        return getattr(fila, campo)
@@ -0,0 +1,136 @@
+"""
+Reportes agregados, cacheados con los espacios versionados de core.cache.
+
+Cada reporte hace un número fijo de consultas agrupadas sobre tablas resumen
+(ProductoStock, VentaDiaria) o sobre un rango de fechas indexado, sin importar
+cuántos proveedores o años de historia haya. El resultado se guarda con una
+clave que cambia sola cuando se escribe una compra, venta o producto.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import DecimalField, F, Sum
+from django.utils import timezone
+
+from core import cache as cache_versionada
+from movimiento.models import Movimiento, VentaDiaria
+from producto.models import ProductoStock
+from proveedor.models import Proveedor
+
+REPORTE_TIMEOUT = 60 * 60
+_DECIMAL = DecimalField(max_digits=18, decimal_places=2)
+_CERO = Decimal("0.00")
+
+
+def _compras_por_proveedor(desde, hasta):
+    """{proveedor_id: (unidades, costo)} de compras vigentes en el rango."""
+    if desde is None and hasta is None:
+        # Sin rango, el libro de stock ya tiene los acumulados por producto.
+        filas = (
+            ProductoStock.objects.values("producto__proveedor_id")
+            .annotate(unidades=Sum("cantidad_entrada"), costo=Sum("costo_entrada"))
+            .order_by()
+        )
+    else:
+        compras = Movimiento.objects.filter(tipo=Movimiento.Tipo.ENTRADA, anulada=False)
+        if desde is not None:
+            compras = compras.filter(fecha__gte=timezone.make_aware(datetime.combine(desde, time.min)))
+        if hasta is not None:
+            compras = compras.filter(
+                fecha__lt=timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+            )
+        filas = (
+            compras.values("producto__proveedor_id")
+            .annotate(
+                unidades=Sum("cantidad"),
+                costo=Sum(F("cantidad") * F("precio_unitario"), output_field=_DECIMAL),
+            )
+            .order_by()
+        )
+    return {r["producto__proveedor_id"]: (int(r["unidades"] or 0), r["costo"] or _CERO) for r in filas}
+
+
+def _ventas_por_proveedor(desde, hasta):
+    """{proveedor_id: (unidades, ingresos, costo)} desde el resumen diario."""
+    resumen = VentaDiaria.objects.all()
+    if desde is not None:
+        resumen = resumen.filter(dia__gte=desde)
+    if hasta is not None:
+        resumen = resumen.filter(dia__lte=hasta)
+    filas = (
+        resumen.values("proveedor_id")
+        .annotate(unidades=Sum("unidades"), ingresos=Sum("ingresos"), costo=Sum("costo"))
+        .order_by()
+    )
+    return {
+        r["proveedor_id"]: (int(r["unidades"] or 0), r["ingresos"] or _CERO, r["costo"] or _CERO)
+        for r in filas
+    }
+
+
+def _valor_stock_por_proveedor():
+    """{proveedor_id: valor a costo del stock actual} (no depende del rango)."""
+    filas = (
+        ProductoStock.objects.values("producto__proveedor_id")
+        .annotate(valor=Sum("valor_costo"))
+        .order_by()
+    )
+    return {r["producto__proveedor_id"]: r["valor"] or _CERO for r in filas}
+
+
+def calcular_reporte_proveedores(desde=None, hasta=None):
+    """
+    Una fila por proveedor con unidades compradas y vendidas en el rango,
+    ingresos, margen, valor del stock actual a costo y tasa de venta
+    (vendidas / compradas). Son cuatro consultas en total.
+    """
+    compras = _compras_por_proveedor(desde, hasta)
+    ventas = _ventas_por_proveedor(desde, hasta)
+    valor_stock = _valor_stock_por_proveedor()
+
+    q = Decimal("0.01")
+    filas = []
+    for pid, nombre in Proveedor.objects.order_by("nombre").values_list("id", "nombre"):
+        compradas, costo_compras = compras.get(pid, (0, _CERO))
+        vendidas, ingresos, costo_ventas = ventas.get(pid, (0, _CERO, _CERO))
+        filas.append({
+            "proveedor_id": pid,
+            "proveedor": nombre,
+            "unidades_compradas": compradas,
+            "costo_compras": costo_compras.quantize(q),
+            "unidades_vendidas": vendidas,
+            "ingresos": ingresos.quantize(q),
+            "margen": (ingresos - costo_ventas).quantize(q),
+            "valor_stock": valor_stock.get(pid, _CERO).quantize(q),
+            "tasa_venta": (
+                (Decimal(vendidas) / Decimal(compradas) * 100).quantize(Decimal("0.1")) if compradas else None
+            ),
+        })
+
+    totales = {
+        campo: sum((f[campo] for f in filas), 0 if campo.startswith("unidades") else _CERO)
+        for campo in ("unidades_compradas", "costo_compras", "unidades_vendidas", "ingresos", "margen", "valor_stock")
+    }
+    totales["tasa_venta"] = (
+        (Decimal(totales["unidades_vendidas"]) / Decimal(totales["unidades_compradas"]) * 100).quantize(Decimal("0.1"))
+        if totales["unidades_compradas"] else None
+    )
+    return {"filas": filas, "totales": totales}
+
+
+def reporte_proveedores(desde=None, hasta=None, instantanea=None):
+    """
+    calcular_reporte_proveedores cacheado hasta la próxima compra, venta o cambio
+    de catálogo. La vista pasa en `instantanea` las versiones de su ETag; sin
+    ellas se leen frescas de L2.
+    """
+    clave = cache_versionada.clave(
+        ("catalogo", "compras", "ventas"), "reporte_proveedores", desde, hasta,
+        instantanea=instantanea, fresca=True,
+    )
+    reporte = cache.get(clave)
+    if reporte is None:
+        reporte = calcular_reporte_proveedores(desde, hasta)
+        cache.set(clave, reporte, REPORTE_TIMEOUT)
+    return reporte
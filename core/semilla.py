@@ -0,0 +1,184 @@
+"""
+Datos sintéticos para probar con volumen (seed_inventario, benchmark_vistas).
+
+Todo se inserta con bulk_create por lotes y al final se reconstruyen el libro
+de stock y el resumen diario de ventas. Las distribuciones imitan una joyería real: pocos proveedores
+concentran la mayoría de los productos (pesos de Pareto), los precios siguen
+una lognormal, las compras traen varias unidades y las ventas casi siempre una.
+Las ventas nunca superan el stock comprado del producto.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from core import stock
+from core import ventas_diarias
+from core import cache as cache_versionada
+from movimiento.models import Movimiento, Venta, PagoVenta
+from producto.models import Producto
+from proveedor.models import Proveedor
+from tipologia.models import TipoJoya
+
+TIPOS = ["Anillo", "Cadena", "Pulsera", "Zarcillos", "Dije", "Collar", "Esclava", "Tobillera", "Reloj", "Juego"]
+MATERIALES = ["oro 18k", "oro 10k", "plata 925", "acero", "oro laminado", "rodio", "titanio"]
+DETALLES = ["corazón", "cubana", "tejida", "con circones", "infinito", "trenzada", "clásica", "mariposa",
+            "perla", "inicial", "solitario", "doble"]
+LOTE = 5000
+DIAS = 365
+
+
+def _pesos_pareto(n, rng):
+    return [rng.paretovariate(1.2) for _ in range(n)]
+
+
+def _precio(rng, mediana):
+    return Decimal(str(round(rng.lognormvariate(0, 0.6) * mediana, 2)))
+
+
+@contextmanager
+def _sin_auto_now(*modelos):
+    """Permite fijar `fecha` en bulk_create (auto_now_add la pisaría)."""
+    campos = [m._meta.get_field("fecha") for m in modelos]
+    for campo in campos:
+        campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo in campos:
+            campo.auto_now_add = True
+
+
+def _por_lotes(total, lote=LOTE):
+    hecho = 0
+    while hecho < total:
+        n = min(lote, total - hecho)
+        yield n
+        hecho += n
+
+
+def sembrar(productos=1000, compras=5000, ventas=2000, pagos=1000, proveedores=25,
+            semilla=None, salida=None):
+    """
+    Inserta los datos y devuelve un dict con lo creado. `salida(texto)` recibe
+    el progreso. Los proveedores y tipos existentes con el mismo nombre se reutilizan.
+    """
+    rng = random.Random(semilla)
+    avisar = salida or (lambda texto: None)
+    ahora = timezone.now()
+
+    def fecha():
+        # más movimiento en los meses recientes
+        return ahora - timedelta(days=DIAS * rng.random() ** 1.5, seconds=rng.randrange(86400))
+
+    # ---------- Catálogo ----------
+    nombres_prov = [f"Proveedor {i:03d}" for i in range(1, proveedores + 1)]
+    Proveedor.objects.bulk_create([Proveedor(nombre=n) for n in nombres_prov], ignore_conflicts=True)
+    TipoJoya.objects.bulk_create([TipoJoya(nombre=n) for n in TIPOS], ignore_conflicts=True)
+    prov_ids = list(Proveedor.objects.filter(nombre__in=nombres_prov).values_list("id", flat=True))
+    tipos = dict(TipoJoya.objects.filter(nombre__in=TIPOS).values_list("id", "nombre"))
+    tipo_ids = list(tipos)
+    pesos_prov = _pesos_pareto(len(prov_ids), rng)
+    pesos_tipo = _pesos_pareto(len(tipo_ids), rng)
+
+    inicio = Producto.objects.count()
+    for n in _por_lotes(productos):
+        lote = []
+        for _ in range(n):
+            inicio += 1
+            tipo_id = rng.choices(tipo_ids, pesos_tipo)[0]
+            costo = _precio(rng, 25)
+            lote.append(Producto(
+                nombre=f"{tipos[tipo_id]} {rng.choice(DETALLES)} {rng.choice(MATERIALES)} #{inicio}",
+                proveedor_id=rng.choices(prov_ids, pesos_prov)[0],
+                tipo_id=tipo_id,
+                costo_unitario=costo,
+                precio_venta_unitario=(costo * Decimal("1.8")).quantize(Decimal("0.01")),
+            ))
+        Producto.objects.bulk_create(lote)
+    avisar(f"{productos} productos")
+
+    # Últimos `productos` creados, con su popularidad (pesos) y su costo.
+    filas = list(
+        Producto.objects.order_by("-id").values_list("id", "costo_unitario", "precio_venta_unitario")[:productos]
+    )
+    if not filas:
+        return {"productos": 0, "compras": 0, "ventas": 0, "pagos": 0}
+    ids = [f[0] for f in filas]
+    costos = {f[0]: f[1] for f in filas}
+    precios = {f[0]: f[2] for f in filas}
+    popularidad = _pesos_pareto(len(ids), rng)
+    disponible = dict.fromkeys(ids, 0)
+
+    with _sin_auto_now(Movimiento, Venta, PagoVenta):
+        # ---------- Compras ----------
+        creadas = 0
+        for n in _por_lotes(compras):
+            lote = []
+            for pid in rng.choices(ids, popularidad, k=n):
+                cantidad = 1 + int(rng.expovariate(1 / 6))
+                disponible[pid] += cantidad
+                lote.append(Movimiento(
+                    tipo=Movimiento.Tipo.ENTRADA,
+                    producto_id=pid,
+                    cantidad=cantidad,
+                    precio_unitario=costos[pid],
+                    fecha=fecha(),
+                ))
+            Movimiento.objects.bulk_create(lote)
+            creadas += n
+            avisar(f"{creadas}/{compras} compras")
+
+        # ---------- Ventas y pagos ----------
+        total_ventas = total_pagos = 0
+        for n in _por_lotes(ventas):
+            lote = []
+            for _ in range(n):
+                for _intento in range(5):
+                    pid = rng.choices(ids, popularidad)[0]
+                    if disponible[pid]:
+                        break
+                else:
+                    continue
+                cantidad = min(disponible[pid], 1 if rng.random() < 0.8 else rng.randint(2, 4))
+                disponible[pid] -= cantidad
+                precio = precios[pid]
+                lote.append(Venta(
+                    producto_id=pid,
+                    cantidad=cantidad,
+                    precio_unitario=precio,
+                    costo_unitario=costos[pid],
+                    a_plazos=rng.random() < 0.35,
+                    fecha=fecha(),
+                    saldo=precio * cantidad,
+                ))
+            if not lote:
+                continue
+            Venta.objects.bulk_create(lote)
+            total_ventas += len(lote)
+
+            # pagos de este lote: proporcionales a su tamaño, sobre ventas a plazos
+            cuota = round(pagos * total_ventas / ventas) - total_pagos
+            a_plazos = [v for v in lote if v.a_plazos] or lote
+            nuevos = []
+            for venta in rng.choices(a_plazos, k=max(cuota, 0)):
+                if venta.saldo <= 0:
+                    continue
+                monto = min(venta.saldo, max(Decimal("0.01"), (venta.total * Decimal(str(rng.uniform(0.1, 0.5)))).quantize(Decimal("0.01"))))
+                venta.monto_pagado += monto
+                venta.saldo -= monto
+                nuevos.append(PagoVenta(venta_id=venta.id, monto=monto, fecha=venta.fecha + timedelta(days=rng.randint(0, 60))))
+            PagoVenta.objects.bulk_create(nuevos)
+            Venta.objects.bulk_update([v for v in a_plazos if v.monto_pagado], ["monto_pagado", "saldo"])
+            total_pagos += len(nuevos)
+            avisar(f"{total_ventas}/{ventas} ventas, {total_pagos} pagos")
+
+    with transaction.atomic():
+        stock.reconstruir(batch_size=LOTE)
+    ventas_diarias.reconstruir(batch_size=LOTE)
+    cache_versionada.invalidar(*cache_versionada.ESPACIOS)
+    avisar("libro de stock y resumen diario reconstruidos")
+    return {"productos": len(ids), "compras": compras, "ventas": total_ventas, "pagos": total_pagos}
@@ -1,103 +1,369 @@
 import requests
 import json
+import logging
+import math
+import os
+import random
 import re
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import httpx
 from groq import Groq, RateLimitError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from decimal import Decimal
 from django.core.cache import cache
 from django.conf import settings
+from django.db import connection
+from django.utils import timezone
 from django.db.models import Sum, Count, F
-from producto.models import Producto
+from producto.models import Producto, ProductoStock
 from proveedor.models import Proveedor
-from movimiento.models import Movimiento, Venta
+from movimiento.models import Venta
+from core.instrumentacion import registrar_externo
+from core import ventas_diarias
 
-DOLAR_API_URL = "https://ve.dolarapi.com/v1/dolares"
+logger = logging.getLogger(__name__)
 
-def generar_descripcion_ia(producto):
+
+# =========================
+# Clientes HTTP compartidos (por proceso)
+# =========================
+#
+# Un requests.Session y un cliente Groq por proceso, con pool de conexiones
+# keep-alive. Tras un fork (workers de gunicorn con --preload) el hijo crea los
+# suyos: nunca comparte sockets con el padre.
+
+class _EstadisticasCliente:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.solicitudes = 0
+        self.errores = 0
+        self.latencia_total = 0.0
+        self.latencia_max = 0.0
+        self.conexiones_nuevas = 0
+
+    def registrar(self, segundos, error=False):
+        with self._lock:
+            self.solicitudes += 1
+            self.errores += int(error)
+            self.latencia_total += segundos
+            self.latencia_max = max(self.latencia_max, segundos)
+
+    def conexion_nueva(self):
+        with self._lock:
+            self.conexiones_nuevas += 1
+
+    def como_dict(self, conexiones=None, sin_conteo=False):
+        """`sin_conteo`: no se pudo contar las conexiones; no se informa el reuso."""
+        with self._lock:
+            n = self.solicitudes
+            ok = n - self.errores
+            nuevas = None if sin_conteo else self.conexiones_nuevas if conexiones is None else conexiones
+            return {
+                "solicitudes": n,
+                "errores": self.errores,
+                "latencia_prom_ms": round(self.latencia_total / n * 1000, 1) if n else None,
+                "latencia_max_ms": round(self.latencia_max * 1000, 1),
+                "conexiones_nuevas": nuevas,
+                "reuso_conexiones": round(max(0.0, 1 - nuevas / ok), 3) if ok and nuevas is not None else None,
+            }
+
+
+# pausa entre reintentos de urllib3: HTTP_BACKOFF * 2 ** (n - 1) antes del reintento n >= 2
+HTTP_BACKOFF = 0.5
+
+
+class _RegistroClientes:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self._pid = os.getpid()
+        self._session = None
+        self._groq = None
+        self.stats = {"dolarapi": _EstadisticasCliente(), "groq": _EstadisticasCliente()}
+
+    def _revisar_fork(self):
+        if self._pid != os.getpid():
+            self._reiniciar()
+
+    def session(self):
+        self._revisar_fork()
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    reintentos = Retry(
+                        total=settings.HTTP_REINTENTOS,
+                        backoff_factor=HTTP_BACKOFF,
+                        status_forcelist=(429, 500, 502, 503, 504),
+                        allowed_methods=("GET",),
+                    )
+                    adaptador = HTTPAdapter(
+                        pool_connections=settings.HTTP_POOL_SIZE,
+                        pool_maxsize=settings.HTTP_POOL_SIZE,
+                        max_retries=reintentos,
+                    )
+                    session = requests.Session()
+                    session.mount("https://", adaptador)
+                    session.mount("http://", adaptador)
+                    self._session = session
+        return self._session
+
+    def groq(self, max_retries=None):
+        """Cliente Groq del proceso; con `max_retries`, una copia que comparte el pool."""
+        self._revisar_fork()
+        if self._groq is None:
+            with self._lock:
+                if self._groq is None:
+                    vistas = weakref.WeakSet()
+                    stats = self.stats["groq"]
+
+                    def contar_conexion(response):
+                        stream = response.extensions.get("network_stream")
+                        if stream is not None and stream not in vistas:
+                            vistas.add(stream)
+                            stats.conexion_nueva()
+
+                    http_client = httpx.Client(
+                        timeout=settings.GROQ_TIMEOUT,
+                        limits=httpx.Limits(
+                            max_connections=settings.HTTP_POOL_SIZE,
+                            max_keepalive_connections=settings.HTTP_POOL_SIZE,
+                        ),
+                        event_hooks={"response": [contar_conexion]},
+                    )
+                    self._groq = Groq(
+                        api_key=settings.GROQ_API_KEY,
+                        max_retries=settings.GROQ_REINTENTOS,
+                        http_client=http_client,
+                    )
+        if max_retries is None or max_retries == self._groq.max_retries:
+            return self._groq
+        return self._groq.with_options(max_retries=max_retries)
+
+    def _conexiones_http(self):
+        """
+        Conexiones que abrió el pool de urllib3 de la sesión, o None si no hay
+        sesión o esta versión de urllib3 no lo deja ver. Solo usa la parte
+        pública: PoolManager.pools (keys() y []) y num_connections de cada pool.
+        """
+        if self._session is None:
+            return None
+        try:
+            total = 0
+            for adaptador in set(self._session.adapters.values()):
+                pools = adaptador.poolmanager.pools
+                for clave in pools.keys():
+                    try:
+                        total += pools[clave].num_connections
+                    except KeyError:  # el pool se descartó mientras se contaba
+                        pass
+            return total
+        except (AttributeError, TypeError, NotImplementedError):
+            return None
+
+    def estadisticas(self):
+        conexiones_http = self._conexiones_http()
+        return {
+            "dolarapi": self.stats["dolarapi"].como_dict(
+                conexiones_http, sin_conteo=self._session is not None and conexiones_http is None
+            ),
+            "groq": self.stats["groq"].como_dict(),
+        }
+
+
+clientes = _RegistroClientes()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=clientes._reiniciar)
+
+
+@contextmanager
+def medir(nombre):
+    """
+    Cronometra una llamada saliente y la suma a las estadísticas del cliente
+    y a la medición del request en curso (core.instrumentacion).
+    """
+    inicio = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        duracion = time.perf_counter() - inicio
+        clientes.stats[nombre].registrar(duracion, error)
+        registrar_externo(nombre, duracion)
+
+
+def estadisticas_clientes():
+    return clientes.estadisticas()
+
+
+# Reintentos del cliente Groq en este contexto (None: settings.GROQ_REINTENTOS).
+_reintentos_groq = ContextVar("reintentos_groq", default=None)
+
+
+@contextmanager
+def sin_reintentos_groq():
+    """
+    Las llamadas a Groq dentro del bloque no reintentan solas: para quien ya
+    reintenta por su cuenta tras pasar por su propio límite de ritmo
+    (enriquecer_productos_ia), así ningún reintento se salta ese límite.
+    """
+    token = _reintentos_groq.set(0)
+    try:
+        yield
+    finally:
+        _reintentos_groq.reset(token)
+
+
+def _chat_groq(messages):
+    with medir("groq"):
+        completion = clientes.groq(_reintentos_groq.get()).chat.completions.create(
+            model="llama-3.3-70b-versatile",
+            messages=messages,
+        )
+    return completion.choices[0].message.content
+
+
+def http_get(url, **kwargs):
+    kwargs.setdefault("timeout", (settings.HTTP_TIMEOUT_CONEXION, settings.HTTP_TIMEOUT_LECTURA))
+    with medir("dolarapi"):
+        return clientes.session().get(url, **kwargs)
+
+
+class CuboDeTokens:
+    """
+    Limitador de ritmo (token bucket) para no pasar la cuota de Groq.
+    `capacidad` tokens como ráfaga, que se reponen a `por_minuto` / 60 por segundo.
+    Seguro entre hilos.
+    """
+
+    def __init__(self, por_minuto, capacidad=None):
+        self.tasa = por_minuto / 60.0
+        self.capacidad = float(capacidad or max(1, por_minuto // 6))
+        self.tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reponer(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    def tomar(self):
+        """Bloquea hasta que haya un token disponible."""
+        while True:
+            with self._lock:
+                self._reponer()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.tasa
+            time.sleep(espera)
+
+    def vaciar(self, segundos=0):
+        """Tras un 429: descarta la ráfaga y pausa a todos los hilos `segundos`."""
+        with self._lock:
+            self.tokens = -segundos * self.tasa
+            self._ultimo = time.monotonic()
+
+
+def espera_sugerida(error, intento):
+    """Segundos a esperar tras un 429: Retry-After de Groq si viene; si no, backoff exponencial con jitter."""
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return min(60.0, 2 ** intento) + random.uniform(0, 1)
+
+
+def redactar_descripcion_ia(producto):
+    """Como generar_descripcion_ia, pero deja pasar RateLimitError y demás errores."""
     cache_key = f"prod_desc_{producto.id}"
     cached_desc = cache.get(cache_key)
     if cached_desc:
         return cached_desc
 
+    prompt = f"Genera una descripción de lujo para una joya llamada {producto.nombre}, de tipo {producto.tipo} y del proveedor {producto.proveedor}."
+
+    descripcion = _chat_groq([
+        {"role": "system", "content": "Eres un experto en marketing de joyas de lujo."},
+        {"role": "user", "content": prompt}
+    ])
+    cache.set(cache_key, descripcion, 60 * 60 * 24)
+    return descripcion
+
+def generar_descripcion_ia(producto):
     try:
-        client = Groq(api_key=settings.GROQ_API_KEY)
-        prompt = f"Genera una descripción de lujo para una joya llamada {producto.nombre}, de tipo {producto.tipo} y del proveedor {producto.proveedor}."
-        
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "Eres un experto en marketing de joyas de lujo."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        descripcion = completion.choices[0].message.content
-        cache.set(cache_key, descripcion, 60 * 60 * 24)
-        return descripcion
+        return redactar_descripcion_ia(producto)
     except RateLimitError:
         return "El sistema está procesando muchas solicitudes en este momento. Por favor, intente de nuevo en unos minutos."
     except Exception as e:
         return f"Error al generar descripción: {str(e)}"
 
+def calcular_precio_sugerido_ia(producto):
+    """Como sugerir_precio_ia, pero deja pasar RateLimitError y demás errores."""
+    prompt = f"Basado en un costo unitario de {producto.costo_unitario} y el tipo de joya {producto.tipo}, sugiere un precio de venta unitario siguiendo márgenes de lujo. Devuelve solo el número decimal."
+
+    respuesta = _chat_groq([
+        {"role": "system", "content": "Eres un analista de precios para joyería de lujo. Responde solo con el valor numérico."},
+        {"role": "user", "content": prompt}
+    ]).strip()
+    numero = re.search(r"(\d+(\.\d+)?)", respuesta)
+    return Decimal(numero.group(1)) if numero else None
+
 def sugerir_precio_ia(producto):
     try:
-        client = Groq(api_key=settings.GROQ_API_KEY)
-        prompt = f"Basado en un costo unitario de {producto.costo_unitario} y el tipo de joya {producto.tipo}, sugiere un precio de venta unitario siguiendo márgenes de lujo. Devuelve solo el número decimal."
-        
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "Eres un analista de precios para joyería de lujo. Responde solo con el valor numérico."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        respuesta = completion.choices[0].message.content.strip()
-        numero = re.search(r"(\d+(\.\d+)?)", respuesta)
-        return Decimal(numero.group(1)) if numero else None
+        return calcular_precio_sugerido_ia(producto)
     except Exception:
         return None
 
+def evaluar_riesgo_cobro_ia(venta):
+    """Como analizar_riesgo_cobro_ia, pero deja pasar RateLimitError y demás errores."""
+    prompt = f"Venta total: {venta.total}, Saldo pendiente: {venta.deuda}. Categoriza el riesgo (Bajo, Medio, Alto) y sugiere una acción de cobro."
+
+    return _chat_groq([
+        {"role": "system", "content": "Eres un experto en gestión de riesgos y cobranzas."},
+        {"role": "user", "content": prompt}
+    ])
+
 def analizar_riesgo_cobro_ia(venta):
     try:
-        client = Groq(api_key=settings.GROQ_API_KEY)
-        prompt = f"Venta total: {venta.total}, Saldo pendiente: {venta.deuda}. Categoriza el riesgo (Bajo, Medio, Alto) y sugiere una acción de cobro."
-        
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "Eres un experto en gestión de riesgos y cobranzas."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return completion.choices[0].message.content
+        return evaluar_riesgo_cobro_ia(venta)
     except Exception as e:
         return f"Error en análisis de riesgo: {str(e)}"
 
+def redactar_resumen_negocio_ia(datos):
+    """Como generar_resumen_negocio_ia, pero deja pasar RateLimitError y demás errores."""
+    variacion = datos.get("variacion_ventas_mes")
+    comparacion = f" ({variacion:+}% frente al mismo tramo del mes anterior)" if variacion is not None else ""
+    prompt = (
+        f"Valor total inventario: {datos['valor_inventario']}, Deudas por cobrar: {datos['total_deudas']}, "
+        f"Ventas del mes: {datos['ventas_mes']}{comparacion}, Cobrado en el mes: {datos.get('cobrado_mes', 0)}, "
+        f"Ventas del año: {datos.get('ventas_anio', 0)}. Devuelve un análisis de 3 puntos sobre el estado financiero."
+    )
+
+    return _chat_groq([
+        {"role": "system", "content": "Eres un consultor financiero de alto nivel."},
+        {"role": "user", "content": prompt}
+    ])
+
 def generar_resumen_negocio_ia(datos):
     try:
-        client = Groq(api_key=settings.GROQ_API_KEY)
-        prompt = f"Valor total inventario: {datos['valor_inventario']}, Deudas por cobrar: {datos['total_deudas']}, Ventas del mes: {datos['ventas_mes']}. Devuelve un análisis de 3 puntos sobre el estado financiero."
-        
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "Eres un consultor financiero de alto nivel."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return completion.choices[0].message.content
+        return redactar_resumen_negocio_ia(datos)
     except Exception as e:
         return f"Error al generar resumen: {str(e)}"
 
 def obtener_estadisticas_inventario():
     total_productos = Producto.objects.count()
-    compras = Movimiento.objects.filter(tipo="IN", anulada=False).values("producto_id").annotate(total_in=Sum("cantidad"))
-    ventas = Venta.objects.values("producto_id").annotate(total_out=Sum("cantidad"))
-    compras_map = {c["producto_id"]: c["total_in"] for c in compras}
-    ventas_map = {v["producto_id"]: v["total_out"] for v in ventas}
-    valor_total = Decimal("0.00")
-    for p in Producto.objects.all():
-        qty = compras_map.get(p.id, 0) - ventas_map.get(p.id, 0)
-        if qty > 0:
-            valor_total += Decimal(qty) * p.costo_unitario
+    valor_total = ProductoStock.objects.aggregate(s=Sum("valor_costo"))["s"] or Decimal("0.00")
     proveedor_top = Proveedor.objects.annotate(num_prod=Count("productos")).order_by("-num_prod").first()
     return {
         "total_productos": total_productos,
@@ -105,44 +371,172 @@ def obtener_estadisticas_inventario():
         "proveedor_con_mas_articulos": proveedor_top.nombre if proveedor_top else "Ninguno"
     }
 
+def datos_resumen_negocio():
+    stats = obtener_estadisticas_inventario()
+    # Mes y año en curso salen del resumen diario (pocas filas por día).
+    hoy = timezone.localdate()
+    mes = ventas_diarias.comparar_mes_a_la_fecha(hoy)
+    anio = ventas_diarias.anio_a_la_fecha(hoy)
+    total_deudas = (
+        Venta.objects.filter(a_plazos=True, saldo__gt=0).aggregate(s=Sum("saldo"))["s"]
+        or Decimal("0.00")
+    )
+    return {
+        "valor_inventario": stats["valor_stock_usd"],
+        "total_deudas": total_deudas,
+        "ventas_mes": mes["actual"]["ingresos"],
+        "ventas_mes_anterior": mes["anterior"]["ingresos"],
+        "variacion_ventas_mes": mes["variacion"]["ingresos"],
+        "ventas_anio": anio["ingresos"],
+        "cobrado_mes": mes["actual"]["pagos"],
+    }
+
+def responder_asistente_ia(query):
+    """Como asistente_inventario_ia, pero deja pasar RateLimitError y demás errores."""
+    stats = obtener_estadisticas_inventario()
+    context = f"Estadísticas actuales: {stats}"
+
+    return _chat_groq([
+        {"role": "system", "content": f"Eres un asistente de inventario. {context}"},
+        {"role": "user", "content": query}
+    ])
+
 def asistente_inventario_ia(query):
     try:
-        client = Groq(api_key=settings.GROQ_API_KEY)
-        stats = obtener_estadisticas_inventario()
-        context = f"Estadísticas actuales: {stats}"
-        
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": f"Eres un asistente de inventario. {context}"},
-                {"role": "user", "content": query}
-            ]
-        )
-        return completion.choices[0].message.content
+        return responder_asistente_ia(query)
     except RateLimitError:
         return "El sistema está procesando muchas solicitudes en este momento. Por favor, intente de nuevo en unos minutos."
     except Exception as e:
         return f"Error en el asistente: {str(e)}"
 
-def obtener_usd_bs_rate():
-    cache_key = "usd_bs_rate"
-    rate = cache.get(cache_key)
-    if rate:
-        return Decimal(rate)
+# =========================
+# Tasa USD -> Bs (stale-while-revalidate)
+# =========================
+#
+# El request nunca llama a dolarapi: lee la última TasaCambio guardada (caché +
+# una fila por índice). Si está vencida, lanza un refresco en un hilo aparte;
+# un candado en la caché compartida garantiza un solo refresco a la vez entre
+# todos los workers. Si dolarapi está caída se sigue sirviendo la última tasa,
+# con su fecha, y no se vuelve a intentar hasta que pase una espera que se
+# duplica con cada fallo seguido (TASA_REINTENTO_SEGUNDOS, hasta
+# TASA_REINTENTO_MAX_SEGUNDOS). Sin la espera, cada request con la tasa
+# vencida lanzaría otro hilo contra la fuente caída.
+
+TASA_CACHE_KEY = "tasa_actual"
+TASA_LOCK_KEY = "tasa_refrescando"
+TASA_FALLOS_KEY = "tasa_fallos"
+TASA_ESPERA_KEY = "tasa_espera"
+# Sin ninguna TasaCambio guardada se recuerda eso un rato, para no repetir la
+# consulta vacía en cada request. refrescar_tasa lo pisa al guardar una.
+SIN_TASA = "sin-tasa"
+SIN_TASA_SEGUNDOS = 30
+
+
+def _candado_tasa_segundos():
+    """
+    Vida del candado de refresco: lo más que tarda refrescar_tasa si cada
+    intento de http_get agota sus timeouts, más las pausas entre reintentos y
+    un margen para guardar. Con un candado más corto, otro worker lanzaría un
+    segundo refresco mientras el primero sigue esperando a la fuente.
+    """
+    intentos = settings.HTTP_REINTENTOS + 1
+    por_intento = settings.HTTP_TIMEOUT_CONEXION + settings.HTTP_TIMEOUT_LECTURA
+    pausas = sum(
+        min(HTTP_BACKOFF * 2 ** (n - 1), Retry.DEFAULT_BACKOFF_MAX) for n in range(2, intentos)
+    )
+    return math.ceil(intentos * por_intento + pausas) + 10
+
+
+def tasa_actual():
+    """Última TasaCambio guardada, o None si nunca se obtuvo una."""
+    from core.models import TasaCambio
+
+    tasa = cache.get(TASA_CACHE_KEY)
+    if tasa is None:
+        tasa = TasaCambio.objects.order_by("-created_at").first()
+        if tasa is None:
+            cache.set(TASA_CACHE_KEY, SIN_TASA, SIN_TASA_SEGUNDOS)
+        else:
+            cache.set(TASA_CACHE_KEY, tasa, 60 * 5)
+    return None if tasa == SIN_TASA else tasa
+
+
+def tasa_vencida(tasa):
+    if tasa is None:
+        return True
+    edad = (timezone.now() - tasa.created_at).total_seconds()
+    return edad > settings.TASA_VIGENCIA_SEGUNDOS
+
+
+def consultar_dolarapi():
+    """Tasa oficial según dolarapi (o el sustituto en DOLAR_API_URL). Lanza si falla."""
+    response = http_get(settings.DOLAR_API_URL)
+    response.raise_for_status()
+    for item in response.json():
+        if item.get("fuente") == "oficial" and item.get("promedio"):
+            return Decimal(str(item["promedio"]))
+    raise ValueError("La respuesta de dolarapi no trae la tasa oficial.")
+
 
+def _registrar_fallo_tasa():
+    """Cuenta el fallo y abre la espera antes del próximo refresco automático."""
+    fallos = (cache.get(TASA_FALLOS_KEY) or 0) + 1
+    cache.set(TASA_FALLOS_KEY, fallos, 60 * 60 * 24)
+    espera = min(
+        settings.TASA_REINTENTO_SEGUNDOS * 2 ** (fallos - 1),
+        settings.TASA_REINTENTO_MAX_SEGUNDOS,
+    )
+    cache.set(TASA_ESPERA_KEY, fallos, espera)
+    return espera
+
+
+def refrescar_tasa(tomar_candado=True):
+    """
+    Consulta la fuente y guarda una nueva fila. Devuelve la TasaCambio nueva, o
+    None si otro proceso ya está refrescando o la fuente falló. No respeta la
+    espera tras un fallo (la usa `manage.py refrescar_tasa`), pero la alarga
+    si vuelve a fallar.
+    """
+    from core.models import TasaCambio
+    from core import cache as cache_versionada
+
+    if tomar_candado and not cache.add(TASA_LOCK_KEY, os.getpid(), _candado_tasa_segundos()):
+        return None
     try:
-        response = requests.get(DOLAR_API_URL, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-
-        for item in data:
-            if item.get("fuente") == "oficial":
-                promedio = item.get("promedio")
-                if promedio:
-                    rate = Decimal(str(promedio))
-                    cache.set(cache_key, str(rate), 60 * 30)
-                    return rate
-    except Exception:
-        pass
+        valor = consultar_dolarapi()
+        tasa = TasaCambio.objects.create(tasa=valor, fuente="oficial")
+        cache.set(TASA_CACHE_KEY, tasa, 60 * 5)
+        cache.delete_many([TASA_FALLOS_KEY, TASA_ESPERA_KEY])
+        cache_versionada.invalidar("tasa")
+        return tasa
+    except Exception as e:
+        espera = _registrar_fallo_tasa()
+        logger.warning("No se pudo refrescar la tasa USD/Bs: %s (próximo intento en %ss)", e, espera)
+        return None
+    finally:
+        cache.delete(TASA_LOCK_KEY)
+
+
+def refrescar_tasa_en_segundo_plano():
+    """Lanza el refresco en un hilo si nadie más lo está haciendo y no hay espera por un fallo."""
+    if cache.get(TASA_ESPERA_KEY) is not None:
+        return False
+    if not cache.add(TASA_LOCK_KEY, os.getpid(), _candado_tasa_segundos()):
+        return False
+
+    def _trabajo():
+        try:
+            refrescar_tasa(tomar_candado=False)
+        finally:
+            connection.close()
+
+    threading.Thread(target=_trabajo, name="refresco-tasa", daemon=True).start()
+    return True
+
 
-    return Decimal("0.00")
+def obtener_tasa():
+    """Última tasa conocida; si está vencida, pide un refresco sin esperar."""
+    tasa = tasa_actual()
+    if tasa_vencida(tasa):
+        refrescar_tasa_en_segundo_plano()
+    return tasa
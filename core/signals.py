@@ -0,0 +1,256 @@
+"""
+Mantiene el libro de existencias (core.stock) y los saldos de ventas cuando
+se escriben compras, ventas, pagos y productos. Los handlers corren dentro de
+la transacción de la vista. Ventas y pagos también alimentan el resumen diario
+(core.ventas_diarias).
+
+También invalida los espacios de caché versionados (core.cache) al confirmar
+la transacción, para que ningún worker guarde datos de antes del commit, y
+borra de la caché a los usuarios cuyo acceso cambió (core.autenticacion).
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from proveedor.models import Proveedor
+from tipologia.models import TipoJoya
+from producto.models import Producto, ProductoStock
+from movimiento.models import Movimiento, Venta, PagoVenta
+from core import stock
+from core.api import clave_cache_token
+from core.models import TokenAPI
+from core import ventas_diarias
+from core import autenticacion
+from core import cache as cache_versionada
+
+
+def _aplicar(pares):
+    for pid, (entrada, salida, costo) in stock.agrupar_deltas(pares).items():
+        stock.aplicar_delta(pid, entrada=entrada, salida=salida, costo=costo)
+
+
+# ---------- Compras ----------
+
+@receiver(pre_save, sender=Movimiento)
+def _movimiento_previo(sender, instance, raw=False, **kwargs):
+    instance._aporte_previo = None
+    if raw or instance.pk is None:
+        return
+    previo = Movimiento.objects.filter(pk=instance.pk).first()
+    if previo is not None:
+        instance._aporte_previo = stock.aporte_movimiento(previo)
+
+
+@receiver(post_save, sender=Movimiento)
+def _movimiento_guardado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    pares = []
+    previo = getattr(instance, "_aporte_previo", None)
+    if previo:
+        pid, cant, costo = previo
+        pares.append((pid, -cant, 0, -costo))
+    pid, cant, costo = stock.aporte_movimiento(instance)
+    pares.append((pid, cant, 0, costo))
+    _aplicar(pares)
+
+
+@receiver(post_delete, sender=Movimiento)
+def _movimiento_eliminado(sender, instance, **kwargs):
+    pid, cant, costo = stock.aporte_movimiento(instance)
+    _aplicar([(pid, -cant, 0, -costo)])
+
+
+# ---------- Ventas ----------
+
+@receiver(pre_save, sender=Venta)
+def _venta_previa(sender, instance, raw=False, **kwargs):
+    instance._aporte_previo = None
+    instance._resumen_previo = None
+    if raw or instance.pk is None:
+        return
+    previa = Venta.objects.filter(pk=instance.pk).first()
+    if previa is not None:
+        if previa.producto_id != instance.producto_id:
+            # otro producto: su costo de hoy, no el del producto anterior
+            instance.costo_unitario = instance.producto.costo_unitario
+        instance._aporte_previo = stock.aporte_venta(previa)
+        instance._resumen_previo = ventas_diarias.aporte_venta(previa)
+
+
+@receiver(post_save, sender=Venta)
+def _venta_guardada(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    pares = []
+    previo = getattr(instance, "_aporte_previo", None)
+    if previo:
+        pid, cant = previo
+        pares.append((pid, 0, -cant, 0))
+    pid, cant = stock.aporte_venta(instance)
+    pares.append((pid, 0, cant, 0))
+    _aplicar(pares)
+    ventas_diarias.aplicar(
+        ventas_diarias.negar(getattr(instance, "_resumen_previo", None)),
+        ventas_diarias.aporte_venta(instance),
+    )
+
+
+@receiver(post_delete, sender=Venta)
+def _venta_eliminada(sender, instance, **kwargs):
+    pid, cant = stock.aporte_venta(instance)
+    _aplicar([(pid, 0, -cant, 0)])
+    ventas_diarias.aplicar(ventas_diarias.negar(ventas_diarias.aporte_venta(instance)))
+
+
+# ---------- Pagos (Venta.monto_pagado / Venta.saldo) ----------
+
+def _ajustar_pagado(venta_id, delta):
+    if delta:
+        Venta.objects.filter(pk=venta_id).update(
+            monto_pagado=F("monto_pagado") + delta,
+            saldo=F("saldo") - delta,
+        )
+
+
+@receiver(pre_save, sender=PagoVenta)
+def _pago_previo(sender, instance, raw=False, **kwargs):
+    instance._aporte_previo = None
+    instance._resumen_previo = None
+    if raw or instance.pk is None:
+        return
+    previo = PagoVenta.objects.filter(pk=instance.pk).first()
+    if previo is not None:
+        instance._aporte_previo = (previo.venta_id, previo.monto)
+        instance._resumen_previo = ventas_diarias.aporte_pago(previo)
+
+
+@receiver(post_save, sender=PagoVenta)
+def _pago_guardado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previo = getattr(instance, "_aporte_previo", None)
+    if previo:
+        _ajustar_pagado(previo[0], -previo[1])
+    _ajustar_pagado(instance.venta_id, instance.monto or Decimal("0.00"))
+    ventas_diarias.aplicar(
+        ventas_diarias.negar(getattr(instance, "_resumen_previo", None)),
+        ventas_diarias.aporte_pago(instance),
+    )
+
+
+@receiver(post_delete, sender=PagoVenta)
+def _pago_eliminado(sender, instance, **kwargs):
+    _ajustar_pagado(instance.venta_id, -(instance.monto or Decimal("0.00")))
+    ventas_diarias.aplicar(ventas_diarias.negar(ventas_diarias.aporte_pago(instance)))
+
+
+# ---------- Productos ----------
+
+@receiver(post_save, sender=Producto)
+def _producto_guardado(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        ProductoStock.objects.get_or_create(producto=instance)
+    else:
+        stock.actualizar_valor(instance.pk)
+        ventas_diarias.reasignar_producto(instance)
+
+
+# ---------- Invalidación de caché ----------
+
+def _invalidar_al_confirmar(*espacios):
+    transaction.on_commit(lambda: cache_versionada.invalidar(*espacios))
+
+
+@receiver([post_save, post_delete], sender=Producto)
+@receiver([post_save, post_delete], sender=Proveedor)
+@receiver([post_save, post_delete], sender=TipoJoya)
+def _catalogo_cambiado(sender, raw=False, **kwargs):
+    if not raw:
+        _invalidar_al_confirmar("catalogo")
+
+
+@receiver([post_save, post_delete], sender=Movimiento)
+def _compras_cambiadas(sender, raw=False, **kwargs):
+    if not raw:
+        _invalidar_al_confirmar("compras")
+
+
+@receiver([post_save, post_delete], sender=Venta)
+@receiver([post_save, post_delete], sender=PagoVenta)
+def _ventas_cambiadas(sender, raw=False, **kwargs):
+    if not raw:
+        _invalidar_al_confirmar("ventas")
+
+
+Usuario = get_user_model()
+
+
+def _olvidar_al_confirmar(user_ids):
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: autenticacion.olvidar(*user_ids))
+
+
+@receiver(pre_save, sender=Usuario)
+def _usuario_previo(sender, instance, raw=False, update_fields=None, **kwargs):
+    # login() guarda solo last_login: no se consulta ni se borra nada
+    instance._cambia_acceso = False
+    if raw or instance.pk is None:
+        return
+    campos = autenticacion.CAMPOS_ACCESO
+    if update_fields is not None and not set(campos) & set(update_fields):
+        return
+    previo = Usuario.objects.filter(pk=instance.pk).values(*campos).first()
+    instance._cambia_acceso = previo is not None and any(previo[c] != getattr(instance, c) for c in campos)
+
+
+@receiver(post_save, sender=Usuario)
+def _usuario_guardado(sender, instance, raw=False, **kwargs):
+    if not raw and instance._cambia_acceso:
+        _olvidar_al_confirmar([instance.pk])
+
+
+@receiver(post_delete, sender=Usuario)
+def _usuario_eliminado(sender, instance, **kwargs):
+    _olvidar_al_confirmar([instance.pk])
+
+
+def _usuarios_afectados(sender, instance, reverse, pk_set):
+    """Ids de los usuarios cuyos permisos cambian con esta operación m2m."""
+    if sender is Group.permissions.through:
+        if not reverse:
+            grupos = [instance.pk]
+        elif pk_set is None:  # permiso.group_set.clear()
+            grupos = Group.objects.filter(permissions=instance).values_list("pk", flat=True)
+        else:
+            grupos = pk_set
+        return Usuario.objects.filter(groups__in=grupos).values_list("pk", flat=True).distinct()
+    if not reverse:
+        return [instance.pk]
+    if pk_set is None:  # grupo.user_set.clear() / permiso.user_set.clear()
+        campo = "groups" if sender is Usuario.groups.through else "user_permissions"
+        return Usuario.objects.filter(**{campo: instance}).values_list("pk", flat=True)
+    return pk_set
+
+
+@receiver(m2m_changed, sender=Usuario.groups.through)
+@receiver(m2m_changed, sender=Usuario.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def _permisos_cambiados(sender, instance, action, reverse, pk_set, **kwargs):
+    # antes del cambio: un clear() ya no deja ver a quién afectaba
+    if action in ("pre_add", "pre_remove", "pre_clear"):
+        _olvidar_al_confirmar(_usuarios_afectados(sender, instance, reverse, pk_set))
+
+
+@receiver([post_save, post_delete], sender=TokenAPI)
+def _token_api_cambiado(sender, instance, **kwargs):
+    # que un token desactivado deje de valer ya, no cuando venza la caché
+    cache.delete(clave_cache_token(instance.clave_hash))
@@ -0,0 +1,30 @@
+// Dropdowns (desktop)
+(function () {
+  const buttons = document.querySelectorAll(".nav-dd-btn");
+  const menus = document.querySelectorAll(".nav-dd");
+
+  function closeAll() {
+    menus.forEach(m => m.classList.add("hidden"));
+  }
+
+  buttons.forEach(btn => {
+    btn.addEventListener("click", (e) => {
+      e.stopPropagation();
+      const id = btn.getAttribute("data-menu");
+      const menu = document.getElementById(id);
+      const isHidden = menu.classList.contains("hidden");
+      closeAll();
+      if (isHidden) menu.classList.remove("hidden");
+    });
+  });
+
+  document.addEventListener("click", closeAll);
+})();
+
+// Mobile menu
+(function () {
+  const btn = document.getElementById("mobileBtn");
+  const menu = document.getElementById("mobileMenu");
+  if (!btn || !menu) return;
+  btn.addEventListener("click", () => menu.classList.toggle("hidden"));
+})();
@@ -0,0 +1,33 @@
+(function () {
+  const crear = document.getElementById("id_crear_producto");
+  const nuevoWrap = document.getElementById("nuevoProductoWrap");
+  const prodExist = document.getElementById("id_producto_existente");
+
+  const sw = document.getElementById("npSwitch");
+  const knob = document.getElementById("npKnob");
+
+  function sync() {
+    const on = !!crear.checked;
+
+    // mostrar/ocultar bloque nuevo producto
+    nuevoWrap.classList.toggle("hidden", !on);
+
+    // deshabilitar producto existente cuando creas nuevo
+    if (prodExist) prodExist.disabled = on;
+
+    // switch visual
+    if (sw && knob) {
+      sw.classList.toggle("bg-slate-900", on);
+      sw.classList.toggle("bg-slate-200", !on);
+      knob.classList.toggle("translate-x-6", on);
+      knob.classList.toggle("translate-x-1", !on);
+    }
+  }
+
+  if (crear) {
+    // Asegura estilo aunque el widget venga “crudo”
+    crear.classList.add("sr-only"); // ocultamos checkbox real y usamos el switch visual
+    crear.addEventListener("change", sync);
+    sync();
+  }
+})();
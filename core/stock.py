@@ -0,0 +1,229 @@
+"""
+Libro de existencias por producto (producto.ProductoStock).
+
+Compras (Movimiento IN no anuladas) suman a `cantidad_entrada`, ventas suman a
+`cantidad_salida`. Cada escritura aplica solo su delta con un UPDATE sobre la
+fila del producto, así que leer el stock es una búsqueda por clave primaria.
+
+Los deltas que bajan el stock (ventas, compras editadas o anuladas) usan un
+UPDATE condicional `WHERE stock >= cantidad`: la base de datos decide de forma
+atómica, así dos ventas simultáneas de la última pieza no pueden pasar ambas.
+Si no alcanza se lanza StockInsuficiente y la transacción del llamador se
+deshace. La restricción productostock_stock_no_negativo es la última barrera.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import (
+    Case, When, F, Sum, Value, DecimalField, IntegerField, OuterRef, Subquery, ExpressionWrapper,
+)
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from producto.models import Producto, ProductoStock
+from movimiento.models import Movimiento, Venta
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, producto_id, disponible, solicitado):
+        self.producto_id = producto_id
+        self.disponible = disponible
+        self.solicitado = solicitado
+        super().__init__(f"Stock insuficiente. Disponible: {disponible}")
+
+
+def aporte_movimiento(mov):
+    """(producto_id, cantidad, costo) que un movimiento aporta al stock."""
+    if mov.tipo != Movimiento.Tipo.ENTRADA or mov.anulada:
+        return mov.producto_id, 0, Decimal("0.00")
+    precio = mov.precio_unitario or Decimal("0.00")
+    return mov.producto_id, int(mov.cantidad), precio * int(mov.cantidad)
+
+
+def aporte_venta(venta):
+    """(producto_id, cantidad) que una venta descuenta del stock."""
+    return venta.producto_id, int(venta.cantidad)
+
+
+def _valor_costo(stock_expr):
+    costo = Subquery(
+        Producto.objects.filter(pk=OuterRef("producto_id")).values("costo_unitario")[:1]
+    )
+    return ExpressionWrapper(
+        Greatest(stock_expr, Value(0), output_field=IntegerField()) * costo,
+        output_field=DecimalField(max_digits=18, decimal_places=2),
+    )
+
+
+def aplicar_delta(producto_id, entrada=0, salida=0, costo=Decimal("0.00")):
+    """
+    Suma el delta a la fila del producto (un UPDATE). Si el stock baja, solo
+    actualiza cuando alcanza y si no lanza StockInsuficiente. Crea la fila si falta.
+    """
+    if not (entrada or salida or costo):
+        return
+    neto = entrada - salida
+    nuevo_stock = F("stock") + neto
+    filas = ProductoStock.objects.filter(producto_id=producto_id)
+    if neto < 0:
+        filas = filas.filter(stock__gte=-neto)
+    actualizadas = filas.update(
+        cantidad_entrada=F("cantidad_entrada") + entrada,
+        cantidad_salida=F("cantidad_salida") + salida,
+        costo_entrada=F("costo_entrada") + costo,
+        stock=nuevo_stock,
+        valor_costo=_valor_costo(nuevo_stock),
+        updated_at=timezone.now(),
+    )
+    if actualizadas:
+        return
+    disponible = ProductoStock.objects.filter(producto_id=producto_id).values_list("stock", flat=True).first()
+    if disponible is not None:
+        raise StockInsuficiente(producto_id, disponible, -neto)
+    # Producto sin fila (creado antes del libro): se calcula desde cero, ya con este delta.
+    datos = calcular_desde_movimientos([producto_id]).get(producto_id)
+    if datos is not None and datos["stock"] < 0:
+        raise StockInsuficiente(producto_id, max(datos["stock"] - neto, 0), -neto)
+    recalcular_producto(producto_id)
+
+
+def aplicar_deltas(deltas):
+    """
+    Como aplicar_delta, pero para muchos productos en un solo UPDATE (CASE por
+    producto). `deltas` es {producto_id: (entrada, salida, costo)}, como lo
+    devuelve agrupar_deltas. Lo usan las cargas masivas.
+    """
+    deltas = {pid: d for pid, d in deltas.items() if any(d)}
+    if not deltas:
+        return
+
+    def _caso(i, campo):
+        return Case(
+            *[When(producto_id=pid, then=Value(d[i])) for pid, d in deltas.items()],
+            default=Value(0),
+            output_field=campo,
+        )
+
+    entero = IntegerField()
+    decimal = DecimalField(max_digits=18, decimal_places=2)
+    entrada, salida = _caso(0, entero), _caso(1, entero)
+    nuevo_stock = F("stock") + entrada - salida
+    actualizadas = ProductoStock.objects.filter(producto_id__in=list(deltas)).update(
+        cantidad_entrada=F("cantidad_entrada") + entrada,
+        cantidad_salida=F("cantidad_salida") + salida,
+        costo_entrada=F("costo_entrada") + _caso(2, decimal),
+        stock=nuevo_stock,
+        valor_costo=_valor_costo(nuevo_stock),
+        updated_at=timezone.now(),
+    )
+    if actualizadas < len(deltas):
+        existentes = set(
+            ProductoStock.objects.filter(producto_id__in=list(deltas)).values_list("producto_id", flat=True)
+        )
+        for pid in set(deltas) - existentes:
+            recalcular_producto(pid)
+
+
+def actualizar_valor(producto_id):
+    """Recalcula valor_costo cuando cambia el costo_unitario (uno o una lista de productos)."""
+    filtro = {"producto_id__in": producto_id} if isinstance(producto_id, (list, set, tuple)) else {"producto_id": producto_id}
+    ProductoStock.objects.filter(**filtro).update(
+        valor_costo=_valor_costo(F("stock")),
+        updated_at=timezone.now(),
+    )
+
+
+def calcular_desde_movimientos(producto_ids=None):
+    """
+    Agrega las tablas crudas y devuelve {producto_id: dict(campos)}.
+    Es el cálculo caro que el libro evita; solo lo usan la reconstrucción y la verificación.
+    """
+    productos = Producto.objects.all()
+    compras = Movimiento.objects.filter(tipo=Movimiento.Tipo.ENTRADA, anulada=False)
+    ventas = Venta.objects.all()
+    if producto_ids is not None:
+        productos = productos.filter(pk__in=producto_ids)
+        compras = compras.filter(producto_id__in=producto_ids)
+        ventas = ventas.filter(producto_id__in=producto_ids)
+
+    compras_map = {
+        r["producto_id"]: r
+        for r in compras.values("producto_id").annotate(
+            cant=Sum("cantidad"),
+            costo=Sum(F("cantidad") * F("precio_unitario"), output_field=DecimalField(max_digits=18, decimal_places=2)),
+        )
+    }
+    ventas_map = {
+        r["producto_id"]: r["cant"]
+        for r in ventas.values("producto_id").annotate(cant=Sum("cantidad"))
+    }
+
+    resultado = {}
+    for pid, costo_unitario in productos.values_list("id", "costo_unitario"):
+        c = compras_map.get(pid, {})
+        entrada = int(c.get("cant") or 0)
+        salida = int(ventas_map.get(pid) or 0)
+        stock = entrada - salida
+        resultado[pid] = {
+            "cantidad_entrada": entrada,
+            "cantidad_salida": salida,
+            "stock": stock,
+            "costo_entrada": (c.get("costo") or Decimal("0.00")).quantize(Decimal("0.01")),
+            "valor_costo": (Decimal(max(stock, 0)) * (costo_unitario or Decimal("0.00"))).quantize(Decimal("0.01")),
+        }
+    return resultado
+
+
+def recalcular_producto(producto_id):
+    datos = calcular_desde_movimientos([producto_id]).get(producto_id)
+    if datos is None:
+        return None
+    fila, _ = ProductoStock.objects.update_or_create(producto_id=producto_id, defaults=datos)
+    return fila
+
+
+def reconstruir(batch_size=1000):
+    """Reescribe todas las filas del libro desde las tablas crudas."""
+    datos = calcular_desde_movimientos()
+    ProductoStock.objects.exclude(producto_id__in=list(datos)).delete()
+    existentes = set(ProductoStock.objects.values_list("producto_id", flat=True))
+
+    nuevas, cambiadas = [], []
+    for pid, campos in datos.items():
+        fila = ProductoStock(producto_id=pid, **campos)
+        (cambiadas if pid in existentes else nuevas).append(fila)
+
+    ProductoStock.objects.bulk_create(nuevas, batch_size=batch_size)
+    ProductoStock.objects.bulk_update(
+        cambiadas,
+        ["cantidad_entrada", "cantidad_salida", "stock", "costo_entrada", "valor_costo"],
+        batch_size=batch_size,
+    )
+    return len(datos)
+
+
+def verificar():
+    """Lista de (producto_id, campo, esperado, actual) donde el libro no cuadra."""
+    esperado = calcular_desde_movimientos()
+    actual = {f.producto_id: f for f in ProductoStock.objects.all()}
+    diferencias = []
+    for pid, campos in esperado.items():
+        fila = actual.get(pid)
+        if fila is None:
+            diferencias.append((pid, "fila", "existe", "falta"))
+            continue
+        for campo, valor in campos.items():
+            if getattr(fila, campo) != valor:
+                diferencias.append((pid, campo, valor, getattr(fila, campo)))
+    return diferencias
+
+
+def agrupar_deltas(pares):
+    """Combina [(producto_id, entrada, salida, costo), ...] por producto."""
+    acumulado = defaultdict(lambda: [0, 0, Decimal("0.00")])
+    for pid, entrada, salida, costo in pares:
+        a = acumulado[pid]
+        a[0] += entrada
+        a[1] += salida
+        a[2] += costo
+    return acumulado
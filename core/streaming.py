@@ -0,0 +1,41 @@
+"""
+Cuerpo de StreamingHttpResponse que se transmite por partes con WSGI y con ASGI.
+
+Django convierte el iterador cuando no es del tipo del servidor, y para eso lo
+junta entero en una lista: un iterador síncrono servido por ASGI (o uno async
+servido por WSGI) se arma completo en memoria antes de mandar el primer byte.
+`cuerpo()` devuelve el iterador tal cual con WSGI y uno async con ASGI.
+
+Con ASGI, las partes se piden con sync_to_async(thread_sensitive=True), en
+bloques de PARTES_POR_SALTO para no pagar un cambio de hilo por fila. El
+iterador del ORM (QuerySet.iterator()) sigue en el hilo del request, con su
+conexión y su cursor.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+PARTES_POR_SALTO = 500
+
+
+def _bloque(iterador, n):
+    return list(islice(iterador, n))
+
+
+async def _asincrono(partes, n):
+    iterador = iter(partes)
+    leer = sync_to_async(_bloque, thread_sensitive=True)
+    while True:
+        bloque = await leer(iterador, n)
+        if not bloque:
+            break
+        for parte in bloque:
+            yield parte
+
+
+def cuerpo(request, partes, partes_por_salto=PARTES_POR_SALTO):
+    """`partes` (iterable síncrono) en la forma que el servidor de `request` transmite sin juntar."""
+    if isinstance(request, ASGIRequest):
+        return _asincrono(partes, partes_por_salto)
+    return partes
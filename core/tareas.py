@@ -0,0 +1,186 @@
+"""
+Cola de trabajos de IA respaldada por la tabla core.TareaIA.
+
+Las vistas llaman a `encolar()` y responden enseguida; `manage.py run_ai_worker`
+toma tareas con `tomar_siguiente()` y las ejecuta con `ejecutar()`, guardando el
+resultado en Producto.descripcion_ia / precio_sugerido_ia / Venta.analisis_riesgo_ia
+o en la propia tarea (resumen, asistente).
+
+Los ejecutores usan las variantes de core.services que dejan pasar los errores
+de Groq: un error nunca se guarda como si fuera la descripción o el análisis.
+Un límite de Groq (429) o un fallo de conexión devuelve la tarea a la cola con
+`reintentar_at` (Retry-After o backoff) hasta MAX_INTENTOS; cualquier otro
+error la deja FALLIDA.
+"""
+import logging
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+from groq import APIConnectionError, InternalServerError, RateLimitError
+
+from core.models import TareaIA
+from producto.models import Producto
+from movimiento.models import Venta
+from core.services import (
+    redactar_descripcion_ia,
+    calcular_precio_sugerido_ia,
+    evaluar_riesgo_cobro_ia,
+    redactar_resumen_negocio_ia,
+    responder_asistente_ia,
+    datos_resumen_negocio,
+    espera_sugerida,
+)
+
+logger = logging.getLogger(__name__)
+
+Tipo = TareaIA.Tipo
+Estado = TareaIA.Estado
+
+MAX_INTENTOS = 3
+
+# errores de Groq que pasan solos: la tarea se reintenta más tarde
+TRANSITORIOS = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+class TareaFallida(Exception):
+    pass
+
+
+def encolar(tipo, objeto_id=None, prompt="", usuario=None):
+    """
+    Crea la tarea, o devuelve la que ya esté en cola para el mismo objeto
+    (dos clics seguidos no generan dos llamadas a Groq).
+    """
+    if objeto_id is not None:
+        existente = (
+            TareaIA.objects
+            .filter(tipo=tipo, objeto_id=objeto_id, estado__in=[Estado.PENDIENTE, Estado.EN_PROCESO])
+            .order_by("created_at")
+            .first()
+        )
+        if existente:
+            return existente
+    return TareaIA.objects.create(
+        tipo=tipo,
+        objeto_id=objeto_id,
+        prompt=prompt,
+        creada_por=usuario if usuario is not None and usuario.is_authenticated else None,
+    )
+
+
+def tomar_siguiente():
+    """
+    Reclama la tarea pendiente más antigua con un UPDATE condicional, así dos
+    workers nunca toman la misma (funciona igual en SQLite y Postgres).
+    """
+    while True:
+        tarea_id = (
+            TareaIA.objects
+            .filter(estado=Estado.PENDIENTE)
+            .filter(Q(reintentar_at__isnull=True) | Q(reintentar_at__lte=timezone.now()))
+            .order_by("created_at", "id")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if tarea_id is None:
+            return None
+        tomada = TareaIA.objects.filter(pk=tarea_id, estado=Estado.PENDIENTE).update(
+            estado=Estado.EN_PROCESO,
+            intentos=F("intentos") + 1,
+            iniciada_at=timezone.now(),
+        )
+        if tomada:
+            return TareaIA.objects.get(pk=tarea_id)
+
+
+def reencolar_colgadas(minutos=15, max_intentos=MAX_INTENTOS):
+    """Devuelve a la cola las tareas que quedaron en proceso (worker caído)."""
+    limite = timezone.now() - timedelta(minutes=minutos)
+    colgadas = TareaIA.objects.filter(estado=Estado.EN_PROCESO, iniciada_at__lt=limite)
+    colgadas.filter(intentos__gte=max_intentos).update(
+        estado=Estado.FALLIDA, error="El worker no terminó la tarea.", terminada_at=timezone.now()
+    )
+    return colgadas.filter(intentos__lt=max_intentos).update(estado=Estado.PENDIENTE)
+
+
+# ---------- Ejecutores ----------
+
+def _descripcion(tarea):
+    producto = Producto.objects.select_related("proveedor", "tipo").get(pk=tarea.objeto_id)
+    if producto.descripcion_ia:
+        return producto.descripcion_ia
+    producto.descripcion_ia = redactar_descripcion_ia(producto)
+    producto.save(update_fields=["descripcion_ia"])
+    return producto.descripcion_ia
+
+
+def _precio(tarea):
+    producto = Producto.objects.select_related("tipo").get(pk=tarea.objeto_id)
+    precio = calcular_precio_sugerido_ia(producto)
+    if not precio:
+        raise TareaFallida("No se pudo generar la sugerencia de precio.")
+    producto.precio_sugerido_ia = precio
+    producto.save(update_fields=["precio_sugerido_ia"])
+    return str(precio)
+
+
+def _riesgo(tarea):
+    venta = Venta.objects.get(pk=tarea.objeto_id)
+    venta.analisis_riesgo_ia = evaluar_riesgo_cobro_ia(venta)
+    venta.save(update_fields=["analisis_riesgo_ia"])
+    return venta.analisis_riesgo_ia
+
+
+def _resumen(tarea):
+    return redactar_resumen_negocio_ia(datos_resumen_negocio())
+
+
+def _asistente(tarea):
+    return responder_asistente_ia(tarea.prompt)
+
+
+EJECUTORES = {
+    Tipo.DESCRIPCION: _descripcion,
+    Tipo.PRECIO: _precio,
+    Tipo.RIESGO: _riesgo,
+    Tipo.RESUMEN: _resumen,
+    Tipo.ASISTENTE: _asistente,
+}
+
+
+def ejecutar(tarea):
+    try:
+        resultado = EJECUTORES[tarea.tipo](tarea)
+    except (Producto.DoesNotExist, Venta.DoesNotExist):
+        _terminar(tarea, Estado.FALLIDA, error="El registro ya no existe.")
+    except TareaFallida as e:
+        _terminar(tarea, Estado.FALLIDA, error=str(e))
+    except TRANSITORIOS as e:
+        if tarea.intentos >= MAX_INTENTOS:
+            logger.warning("Tarea IA %s: sin más reintentos (%s)", tarea.pk, e)
+            _terminar(tarea, Estado.FALLIDA, error=f"Groq no respondió tras {tarea.intentos} intentos: {e}")
+        else:
+            _reencolar(tarea, espera_sugerida(e, tarea.intentos), error=str(e))
+    except Exception as e:
+        logger.exception("Tarea IA %s falló", tarea.pk)
+        _terminar(tarea, Estado.FALLIDA, error=f"Error inesperado: {e}")
+    else:
+        _terminar(tarea, Estado.COMPLETADA, resultado=resultado or "")
+    return tarea
+
+
+def _reencolar(tarea, segundos, error):
+    logger.warning("Tarea IA %s: reintento en %.0f s (%s)", tarea.pk, segundos, error)
+    tarea.estado = Estado.PENDIENTE
+    tarea.error = error
+    tarea.reintentar_at = timezone.now() + timedelta(seconds=segundos)
+    tarea.save(update_fields=["estado", "error", "reintentar_at"])
+
+
+def _terminar(tarea, estado, resultado="", error=""):
+    tarea.estado = estado
+    tarea.resultado = resultado
+    tarea.error = error
+    tarea.terminada_at = timezone.now()
+    tarea.save(update_fields=["estado", "resultado", "error", "terminada_at"])
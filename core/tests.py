@@ -1,3 +1,1724 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import groq
+import httpx
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission, User
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.core.cache import cache, caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Sum
+from django.db.models.query import QuerySet
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import (
+    autenticacion, cache as cache_versionada, carga_sqlite, dashboard, exportacion, instrumentacion, reportes,
+    services, stock, tareas, ventas_diarias,
+)
+from core.streaming import cuerpo
+from core.semilla import sembrar
+from core.importacion import ErrorImportacion, importar_compras
+from core.middleware import InstrumentacionMiddleware
+from core.stock import StockInsuficiente
+from core.models import TareaIA, TasaCambio, TokenAPI
+from core.paginacion import PaginaKeyset, codificar_cursor
+from core.autenticacion import BackendConCache, clave_usuario
+from core.cache import CacheEscalonada
+from core.busqueda import buscar_productos, filtrar_por_producto
+from core.views import _compras_filtradas, _deudas, _inventario_filtrado
+from movimiento.models import Movimiento, Venta, PagoVenta, VentaDiaria
+from producto.models import Producto, ProductoStock
+from proveedor.models import Proveedor
+from tipologia.models import TipoJoya
+
+
+class CatalogoMixin:
+    """
+    Datos comunes: un proveedor, un tipo y un producto (cls.producto), más un
+    usuario logueado si la clase define `usuario_nombre`.
+
+    Las cachés se limpian antes de cada test: no se revierten con la transacción
+    del test (versiones, usuarios y sesiones viven ahí) y SQLite reutiliza los ids.
+    """
+    proveedor_nombre = "Proveedor prueba"
+    tipo_nombre = "Tipo prueba"
+    producto_nombre = "Producto prueba"
+    costo = Decimal("5.00")
+    usuario_nombre = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.proveedor = Proveedor.objects.create(nombre=cls.proveedor_nombre)
+        cls.tipo = TipoJoya.objects.create(nombre=cls.tipo_nombre)
+        cls.producto = cls.crear_producto(cls.producto_nombre)
+        if cls.usuario_nombre:
+            cls.usuario = User.objects.create_user(cls.usuario_nombre, password="x")
+
+    @classmethod
+    def crear_producto(cls, nombre, **campos):
+        campos.setdefault("costo_unitario", cls.costo)
+        campos.setdefault("proveedor", cls.proveedor)
+        campos.setdefault("tipo", cls.tipo)
+        return Producto.objects.create(nombre=nombre, **campos)
+
+    @classmethod
+    def comprar(cls, cantidad, producto=None, precio=None):
+        return Movimiento.objects.create(
+            producto=producto or cls.producto, cantidad=cantidad, precio_unitario=precio or cls.costo
+        )
+
+    def setUp(self):
+        cache.clear()
+        caches["fragmentos"].clear()
+        if self.usuario_nombre:
+            self.client.force_login(self.usuario)
+
+    def assertLibroCuadra(self):
+        """El libro (ProductoStock) es igual al cálculo desde compras y ventas."""
+        campos = ("cantidad_entrada", "cantidad_salida", "stock", "costo_entrada", "valor_costo")
+        actual = {
+            fila.pop("producto_id"): fila for fila in ProductoStock.objects.values("producto_id", *campos)
+        }
+        self.assertEqual(actual, stock.calcular_desde_movimientos())
+
+    @contextmanager
+    def assertSoloLeeVersiones(self, usuario=False):
+        """
+        Solo se consulta el L2 (tabla core_cache): la lectura de versiones y,
+        con `usuario`, la de la sesión y la del usuario (core.autenticacion).
+        """
+        with CaptureQueriesContext(connection) as consultas:
+            yield
+        self.assertEqual([c["sql"] for c in consultas if "core_cache" not in c["sql"]], [])
+        self.assertLessEqual(len(consultas), 3 if usuario else 1)
+
+
+def respuesta_groq(status, cabeceras=None):
+    """httpx.Response como la que traen los errores de la API de Groq."""
+    return httpx.Response(status, headers=cabeceras, request=httpx.Request("POST", "https://api.groq.com/"))
+
+
+def invalidar_en_otro_worker(*espacios):
+    """Como cache_versionada.invalidar() en otro proceso: cambia L2 y deja atrasado el L1 de este."""
+    for espacio in espacios:
+        cache.l2.set(f"ver:{espacio}", cache_versionada._ahora_us() + 1, None)
+
+
+class CacheEscalonadaTests(CatalogoMixin, TestCase):
+
+    def test_l1_vacio_lee_de_l2_y_lo_vuelve_a_llenar(self):
+        cache.set("k", "valor")
+        self.assertEqual(cache.l2.get("k"), "valor")
+        cache.l1.delete("k")
+        cache_versionada.reiniciar_estadisticas()
+
+        self.assertEqual(cache.get("k"), "valor")
+        self.assertEqual(cache.l1.get("k"), "valor")
+        self.assertEqual(cache.get("k"), "valor")
+        datos = cache_versionada.estadisticas()
+        self.assertEqual((datos["l2_hits"], datos["l1_hits"], datos["misses"]), (1, 1, 0))
+
+    def test_l2_caido_es_un_miss(self):
+        cache.l1.set("k", "solo-l1")
+        with mock.patch.object(type(cache.l2), "get", side_effect=DatabaseError("sin tabla")):
+            self.assertEqual(cache.get("k"), "solo-l1")
+            self.assertIsNone(cache.get("otra"))
+        self.assertGreater(cache_versionada.estadisticas()["errores_l2"], 0)
+
+    def test_invalidar_cambia_la_clave(self):
+        anterior = cache_versionada.clave("catalogo", "lista")
+        cache.set(anterior, "vieja")
+        cache_versionada.invalidar("catalogo")
+        nueva = cache_versionada.clave("catalogo", "lista")
+        self.assertNotEqual(nueva, anterior)
+        self.assertIsNone(cache.get(nueva))
+        self.assertEqual(cache_versionada.clave("compras", "lista"), cache_versionada.clave("compras", "lista"))
+
+    def test_fresca_salta_el_l1_atrasado(self):
+        vista = cache_versionada.version("catalogo")
+        invalidar_en_otro_worker("catalogo")
+        self.assertEqual(cache_versionada.version("catalogo"), vista)
+        self.assertGreater(cache_versionada.version("catalogo", fresca=True), vista)
+        self.assertEqual(
+            cache_versionada.versiones(["catalogo"], fresca=True)["catalogo"],
+            cache_versionada.version("catalogo", fresca=True),
+        )
+
+
+class PlanesDeConsultaTests(CatalogoMixin, TestCase):
+    """
+    Las consultas calientes deben resolverse con índices (ver movimiento 0006 y 0008).
+    En PostgreSQL se desactiva el seq scan: con tablas tan pequeñas el planificador
+    lo prefiere aunque el índice exista, y lo que se prueba es que el índice sirva.
+    """
+
+    producto_nombre = "Anillo"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.comprar(10)
+        cls.venta = Venta.objects.create(
+            producto=cls.producto, cantidad=2, precio_unitario=Decimal("9.00"), a_plazos=True
+        )
+        PagoVenta.objects.create(venta=cls.venta, monto=Decimal("3.00"))
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+
+    def assertSinScanCompleto(self, queryset, permitir_orden=False):
+        plan = queryset.explain()
+        if connection.vendor == "sqlite":
+            # "SCAN tabla" sin "USING ... INDEX" es un recorrido de toda la tabla
+            completos = re.findall(r"\bSCAN (\w+)(?! USING)\s*$", plan, re.MULTILINE)
+            self.assertEqual(completos, [], f"Recorrido completo:\n{plan}")
+            if not permitir_orden:
+                # "RIGHT PART OF ORDER BY": el índice da solo las primeras columnas del orden
+                self.assertNotRegex(plan, r"TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY", f"Orden sin índice:\n{plan}")
+        elif connection.vendor == "postgresql":
+            self.assertNotIn("Seq Scan", plan, f"Recorrido completo:\n{plan}")
+        return plan
+
+    def test_compra_list(self):
+        # la consulta real de compra_list: primera página y página con cursor
+        compras, _ = _compras_filtradas({})
+        cursor = codificar_cursor([timezone.now(), 1])
+        for c in (None, cursor):
+            plan = self.assertSinScanCompleto(PaginaKeyset(compras, ("-fecha", "-id"), cursor=c)._queryset[:51])
+            if connection.vendor == "sqlite":
+                self.assertIn("mov_vigentes_fecha_id_idx", plan)
+
+    def test_inventario_pagina(self):
+        productos, _ = _inventario_filtrado({})
+        self.assertSinScanCompleto(productos.order_by("nombre", "id")[:51])
+
+    def test_inventario_pagina_con_cursor(self):
+        productos, _ = _inventario_filtrado({})
+        pagina = PaginaKeyset(productos, ("nombre", "id"), cursor=codificar_cursor(["M", 1]), por_pagina=50)
+        plan = self.assertSinScanCompleto(pagina._queryset[:51])
+        if connection.vendor == "sqlite":
+            # búsqueda por rango en el índice, no un recorrido desde la primera fila
+            self.assertRegex(plan, r"SEARCH producto_producto USING INDEX producto_nombre_id_idx \(nombre>\?\)")
+
+    def test_dashboard_deuda(self):
+        self.assertSinScanCompleto(
+            Venta.objects.filter(a_plazos=True, saldo__gt=0).order_by().only("saldo")
+        )
+
+    def test_deudas_list(self):
+        cursor = codificar_cursor([timezone.now(), 1])
+        for c in (None, cursor):
+            self.assertSinScanCompleto(PaginaKeyset(_deudas(), ("-fecha", "-id"), cursor=c)._queryset[:51])
+
+    def test_stock_de_un_producto(self):
+        # recalcular_producto / calcular_desde_movimientos([pid])
+        self.assertSinScanCompleto(
+            Movimiento.objects
+            .filter(producto_id=self.producto.id, tipo=Movimiento.Tipo.ENTRADA, anulada=False)
+            .values("producto_id")
+            .annotate(cant=Sum("cantidad")),
+            permitir_orden=True,
+        )
+
+    def test_pagos_por_venta(self):
+        self.assertSinScanCompleto(
+            PagoVenta.objects.filter(venta_id=self.venta.id).order_by().values("monto")
+        )
+
+
+class PaginacionKeysetTests(CatalogoMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # nombres repetidos: el desempate por id tiene que cruzar páginas
+        for i in range(7):
+            cls.crear_producto(f"Broche {i // 3}", tipo=TipoJoya.objects.create(nombre=f"Broche {i}"))
+
+    def test_recorre_todo_sin_repetir_ni_saltar(self):
+        for orden in (("nombre", "id"), ("-nombre", "-id")):
+            vistos, cursor = [], None
+            while True:
+                pagina = PaginaKeyset(Producto.objects.all(), orden, cursor=cursor, por_pagina=2)
+                vistos += [p.pk for p in pagina]
+                cursor = pagina.siguiente_cursor
+                if cursor is None:
+                    break
+            self.assertEqual(vistos, list(Producto.objects.order_by(*orden).values_list("pk", flat=True)))
+
+
+class BusquedaTests(CatalogoMixin, TestCase):
+    producto_nombre = "Cadena corazón"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.corazon = cls.producto
+        cls.otra = cls.crear_producto("Pulsera tejida")
+        cls.comprar(1)
+
+    def test_sin_acentos_ni_mayusculas(self):
+        for q in ("corazon", "CORAZÓN", "cadena coraz"):
+            self.assertEqual(list(buscar_productos(q)), [self.corazon], q)
+
+    def test_renombrar_actualiza_el_indice(self):
+        self.otra.nombre = "Pulsera ñandú"
+        self.otra.save()
+        self.assertEqual(list(buscar_productos("nandu")), [self.otra])
+        self.assertEqual(list(buscar_productos("tejida")), [])
+
+    def test_filtrar_compras(self):
+        compras = filtrar_por_producto(Movimiento.objects.all(), "corazon")
+        self.assertEqual([c.producto_id for c in compras], [self.corazon.id])
+
+
+class VentasDiariasTests(CatalogoMixin, TestCase):
+    costo = Decimal("4.00")
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.comprar(20)
+
+    def assertCuadra(self):
+        esperado = {
+            clave: campos for clave, campos in ventas_diarias.calcular().items() if any(campos.values())
+        }
+        actual = {
+            (f.dia, f.producto_id, f.proveedor_id, f.tipo_id): {c: getattr(f, c) for c in ventas_diarias.CAMPOS}
+            for f in VentaDiaria.objects.all()
+            if any(getattr(f, c) for c in ventas_diarias.CAMPOS)
+        }
+        self.assertEqual(actual, esperado)
+
+    def test_incremental_cuadra_con_las_ventas(self):
+        venta = Venta.objects.create(producto=self.producto, cantidad=2, precio_unitario=Decimal("10.00"), a_plazos=True)
+        Venta.objects.create(producto=self.producto, cantidad=1, precio_unitario=Decimal("12.00"))
+        pago = PagoVenta.objects.create(venta=venta, monto=Decimal("5.00"))
+        self.assertCuadra()
+
+        venta.cantidad = 3
+        venta.save()
+        pago.monto = Decimal("7.50")
+        pago.save()
+        self.assertCuadra()
+
+        mes = ventas_diarias.mes_a_la_fecha()
+        self.assertEqual(mes["ventas"], 2)
+        self.assertEqual(mes["unidades"], 4)
+        self.assertEqual(mes["ingresos"], Decimal("42.00"))
+        self.assertEqual(mes["costo"], Decimal("16.00"))
+        self.assertEqual(mes["pagos"], Decimal("7.50"))
+
+        venta.delete()
+        self.assertCuadra()
+        self.assertEqual(ventas_diarias.mes_a_la_fecha()["ingresos"], Decimal("12.00"))
+
+    def test_cambio_de_costo_despues_de_vender(self):
+        venta = Venta.objects.create(producto=self.producto, cantidad=2, precio_unitario=Decimal("10.00"))
+        self.assertEqual(venta.costo_unitario, Decimal("4.00"))
+        self.producto.costo_unitario = Decimal("7.00")
+        self.producto.save()
+
+        venta.cantidad = 3
+        venta.save()
+        self.assertCuadra()
+        self.assertEqual(ventas_diarias.mes_a_la_fecha()["costo"], Decimal("12.00"))  # 3 x 4, no x 7
+
+        venta.delete()
+        self.assertCuadra()
+        self.assertFalse(VentaDiaria.objects.exclude(costo=0).exists())
+
+    def test_venta_pasada_a_otro_producto_toma_su_costo(self):
+        otro = self.crear_producto("Cadena", costo_unitario=Decimal("9.00"))
+        self.comprar(5, producto=otro)
+        venta = Venta.objects.create(producto=self.producto, cantidad=1, precio_unitario=Decimal("10.00"))
+        venta.producto = otro
+        venta.save()
+        self.assertEqual(Venta.objects.get(pk=venta.pk).costo_unitario, Decimal("9.00"))
+        self.assertCuadra()
+
+    def test_reconstruir_rango(self):
+        Venta.objects.create(producto=self.producto, cantidad=1, precio_unitario=Decimal("9.00"))
+        hoy = timezone.localdate()
+        VentaDiaria.objects.update(ingresos=Decimal("0.00"))
+        ventas_diarias.reconstruir(hoy, hoy)
+        self.assertEqual(ventas_diarias.totales(hoy, hoy)["ingresos"], Decimal("9.00"))
+        self.assertCuadra()
+
+
+class SaldoVentaTests(CatalogoMixin, TestCase):
+    usuario_nombre = "caja"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.comprar(20)
+
+    def setUp(self):
+        super().setUp()
+        self.venta = Venta.objects.create(
+            producto=self.producto, cantidad=2, precio_unitario=Decimal("10.00"), a_plazos=True
+        )
+
+    def assertSaldo(self, pagado, saldo):
+        venta = Venta.objects.get(pk=self.venta.pk)
+        self.assertEqual((venta.monto_pagado, venta.saldo), (Decimal(pagado), Decimal(saldo)))
+        suma = sum((p.monto for p in venta.pagos.all()), Decimal("0.00"))
+        self.assertEqual(venta.monto_pagado, suma)
+        self.assertEqual(venta.saldo, venta.total - suma)
+
+    def test_pagos_creados_y_eliminados_por_las_vistas(self):
+        self.assertSaldo("0.00", "20.00")
+        self.client.post(reverse("pago_create", args=[self.venta.pk]), {"monto": "7.50"})
+        self.client.post(reverse("pago_create", args=[self.venta.pk]), {"monto": "2.50"})
+        self.assertSaldo("10.00", "10.00")
+
+        pago = self.venta.pagos.get(monto=Decimal("7.50"))
+        self.client.post(reverse("pago_delete", args=[pago.pk]))
+        self.assertSaldo("2.50", "17.50")
+
+    def test_pago_editado_o_movido_a_otra_venta(self):
+        otra = Venta.objects.create(producto=self.producto, cantidad=1, precio_unitario=Decimal("8.00"))
+        pago = PagoVenta.objects.create(venta=self.venta, monto=Decimal("5.00"))
+        pago.monto = Decimal("12.00")
+        pago.save()
+        self.assertSaldo("12.00", "8.00")
+
+        pago.venta = otra
+        pago.save()
+        self.assertSaldo("0.00", "20.00")
+        otra.refresh_from_db()
+        self.assertEqual((otra.monto_pagado, otra.saldo), (Decimal("12.00"), Decimal("-4.00")))
+
+    def test_cambio_de_total(self):
+        PagoVenta.objects.create(venta=self.venta, monto=Decimal("6.00"))
+        venta = Venta.objects.get(pk=self.venta.pk)
+        venta.cantidad = 3
+        venta.save()
+        self.assertSaldo("6.00", "24.00")
+        venta.precio_unitario = Decimal("4.00")
+        venta.save(update_fields=["precio_unitario"])
+        self.assertSaldo("6.00", "6.00")
+        venta.precio_unitario = Decimal("2.00")
+        venta.save()
+        self.assertSaldo("6.00", "0.00")
+        self.assertNotIn(venta, Venta.objects.filter(saldo__gt=0))
+
+    def test_cambio_de_total_con_instancia_anterior_al_pago(self):
+        # self.venta se cargó antes del pago: su monto_pagado en memoria es 0
+        PagoVenta.objects.create(venta=self.venta, monto=Decimal("6.00"))
+        self.venta.cantidad = 3
+        self.venta.save()
+        self.assertSaldo("6.00", "24.00")
+
+
+class SemillaTests(TestCase):
+
+    def test_datos_sembrados_son_coherentes(self):
+        creado = sembrar(productos=30, compras=120, ventas=80, pagos=40, proveedores=4, semilla=7)
+        self.assertGreater(creado["ventas"], 0)
+        self.assertGreater(creado["pagos"], 0)
+
+        self.assertEqual(stock.verificar(), [])
+        tabla = {
+            (f.dia, f.producto_id, f.proveedor_id, f.tipo_id): {c: getattr(f, c) for c in ventas_diarias.CAMPOS}
+            for f in VentaDiaria.objects.all()
+        }
+        self.assertEqual(tabla, ventas_diarias.calcular())
+        self.assertFalse(Venta.objects.filter(costo_unitario__isnull=True).exists())
+
+        ventas = Venta.objects.annotate(pagos_suma=Sum("pagos__monto"))
+        self.assertEqual(
+            [v.pk for v in ventas if v.saldo != v.total - (v.pagos_suma or Decimal("0.00"))], []
+        )
+        self.assertEqual(
+            [v.pk for v in ventas if v.monto_pagado != (v.pagos_suma or Decimal("0.00"))], []
+        )
+
+
+class ColaTareasTests(CatalogoMixin, TestCase):
+    Estado = TareaIA.Estado
+
+    def encolar_varias(self, n):
+        return [tareas.encolar(TareaIA.Tipo.ASISTENTE, prompt=f"pregunta {i}").pk for i in range(n)]
+
+    def test_dos_workers_toman_cada_tarea_una_vez(self):
+        ids = self.encolar_varias(4)
+
+        # carrera: el worker B reclama la misma tarea entre el SELECT y el UPDATE de A
+        update = QuerySet.update
+        rival = None
+
+        def update_con_carrera(qs, **campos):
+            nonlocal rival
+            if qs.model is TareaIA and rival is None:
+                rival = False  # el UPDATE de B no vuelve a provocar la carrera
+                rival = tareas.tomar_siguiente()
+            return update(qs, **campos)
+
+        with mock.patch.object(QuerySet, "update", update_con_carrera):
+            tomada = tareas.tomar_siguiente()
+        self.assertEqual((rival.pk, tomada.pk), (ids[0], ids[1]))
+
+        tomadas = [rival.pk, tomada.pk]
+        while (tarea := tareas.tomar_siguiente()) is not None:
+            tomadas.append(tarea.pk)
+        self.assertEqual(sorted(tomadas), ids)
+        self.assertEqual(
+            set(TareaIA.objects.values_list("estado", "intentos")), {(self.Estado.EN_PROCESO, 1)}
+        )
+
+    def test_fallos_de_ejecucion(self):
+        self.encolar_varias(1)
+        with mock.patch("core.tareas.responder_asistente_ia", side_effect=RuntimeError("Groq caído")), \
+                self.assertLogs("core.tareas", "ERROR"):
+            tarea = tareas.ejecutar(tareas.tomar_siguiente())
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, self.Estado.FALLIDA)
+        self.assertEqual(tarea.error, "Error inesperado: Groq caído")
+        self.assertIsNotNone(tarea.terminada_at)
+
+        tareas.encolar(TareaIA.Tipo.PRECIO, objeto_id=self.producto.pk)
+        with mock.patch("core.tareas.calcular_precio_sugerido_ia", return_value=None):
+            tarea = tareas.ejecutar(tareas.tomar_siguiente())
+        self.assertEqual(tarea.estado, self.Estado.FALLIDA)
+        self.assertEqual(tarea.error, "No se pudo generar la sugerencia de precio.")
+
+        # una tarea fallida no bloquea la siguiente para el mismo producto
+        nueva = tareas.encolar(TareaIA.Tipo.PRECIO, objeto_id=self.producto.pk)
+        self.assertNotEqual(nueva.pk, tarea.pk)
+        self.assertEqual(tareas.encolar(TareaIA.Tipo.PRECIO, objeto_id=self.producto.pk).pk, nueva.pk)
+        with mock.patch("core.tareas.calcular_precio_sugerido_ia", return_value=Decimal("12.50")):
+            tareas.ejecutar(tareas.tomar_siguiente())
+        nueva.refresh_from_db()
+        self.assertEqual((nueva.estado, nueva.resultado), (self.Estado.COMPLETADA, "12.50"))
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.precio_sugerido_ia, Decimal("12.50"))
+
+    def test_colgadas_se_reintentan_hasta_el_maximo(self):
+        reintento, agotada = self.encolar_varias(2)
+        tareas.tomar_siguiente()
+        tareas.tomar_siguiente()
+        hace_rato = timezone.now() - timedelta(minutes=30)
+        TareaIA.objects.filter(pk=reintento).update(iniciada_at=hace_rato)
+        TareaIA.objects.filter(pk=agotada).update(iniciada_at=hace_rato, intentos=3)
+
+        self.assertEqual(tareas.reencolar_colgadas(minutos=15, max_intentos=3), 1)
+        self.assertEqual(TareaIA.objects.get(pk=agotada).estado, self.Estado.FALLIDA)
+
+        tarea = tareas.tomar_siguiente()
+        self.assertEqual((tarea.pk, tarea.intentos), (reintento, 2))
+        self.assertIsNone(tareas.tomar_siguiente())
+        with mock.patch("core.tareas.responder_asistente_ia", return_value="respuesta"):
+            tareas.ejecutar(tarea)
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.resultado), (self.Estado.COMPLETADA, "respuesta"))
+
+    def test_error_de_la_api_no_se_guarda_como_resultado(self):
+        self.comprar(1)
+        venta = Venta.objects.create(producto=self.producto, cantidad=1, precio_unitario=Decimal("9.00"))
+        tareas.encolar(TareaIA.Tipo.DESCRIPCION, objeto_id=self.producto.pk)
+        tareas.encolar(TareaIA.Tipo.RIESGO, objeto_id=venta.pk)
+        negada = groq.AuthenticationError("clave inválida", response=respuesta_groq(401), body=None)
+        with mock.patch("core.services._chat_groq", side_effect=negada), self.assertLogs("core.tareas", "ERROR"):
+            for _ in range(2):
+                tareas.ejecutar(tareas.tomar_siguiente())
+
+        self.assertEqual(
+            set(TareaIA.objects.values_list("estado", flat=True)), {self.Estado.FALLIDA}
+        )
+        self.producto.refresh_from_db()
+        venta.refresh_from_db()
+        self.assertIsNone(self.producto.descripcion_ia)
+        self.assertIsNone(venta.analisis_riesgo_ia)
+
+    def test_limite_de_groq_reintenta_despues_de_retry_after(self):
+        tarea = tareas.encolar(TareaIA.Tipo.DESCRIPCION, objeto_id=self.producto.pk)
+        limite = groq.RateLimitError("429", response=respuesta_groq(429, {"retry-after": "30"}), body=None)
+
+        with mock.patch("core.services._chat_groq", side_effect=limite), self.assertLogs("core.tareas", "WARNING"):
+            tareas.ejecutar(tareas.tomar_siguiente())
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), (self.Estado.PENDIENTE, 1))
+        self.assertAlmostEqual((tarea.reintentar_at - timezone.now()).total_seconds(), 30, delta=5)
+        self.assertIsNone(tareas.tomar_siguiente())  # todavía no
+        self.producto.refresh_from_db()
+        self.assertIsNone(self.producto.descripcion_ia)
+
+        # pasado el Retry-After se vuelve a tomar; al llegar a MAX_INTENTOS queda FALLIDA
+        for intento in range(2, tareas.MAX_INTENTOS + 1):
+            TareaIA.objects.filter(pk=tarea.pk).update(reintentar_at=timezone.now())
+            with mock.patch("core.services._chat_groq", side_effect=limite), self.assertLogs("core.tareas", "WARNING"):
+                tareas.ejecutar(tareas.tomar_siguiente())
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), (self.Estado.FALLIDA, tareas.MAX_INTENTOS))
+        self.assertIn("Groq no respondió tras 3 intentos", tarea.error)
+
+        # otra tarea para el mismo producto, con Groq de vuelta
+        nueva = tareas.encolar(TareaIA.Tipo.DESCRIPCION, objeto_id=self.producto.pk)
+        with mock.patch("core.services._chat_groq", return_value="Un anillo de lujo."):
+            tareas.ejecutar(tareas.tomar_siguiente())
+        nueva.refresh_from_db()
+        self.assertEqual(nueva.estado, self.Estado.COMPLETADA)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.descripcion_ia, "Un anillo de lujo.")
+
+
+class ReporteProveedoresTests(CatalogoMixin, TestCase):
+    proveedor_nombre = "Proveedor reporte"
+    costo = Decimal("3.00")
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Proveedor.objects.create(nombre="Proveedor sin movimiento")
+        cls.comprar(10)
+
+    def test_agregados_y_invalidacion(self):
+        fila = reportes.reporte_proveedores()["filas"][0]
+        self.assertEqual((fila["unidades_compradas"], fila["unidades_vendidas"]), (10, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Venta.objects.create(producto=self.producto, cantidad=4, precio_unitario=Decimal("8.00"))
+        hoy = timezone.localdate()
+        for reporte in (reportes.reporte_proveedores(), reportes.reporte_proveedores(hoy, hoy)):
+            fila, vacia = reporte["filas"]
+            self.assertEqual(fila["unidades_compradas"], 10)
+            self.assertEqual(fila["unidades_vendidas"], 4)
+            self.assertEqual(fila["tasa_venta"], Decimal("40.0"))
+            self.assertEqual(fila["ingresos"], Decimal("32.00"))
+            self.assertEqual(fila["margen"], Decimal("20.00"))
+            self.assertEqual(fila["valor_stock"], Decimal("18.00"))
+            self.assertIsNone(vacia["tasa_venta"])
+
+    def test_venta_en_otro_worker_con_l1_atrasado(self):
+        self.client.force_login(User.objects.create_user("contadora", password="x"))
+        url = reverse("reporte_proveedores")
+        self.assertContains(self.client.get(url), "Proveedor reporte")
+        self.assertEqual(reportes.reporte_proveedores()["filas"][0]["unidades_vendidas"], 0)
+
+        Venta.objects.create(producto=self.producto, cantidad=4, precio_unitario=Decimal("8.00"))
+        invalidar_en_otro_worker("ventas")
+        self.assertEqual(reportes.reporte_proveedores()["filas"][0]["unidades_vendidas"], 4)
+        self.assertEqual(self.client.get(url).context["rows"][0]["unidades_vendidas"], 4)
+
+    def test_consultas_fijas(self):
+        with self.assertNumQueries(4):
+            reportes.calcular_reporte_proveedores(timezone.localdate(), timezone.localdate())
+
+
+class ImportacionTests(CatalogoMixin, TestCase):
+    usuario_nombre = "compradora"
+    encabezado = "nombre,proveedor,tipo,cantidad,precio_unitario,costo_unitario\n"
+
+    def importar(self, texto, nombre="compras.csv", codificacion="utf-8", **kwargs):
+        return importar_compras(io.BytesIO(texto.encode(codificacion)), nombre, **kwargs)
+
+    def test_csv(self):
+        resultado = self.importar(
+            self.encabezado
+            + "Anillo nuevo,Proveedor prueba,Tipo prueba,3,4.50,\n"
+            + "Producto prueba,Proveedor prueba,Tipo prueba,1,2,\n"
+        )
+        self.assertTrue(resultado.ok, resultado.errores)
+        self.assertEqual((resultado.filas, resultado.compras, resultado.productos_nuevos), (2, 2, 1))
+        nuevo = Producto.objects.get(nombre="Anillo nuevo")
+        self.assertEqual(nuevo.costo_unitario, Decimal("4.50"))  # sin costo: el precio de compra
+        self.assertEqual(ProductoStock.objects.get(producto=nuevo).stock, 3)
+        self.assertEqual(ProductoStock.objects.get(producto=self.producto).stock, 1)
+        self.assertLibroCuadra()
+
+    def test_xlsx_y_csv_con_punto_y_coma(self):
+        from openpyxl import Workbook
+
+        libro = Workbook()
+        libro.active.append(["Nombre", "Proveedor", "Tipo", "Cantidad", "Precio unitario"])
+        libro.active.append(["Dije xlsx", "Proveedor prueba", "Tipo prueba", 2, 7.25])
+        archivo = io.BytesIO()
+        libro.save(archivo)
+        archivo.seek(0)
+        resultado = importar_compras(archivo, "nota.xlsx")
+        self.assertTrue(resultado.ok, resultado.errores)
+        compra = Movimiento.objects.get(producto__nombre="Dije xlsx")
+        self.assertEqual((compra.cantidad, compra.precio_unitario), (2, Decimal("7.25")))
+
+        separado = self.importar(
+            "nombre;proveedor;tipo;cantidad;precio_unitario\nDije csv;Proveedor prueba;Tipo prueba;1;3,5\n"
+        )
+        self.assertTrue(separado.ok, separado.errores)
+        self.assertEqual(Movimiento.objects.get(producto__nombre="Dije csv").precio_unitario, Decimal("3.50"))
+
+    def test_filas_con_error_no_detienen_el_resto(self):
+        resultado = self.importar(
+            self.encabezado
+            + ",Proveedor prueba,Tipo prueba,1,2,\n"
+            + "Broche,Proveedor prueba,Tipo prueba,0,2,\n"
+            + "Broche,Proveedor prueba,Tipo prueba,1,abc,\n"
+            + "Broche,Otro proveedor,Tipo prueba,1,2,\n"
+            + "Broche,Proveedor prueba,Tipo prueba,1,-2,\n"
+            + "Broche,Proveedor prueba,Tipo prueba,2,2,\n",
+            tamano_lote=2,
+        )
+        self.assertEqual([fila for fila, _ in resultado.errores], [2, 3, 4, 5, 6])
+        self.assertIn("no existe", dict(resultado.errores)[5])
+        self.assertEqual(resultado.compras, 1)
+        self.assertFalse(Proveedor.objects.filter(nombre="Otro proveedor").exists())
+
+        creado = self.importar(self.encabezado + "Broche,Otro proveedor,Tipo prueba,1,2,\n", crear_catalogo=True)
+        self.assertTrue(creado.ok, creado.errores)
+        self.assertTrue(Proveedor.objects.filter(nombre="Otro proveedor").exists())
+        self.assertLibroCuadra()
+
+    def test_producto_repetido_y_existente(self):
+        resultado = self.importar(
+            self.encabezado
+            + "Cadena,Proveedor prueba,Tipo prueba,2,3.00,3.00\n"
+            + "Cadena,Proveedor prueba,Tipo prueba,5,3.00,3.40\n"
+            + "Producto prueba,Proveedor prueba,Tipo prueba,1,6.00,6.00\n"
+            + "Producto prueba,Proveedor prueba,Tipo prueba,1,6.00,\n"
+        )
+        self.assertTrue(resultado.ok, resultado.errores)
+        self.assertEqual((resultado.compras, resultado.productos_nuevos, resultado.productos_actualizados), (4, 1, 1))
+        cadena = Producto.objects.get(nombre="Cadena")
+        self.assertEqual(cadena.costo_unitario, Decimal("3.40"))  # gana la última fila
+        self.assertEqual(ProductoStock.objects.get(producto=cadena).stock, 7)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.costo_unitario, Decimal("6.00"))
+        self.assertEqual(Producto.objects.filter(nombre="Producto prueba").count(), 1)
+        self.assertLibroCuadra()
+
+    def test_csv_de_excel_en_windows_1252(self):
+        resultado = self.importar(
+            self.encabezado + "Anillo corazón,Proveedor prueba,Tipo prueba,1,2,\n", codificacion="cp1252"
+        )
+        self.assertTrue(resultado.ok, resultado.errores)
+        self.assertTrue(Producto.objects.filter(nombre="Anillo corazón").exists())
+
+        # 0x81 no es UTF-8 válido ni está definido en Windows-1252
+        crudo = (self.encabezado + "Anillo,Proveedor prueba,Tipo prueba,1,2,\n").encode() + b"Bad\x81,x,y,1,2,\n"
+        with self.assertRaisesMessage(ErrorImportacion, "Fila 3"):
+            importar_compras(io.BytesIO(crudo), "compras.csv")
+        self.assertFalse(Producto.objects.filter(nombre="Anillo").exists())
+
+    def test_vista_informa_archivo_ilegible(self):
+        with self.assertRaisesMessage(ErrorImportacion, "Faltan columnas"):
+            self.importar("nombre,cantidad\nAnillo,1\n")
+
+        archivo = io.BytesIO(b"nombre,proveedor,tipo,cantidad,precio_unitario\n\x81\n")
+        archivo.name = "compras.csv"
+        respuesta = self.client.post(reverse("compra_importar"), {"archivo": archivo})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, "Windows-1252")
+
+
+class HiloInmediato:
+    """Sustituto de threading.Thread que corre el trabajo al llamar start()."""
+    iniciados = 0
+
+    def __init__(self, target, **kwargs):
+        self.target = target
+
+    def start(self):
+        type(self).iniciados += 1
+        self.target()
+
+
+class PoolInmediato:
+    """Sustituto de ThreadPoolExecutor que corre cada trabajo al enviarlo (la transacción del test es de este hilo)."""
+
+    def __init__(self, max_workers=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, funcion, *args):
+        futuro = Future()
+        try:
+            futuro.set_result(funcion(*args))
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+
+class PoolDelTest:
+    """Sustituto de dashboard._pool: cada componente corre en el hilo del test, con su conexión y su transacción."""
+
+    def submit(self, funcion, *args):
+        return asyncio.run_coroutine_threadsafe(sync_to_async(funcion)(*args), asyncio.get_running_loop())
+
+
+class Reloj:
+    """time.monotonic/time.sleep de mentira: sleep() avanza el reloj y anota la espera."""
+
+    def __init__(self):
+        self.ahora = 0.0
+        self.esperas = []
+
+    def monotonic(self):
+        return self.ahora
+
+    def sleep(self, segundos):
+        self.esperas.append(segundos)
+        self.ahora += segundos
+
+
+class CuboDeTokensTests(SimpleTestCase):
+
+    def setUp(self):
+        self.reloj = Reloj()
+        parche = mock.patch("core.services.time", self.reloj)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_rafaga_y_ritmo(self):
+        cubo = services.CuboDeTokens(por_minuto=60, capacidad=2)
+        cubo.tomar()
+        cubo.tomar()
+        self.assertEqual(self.reloj.esperas, [])
+        cubo.tomar()
+        self.assertEqual(self.reloj.esperas, [1.0])  # 60/min: un token por segundo
+
+        self.reloj.ahora += 10  # la ráfaga se repone hasta la capacidad, no más
+        for _ in range(3):
+            cubo.tomar()
+        self.assertEqual(self.reloj.esperas, [1.0, 1.0])
+
+    def test_vaciar_pausa_a_todos_lo_pedido(self):
+        cubo = services.CuboDeTokens(por_minuto=60, capacidad=5)
+        cubo.vaciar(10)
+        cubo.tomar()
+        self.assertAlmostEqual(sum(self.reloj.esperas), 11.0)  # los 10 s más el token
+
+    def test_espera_sugerida(self):
+        def limite(cabeceras=None):
+            return groq.RateLimitError("429", response=respuesta_groq(429, cabeceras), body=None)
+
+        self.assertEqual(services.espera_sugerida(limite({"retry-after": "7"}), 0), 7.0)
+        self.assertTrue(2 <= services.espera_sugerida(limite(), 1) < 3)
+        self.assertTrue(60 <= services.espera_sugerida(limite(), 10) < 61)
+        self.assertTrue(1 <= services.espera_sugerida(RuntimeError("sin respuesta"), 0) < 2)
+
+
+@mock.patch("core.management.commands.enriquecer_productos_ia.ThreadPoolExecutor", PoolInmediato)
+@mock.patch("core.management.commands.enriquecer_productos_ia.close_old_connections", mock.Mock())
+class EnriquecerProductosTests(CatalogoMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.limitado = cls.crear_producto("Anillo limitado")
+        cls.sin_precio = cls.crear_producto("Collar sin precio")
+
+    def precio_falso(self, producto):
+        # el cliente no reintenta solo: los reintentos pasan por el cubo del comando
+        self.assertEqual(services._reintentos_groq.get(), 0)
+        if producto.pk == self.limitado.pk and not self.limitado_una_vez:
+            self.limitado_una_vez = True
+            raise groq.RateLimitError("429", response=respuesta_groq(429, {"retry-after": "0"}), body=None)
+        if producto.pk == self.sin_precio.pk:
+            raise groq.AuthenticationError("clave inválida", response=respuesta_groq(401), body=None)
+        return Decimal("120.50")
+
+    def test_completa_por_lotes_y_conserva_lo_que_salio(self):
+        self.limitado_una_vez = False
+        salida, errores = io.StringIO(), io.StringIO()
+        comando = "core.management.commands.enriquecer_productos_ia"
+        reintentos_cliente = []
+
+        def descripcion_falsa(messages):
+            reintentos_cliente.append(services._reintentos_groq.get())
+            return "Descripción de lujo."
+
+        with mock.patch("core.services._chat_groq", side_effect=descripcion_falsa), \
+                mock.patch(f"{comando}.calcular_precio_sugerido_ia", side_effect=self.precio_falso) as precio, \
+                mock.patch.object(services.CuboDeTokens, "vaciar", autospec=True,
+                                  side_effect=services.CuboDeTokens.vaciar) as vaciar, \
+                CaptureQueriesContext(connection) as consultas:
+            call_command("enriquecer_productos_ia", lote=2, rpm=6000, stdout=salida, stderr=errores)
+
+        self.assertEqual(reintentos_cliente, [0, 0, 0])
+        self.assertEqual(precio.call_count, 4)  # 3 productos y el reintento tras el 429
+        vaciar.assert_called_once_with(mock.ANY, 0.0)
+        actualizaciones = [c for c in consultas if c["sql"].startswith('UPDATE "producto_producto"')]
+        self.assertEqual(len(actualizaciones), 2)  # un bulk_update por lote
+
+        valores = dict(Producto.objects.values_list("nombre", "precio_sugerido_ia"))
+        self.assertEqual(valores, {
+            "Producto prueba": Decimal("120.50"),
+            "Anillo limitado": Decimal("120.50"),
+            "Collar sin precio": None,
+        })
+        # falló el precio, pero la descripción del mismo producto se guardó
+        self.assertEqual(set(Producto.objects.values_list("descripcion_ia", flat=True)), {"Descripción de lujo."})
+        self.assertIn(f"producto {self.sin_precio.pk}: precio: clave inválida", errores.getvalue())
+        self.assertIn("3 productos revisados, 1 con error", salida.getvalue())
+
+
+class TasaCambioTests(CatalogoMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        HiloInmediato.iniciados = 0
+        # el hilo de refresco cierra su conexión; aquí es la del test
+        for objetivo, sustituto in (("threading.Thread", HiloInmediato), ("connection", mock.Mock())):
+            parche = mock.patch(f"core.services.{objetivo}", sustituto)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def guardar_tasa(self, valor, hace_minutos):
+        tasa = TasaCambio.objects.create(tasa=Decimal(valor))
+        TasaCambio.objects.filter(pk=tasa.pk).update(created_at=timezone.now() - timedelta(minutes=hace_minutos))
+        cache.delete(services.TASA_CACHE_KEY)
+        return TasaCambio.objects.get(pk=tasa.pk)
+
+    def test_tasa_vigente_no_consulta_la_fuente(self):
+        vigente = self.guardar_tasa("36.50", hace_minutos=1)
+        with mock.patch("core.services.consultar_dolarapi") as fuente:
+            self.assertEqual(services.obtener_tasa(), vigente)
+        fuente.assert_not_called()
+
+    def test_tasa_vencida_se_sirve_y_se_refresca_aparte(self):
+        vieja = self.guardar_tasa("36.50", hace_minutos=120)
+        version = cache_versionada.version("tasa", fresca=True)
+        with mock.patch("core.services.consultar_dolarapi", return_value=Decimal("37.10")):
+            self.assertEqual(services.obtener_tasa(), vieja)  # no espera a la fuente
+        self.assertEqual(services.tasa_actual().tasa, Decimal("37.10"))
+        self.assertEqual(list(TasaCambio.objects.values_list("tasa", flat=True)), [Decimal("37.10"), Decimal("36.50")])
+        self.assertGreater(cache_versionada.version("tasa", fresca=True), version)
+        self.assertIsNone(cache.get(services.TASA_LOCK_KEY))
+
+    @override_settings(TASA_REINTENTO_SEGUNDOS=60, TASA_REINTENTO_MAX_SEGUNDOS=100)
+    def test_fuente_caida_espera_antes_de_reintentar(self):
+        vieja = self.guardar_tasa("36.50", hace_minutos=120)
+        caida = mock.patch("core.services.consultar_dolarapi", side_effect=ConnectionError("caída"))
+        with caida as fuente, self.assertLogs("core.services", "WARNING"):
+            for _ in range(5):
+                self.assertEqual(services.obtener_tasa(), vieja)
+            self.assertEqual((HiloInmediato.iniciados, fuente.call_count), (1, 1))
+            self.assertEqual(TasaCambio.objects.count(), 1)
+
+            cache.delete(services.TASA_ESPERA_KEY)  # pasó la espera
+            services.obtener_tasa()
+            self.assertEqual(fuente.call_count, 2)
+            self.assertEqual(cache.get(services.TASA_FALLOS_KEY), 2)
+            self.assertEqual(services._registrar_fallo_tasa(), 100)  # 60 * 2**2, con tope
+
+        cache.delete(services.TASA_ESPERA_KEY)
+        with mock.patch("core.services.consultar_dolarapi", return_value=Decimal("37.10")):
+            services.obtener_tasa()
+        self.assertIsNone(cache.get(services.TASA_FALLOS_KEY))
+        self.assertEqual(services.tasa_actual().tasa, Decimal("37.10"))
+
+    def test_sin_ninguna_tasa(self):
+        with mock.patch("core.services.consultar_dolarapi", side_effect=ConnectionError("caída")):
+            with self.assertLogs("core.services", "WARNING"):
+                self.assertIsNone(services.obtener_tasa())
+
+    def test_sin_tasa_no_se_consulta_la_bd_en_cada_request(self):
+        with CaptureQueriesContext(connection) as consultas:
+            for _ in range(3):
+                self.assertIsNone(services.tasa_actual())
+        self.assertEqual(sum("core_tasacambio" in q["sql"] for q in consultas.captured_queries), 1)
+        # al guardar la primera tasa se sirve enseguida, sin esperar a que venza el "sin tasa"
+        with mock.patch("core.services.consultar_dolarapi", return_value=Decimal("37.10")):
+            services.refrescar_tasa()
+        self.assertEqual(services.tasa_actual().tasa, Decimal("37.10"))
+
+    @override_settings(HTTP_REINTENTOS=2, HTTP_TIMEOUT_CONEXION=3.05, HTTP_TIMEOUT_LECTURA=15)
+    def test_el_candado_dura_mas_que_el_peor_refresco(self):
+        # 3 intentos de 18.05 s + 1 s de pausa antes del segundo reintento
+        self.assertGreater(services._candado_tasa_segundos(), 55.15)
+        with mock.patch.object(services.cache, "add", return_value=False) as add:
+            self.assertFalse(services.refrescar_tasa_en_segundo_plano())
+        add.assert_called_once_with(services.TASA_LOCK_KEY, mock.ANY, services._candado_tasa_segundos())
+        with override_settings(HTTP_REINTENTOS=5):
+            self.assertGreater(services._candado_tasa_segundos(), 6 * 18.05 + 0.5 * (2 + 4 + 8 + 16))
+
+
+class ClientesHttpTests(SimpleTestCase):
+
+    def setUp(self):
+        self.global_ = services.clientes
+        self.registro = services._RegistroClientes()
+        parche = mock.patch.object(services, "clientes", self.registro)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_una_sesion_por_proceso_con_reintentos_y_pool(self):
+        session = self.registro.session()
+        self.assertIs(self.registro.session(), session)
+        adaptador = session.get_adapter("https://ve.dolarapi.com/")
+        self.assertEqual(adaptador.max_retries.total, settings.HTTP_REINTENTOS)
+        self.assertEqual(adaptador._pool_maxsize, settings.HTTP_POOL_SIZE)
+
+    def test_tras_un_fork_el_hijo_crea_sus_clientes(self):
+        session = self.registro.session()
+        self.registro.stats["dolarapi"].registrar(0.1)
+        self.registro._pid = -1  # como si este proceso fuera el hijo
+        self.assertIsNot(self.registro.session(), session)
+        self.assertEqual(self.registro.stats["dolarapi"].solicitudes, 0)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "sin fork()")
+    def test_register_at_fork_reinicia_el_registro_global(self):
+        original = self.global_
+        original.session()
+        leer, escribir = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # hijo: solo informa y sale sin pasar por el test runner
+            reiniciado = original._session is None and original._pid == os.getpid()
+            os.write(escribir, b"1" if reiniciado else b"0")
+            os._exit(0)
+        os.close(escribir)
+        os.waitpid(pid, 0)
+        self.assertEqual(os.read(leer, 1), b"1")
+        os.close(leer)
+        self.assertIsNotNone(original._session)  # el padre conserva la suya
+
+    def test_medir_suma_al_cliente_y_al_request(self):
+        medicion, token = instrumentacion.iniciar()
+        try:
+            with services.medir("dolarapi"):
+                pass
+            with self.assertRaises(RuntimeError), services.medir("dolarapi"):
+                raise RuntimeError("caída")
+        finally:
+            instrumentacion.terminar(token)
+        datos = self.registro.estadisticas()["dolarapi"]
+        self.assertEqual((datos["solicitudes"], datos["errores"]), (2, 1))
+        self.assertEqual(medicion.externos["dolarapi"][0], 2)
+
+    def test_conexiones_del_pool_de_urllib3(self):
+        session = self.registro.session()
+        pool = session.get_adapter("https://ve.dolarapi.com/").poolmanager.connection_from_url(
+            "https://ve.dolarapi.com/"
+        )
+        pool.num_connections = 3
+        for _ in range(6):
+            self.registro.stats["dolarapi"].registrar(0.01)
+        datos = self.registro.estadisticas()["dolarapi"]
+        self.assertEqual((datos["conexiones_nuevas"], datos["reuso_conexiones"]), (3, 0.5))
+
+        # si urllib3 cambia por dentro, no se inventa un reuso
+        pools = session.get_adapter("https://ve.dolarapi.com/").poolmanager.pools
+        with mock.patch.object(type(pools), "keys", side_effect=AttributeError("otra versión")):
+            datos = self.registro.estadisticas()["dolarapi"]
+        self.assertEqual((datos["conexiones_nuevas"], datos["reuso_conexiones"]), (None, None))
+
+
+class DashboardTests(SimpleTestCase):
+    """Componentes sin BD: lo que se prueba es el timeout, el fallo y el tope de hilos."""
+
+    def setUp(self):
+        self.liberar = threading.Event()
+        self.addCleanup(self.liberar.set)
+
+    def cargar(self, **componentes):
+        return async_to_sync(dashboard.cargar)(componentes)
+
+    def lento(self):
+        self.liberar.wait(5)
+        return "tarde"
+
+    def test_timeout_y_fallo_quedan_no_disponibles(self):
+        def falla():
+            raise RuntimeError("sin conexión")
+
+        inicio = time.perf_counter()
+        with self.assertLogs("core.dashboard", "WARNING"):
+            datos = self.cargar(rapido=(lambda: 7, None), lento=(self.lento, 0.1), roto=(falla, None))
+        self.assertLess(time.perf_counter() - inicio, 2)
+        self.assertEqual(datos["rapido"], 7)
+        self.assertEqual(sorted(datos["no_disponibles"]), ["lento", "roto"])
+
+    def test_hilos_ocupados_por_componentes_vencidos(self):
+        parche = mock.patch.object(dashboard, "_libres", threading.BoundedSemaphore(1))
+        parche.start()
+        self.addCleanup(parche.stop)
+
+        with self.assertLogs("core.dashboard", "WARNING"):
+            self.assertIsNone(self.cargar(lento=(self.lento, 0.05))["lento"])
+            # el hilo del componente vencido sigue ocupado: no se encola otro detrás
+            inicio = time.perf_counter()
+            self.assertEqual(self.cargar(rapido=(lambda: 7, None))["no_disponibles"], ["rapido"])
+            self.assertLess(time.perf_counter() - inicio, 0.5)
+
+        self.liberar.set()  # terminó la consulta lenta: su resultado se descarta
+        for _ in range(100):
+            if dashboard._libres.acquire(blocking=False):
+                dashboard._libres.release()
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.cargar(rapido=(lambda: 7, None))["rapido"], 7)
+
+
+class DashboardVistaTests(CatalogoMixin, TestCase):
+    usuario_nombre = "gerente"
+
+    def setUp(self):
+        super().setUp()
+        # los componentes corren en este hilo, dentro de la transacción del test
+        for objetivo, sustituto in (("_pool", PoolDelTest()), ("close_old_connections", mock.Mock())):
+            parche = mock.patch.object(dashboard, objetivo, sustituto)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def test_muestra_los_datos_sin_una_consulta_por_producto(self):
+        TasaCambio.objects.create(tasa=Decimal("36.50"))
+        self.comprar(3)
+        for i in range(5):
+            self.crear_producto(f"Anillo {i}")
+        self.client.get(reverse("dashboard"))  # sesión, usuario, versiones y tasa en caché
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse("dashboard"))
+        self.assertContains(respuesta, "Producto prueba")
+        self.assertContains(respuesta, "$15.00 USD")
+        self.assertContains(respuesta, "Bs. 547.50")
+        self.assertNotContains(respuesta, "No disponible")
+        # una por componente (la tasa sale de la caché), no una por producto
+        datos = [c["sql"] for c in consultas if "core_cache" not in c["sql"]]
+        self.assertEqual(len(datos), 6, datos)
+
+    def test_componente_caido_se_muestra_no_disponible(self):
+        def falla():
+            raise DatabaseError("sin conexión")
+
+        self.comprar(3)
+        caidos = {"dinero_deuda_usd": (falla, None), "total_proveedores": (falla, None)}
+        with mock.patch.dict(dashboard.COMPONENTES, caidos), \
+                mock.patch("core.services.refrescar_tasa_en_segundo_plano"), \
+                self.assertLogs("core.dashboard", "ERROR"):
+            respuesta = self.client.get(reverse("dashboard"))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, "No disponible", count=1)  # la deuda, no un $0.00
+        self.assertContains(respuesta, 'Total proveedores: <span class="font-semibold text-slate-700">no disponible')
+        self.assertContains(respuesta, "$15.00 USD")
+        self.assertContains(respuesta, "Tasa USD/Bs no disponible todavía.")
+
+
+class StreamingTests(SimpleTestCase):
+
+    def test_asgi_no_junta_el_cuerpo(self):
+        producidas = []
+
+        def partes():
+            for i in range(5):
+                producidas.append(i)
+                yield f"{i},"
+
+        iterador = cuerpo(AsyncRequestFactory().get("/"), partes(), partes_por_salto=2)
+
+        async def primera():
+            return await iterador.__anext__()
+
+        self.assertEqual(async_to_sync(primera)(), "0,")
+        self.assertEqual(producidas, [0, 1])  # solo el primer bloque, no las 5
+
+        wsgi = partes()
+        self.assertIs(cuerpo(RequestFactory().get("/"), wsgi), wsgi)
+
+
+class ExportacionCsvTests(CatalogoMixin, TestCase):
+    usuario_nombre = "contable"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.formula = cls.crear_producto("=SUMA(A1)", costo_unitario=Decimal("3.00"))
+        cls.comprar(4)
+        cls.comprar(2, producto=cls.formula, precio=Decimal("3.00"))
+        venta = Venta.objects.create(
+            producto=cls.producto, cantidad=1, precio_unitario=Decimal("10.00"), a_plazos=True
+        )
+        PagoVenta.objects.create(venta=venta, monto=Decimal("4.00"))
+
+    def descargar(self, nombre):
+        with mock.patch("core.views._tasa_o_none", return_value=Decimal("40.00")):
+            respuesta = self.client.get(reverse(nombre))
+        self.assertTrue(respuesta.streaming)
+        self.assertEqual(respuesta["Content-Type"], "text/csv; charset=utf-8")
+        return respuesta
+
+    def filas(self, respuesta):
+        contenido = b"".join(respuesta.streaming_content).decode("utf-8")
+        self.assertTrue(contenido.startswith("\ufeff"))
+        return list(csv.reader(io.StringIO(contenido[1:])))
+
+    def test_inventario(self):
+        respuesta = self.descargar("inventario_exportar")
+        self.assertRegex(respuesta["Content-Disposition"], r'^attachment; filename="inventario-\d{8}-\d{4}\.csv"$')
+        encabezado, *filas = self.filas(respuesta)
+        self.assertEqual(encabezado[:5], ["id", "producto", "proveedor", "tipo", "stock"])
+        self.assertEqual(encabezado[-2:], ["valor_costo_usd", "valor_costo_bs"])
+        por_id = {int(f[0]): f for f in filas}
+        self.assertEqual(
+            por_id[self.producto.pk],
+            [str(self.producto.pk), "Producto prueba", "Proveedor prueba", "Tipo prueba", "3",
+             "5.00", "5.00", "0.00", "15.00", "600.00"],
+        )
+        # un texto que Excel tomaría por fórmula sale con apóstrofo
+        self.assertEqual(por_id[self.formula.pk][1], "'=SUMA(A1)")
+
+    def test_ventas_y_deudas(self):
+        for nombre, archivo in (("venta_exportar", "ventas"), ("deudas_exportar", "deudas")):
+            respuesta = self.descargar(nombre)
+            self.assertIn(f'filename="{archivo}-', respuesta["Content-Disposition"])
+            encabezado, fila = self.filas(respuesta)
+            self.assertEqual(dict(zip(encabezado, fila)) | {"fecha": ""}, {
+                "id": str(Venta.objects.get().pk), "fecha": "", "producto": "Producto prueba",
+                "proveedor": "Proveedor prueba", "cantidad": "1", "precio_unitario_usd": "10.00",
+                "total_usd": "10.00", "total_bs": "400.00", "a_plazos": "si", "pagado_usd": "4.00",
+                "saldo_usd": "6.00", "saldo_bs": "240.00", "nota": "",
+            })
+
+    def test_sin_tasa_las_columnas_en_bs_quedan_vacias(self):
+        with mock.patch("core.views._tasa_o_none", return_value=None):
+            respuesta = self.client.get(reverse("compra_exportar"))
+        encabezado, *filas = self.filas(respuesta)
+        self.assertEqual(len(filas), 2)
+        self.assertEqual({dict(zip(encabezado, f))["total_bs"] for f in filas}, {""})
+
+    def test_lee_por_bloques_sin_materializar(self):
+        respuesta = self.descargar("compra_exportar")
+        iterator = QuerySet.iterator
+        with mock.patch.object(QuerySet, "iterator", autospec=True, side_effect=iterator) as por_bloques, \
+                mock.patch.object(QuerySet, "_fetch_all", side_effect=AssertionError("lista completa")):
+            encabezado, *filas = self.filas(respuesta)
+        por_bloques.assert_called_once_with(mock.ANY, chunk_size=exportacion.CHUNK_SIZE)
+        self.assertEqual(len(filas), 2)
+
+
+class LibroStockTests(CatalogoMixin, TestCase):
+    usuario_nombre = "almacen"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.otro = cls.crear_producto("Otro producto", costo_unitario=Decimal("2.00"))
+
+    def test_compras_editadas_eliminadas_y_anuladas(self):
+        compra = self.comprar(10)
+        otra = self.comprar(4, producto=self.otro, precio=Decimal("2.50"))
+        self.assertLibroCuadra()
+
+        compra.cantidad, compra.precio_unitario = 12, Decimal("5.50")
+        compra.save()
+        self.assertLibroCuadra()
+        otra.producto = self.producto  # cambia de producto: sale de uno y entra en el otro
+        otra.save()
+        self.assertLibroCuadra()
+        self.assertEqual(ProductoStock.objects.get(producto=self.otro).stock, 0)
+
+        self.client.post(reverse("compra_anular", args=[otra.pk]))
+        otra.refresh_from_db()
+        self.assertTrue(otra.anulada)
+        self.assertLibroCuadra()
+        compra.delete()
+        self.assertLibroCuadra()
+        self.assertEqual(ProductoStock.objects.get(producto=self.producto).stock, 0)
+
+    def test_ventas_y_cambio_de_costo(self):
+        self.comprar(10)
+        venta = Venta.objects.create(producto=self.producto, cantidad=3, precio_unitario=Decimal("9.00"))
+        self.assertLibroCuadra()
+        venta.cantidad = 5
+        venta.save()
+        self.assertLibroCuadra()
+
+        self.producto.costo_unitario = Decimal("6.00")
+        self.producto.save()
+        self.assertLibroCuadra()
+        self.assertEqual(ProductoStock.objects.get(producto=self.producto).valor_costo, Decimal("30.00"))
+
+        venta.delete()
+        self.assertLibroCuadra()
+        self.assertEqual(ProductoStock.objects.get(producto=self.producto).stock, 10)
+
+    def test_verificar_y_reconstruir(self):
+        self.comprar(10)
+        self.comprar(3, producto=self.otro)
+        Venta.objects.create(producto=self.producto, cantidad=2, precio_unitario=Decimal("9.00"))
+        self.assertEqual(stock.verificar(), [])
+
+        ProductoStock.objects.filter(producto=self.producto).update(stock=99, cantidad_salida=0)
+        ProductoStock.objects.filter(producto=self.otro).delete()
+        diferencias = stock.verificar()
+        self.assertIn((self.producto.pk, "stock", 8, 99), diferencias)
+        self.assertIn((self.otro.pk, "fila", "existe", "falta"), diferencias)
+
+        self.assertEqual(stock.reconstruir(), 2)
+        self.assertEqual(stock.verificar(), [])
+        self.assertLibroCuadra()
+
+
+class StockInsuficienteTests(CatalogoMixin, TestCase):
+    producto_nombre = "Solitario"
+    usuario_nombre = "cajero"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.compra = cls.comprar(2)
+
+    def stock(self):
+        return ProductoStock.objects.get(producto=self.producto).stock
+
+    def test_no_vende_mas_de_lo_que_hay(self):
+        Venta.objects.create(producto=self.producto, cantidad=2, precio_unitario=Decimal("9.00"))
+        with self.assertRaises(StockInsuficiente):
+            with transaction.atomic():
+                Venta.objects.create(producto=self.producto, cantidad=1, precio_unitario=Decimal("9.00"))
+        self.assertEqual(self.stock(), 0)
+        self.assertEqual(Venta.objects.count(), 1)
+
+    def test_restriccion_en_la_base_de_datos(self):
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                ProductoStock.objects.filter(producto=self.producto).update(stock=-1)
+
+    def test_no_anula_compra_ya_vendida(self):
+        Venta.objects.create(producto=self.producto, cantidad=1, precio_unitario=Decimal("9.00"))
+        self.client.post(reverse("compra_anular", args=[self.compra.pk]))
+        self.compra.refresh_from_db()
+        self.assertFalse(self.compra.anulada)
+        self.assertEqual(self.stock(), 1)
+
+    def test_venta_create_sin_stock_muestra_error(self):
+        Venta.objects.create(producto=self.producto, cantidad=2, precio_unitario=Decimal("9.00"))
+        respuesta = self.client.post(reverse("venta_create"), {
+            "producto": self.producto.pk, "cantidad": 1, "precio_unitario": "9.00", "pago_inicial": "0.00",
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, "Stock insuficiente")
+        self.assertEqual(Venta.objects.count(), 1)
+
+
+class GetCondicionalTests(CatalogoMixin, TestCase):
+    producto_nombre = "Pulsera"
+    usuario_nombre = "vendedora"
+
+    def test_304_sin_consultar_datos_hasta_que_hay_una_compra(self):
+        url = reverse("compra_list")
+        etag = self.client.get(url).headers["ETag"]
+        etag = self.client.get(url).headers["ETag"]  # ya con la cookie CSRF
+
+        with self.assertSoloLeeVersiones(usuario=True):
+            respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Movimiento.objects.create(producto=self.producto, cantidad=1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_la_vista_recibe_las_versiones_del_etag(self):
+        url = reverse("compra_list")
+        self.client.get(url)
+        invalidar_en_otro_worker("compras")  # el L1 de este proceso queda atrasado
+        respuesta = self.client.get(url)
+        self.assertEqual(
+            respuesta.wsgi_request.versiones_cache,
+            cache_versionada.versiones(("catalogo", "compras"), fresca=True),
+        )
+        self.assertNotEqual(
+            respuesta.wsgi_request.versiones_cache["compras"], cache_versionada.version("compras")
+        )
+
+    def test_el_etag_depende_de_los_filtros(self):
+        etag = self.client.get(reverse("inventario")).headers["ETag"]
+        self.assertNotEqual(self.client.get(reverse("inventario"), {"q": "pulsera"}).headers["ETag"], etag)
+
+
+class FragmentosTests(CatalogoMixin, TestCase):
+    producto_nombre = "Zarcillos"
+    costo = Decimal("2.00")
+    usuario_nombre = "encargado"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.comprar(3)
+
+    def test_tabla_en_cache_hasta_que_cambian_los_datos(self):
+        url = reverse("compra_list")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url)
+        self.assertFalse([c for c in consultas if "movimiento_movimiento" in c["sql"]])
+        self.assertContains(respuesta, "Zarcillos")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.comprar(7)
+        self.assertContains(self.client.get(url), "14.00")
+
+    def test_van_en_su_propia_tabla(self):
+        self.client.get(reverse("compra_list"))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT cache_key FROM core_cache_fragmentos")
+            fragmentos = [fila[0] for fila in cursor.fetchall()]
+            cursor.execute("SELECT cache_key FROM core_cache")
+            compartidas = [fila[0] for fila in cursor.fetchall()]
+        self.assertTrue(fragmentos)
+        self.assertTrue(all(c.startswith(":1:template.cache.") for c in fragmentos))
+        self.assertFalse([c for c in compartidas if "template.cache." in c])
+        self.assertIn(":1:ver:compras", compartidas)
+
+        # el culling de cada tabla se configura aparte (no el MAX_ENTRIES=300 de Django)
+        self.assertEqual(caches["compartida"]._max_entries, 20000)
+        self.assertEqual(caches["fragmentos_l2"]._max_entries, 5000)
+        self.assertNotEqual(caches["fragmentos"].l1, cache.l1)
+
+    def test_escritura_en_otro_worker_con_l1_atrasado(self):
+        url = reverse("compra_list")
+        etag = self.client.get(url).headers["ETag"]
+        self.comprar(7)  # sin on_commit: este proceso no se entera
+        invalidar_en_otro_worker("compras")
+
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, "14.00")
+        # el siguiente 304 corresponde a la tabla nueva
+        nuevo = respuesta.headers["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=nuevo).status_code, 304)
+
+
+class ApiTests(CatalogoMixin, TestCase):
+    proveedor_nombre = "Proveedor API"
+    producto_nombre = "Pulsera 0"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.producto.precio_venta_unitario = Decimal("10.00")
+        cls.producto.save()
+        cls.productos = [cls.producto] + [
+            cls.crear_producto(f"Pulsera {i}", precio_venta_unitario=Decimal("10.00") + i) for i in (1, 2)
+        ]
+        cls.comprar(4)
+        cls.token, cls.clave = TokenAPI.crear("caja-prueba")
+
+    def _get(self, url, **extra):
+        respuesta = self.client.get(url, HTTP_AUTHORIZATION=f"Token {self.clave}", **extra)
+        if respuesta.status_code == 200:
+            respuesta.datos = json.loads(b"".join(respuesta.streaming_content))
+        return respuesta
+
+    def test_requiere_token_valido(self):
+        url = reverse("api_productos")
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Token otro").status_code, 401)
+        self.assertEqual(self._get(url).status_code, 200)
+
+        self.token.activo = False
+        self.token.save()
+        self.assertEqual(self._get(url).status_code, 401)
+
+    def test_campos_pedidos_sin_joins(self):
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self._get(reverse("api_productos") + "?fields=id,precio_venta_unitario").datos
+        self.assertEqual(datos["resultados"][0], {"id": self.productos[0].id, "precio_venta_unitario": "10.00"})
+        sql = consultas[-1]["sql"]
+        self.assertIn("producto_producto", sql)
+        self.assertNotIn("JOIN", sql)
+
+        fila = self._get(reverse("api_productos") + "?fields=id,stock,proveedor").datos["resultados"][0]
+        self.assertEqual(fila, {"id": self.productos[0].id, "stock": 4, "proveedor": "Proveedor API"})
+        self.assertEqual(self._get(reverse("api_productos") + "?fields=id,sku").status_code, 400)
+
+    def test_paginacion_por_cursor(self):
+        url = reverse("api_productos") + "?fields=id&limit=2"
+        primera = self._get(url).datos
+        self.assertEqual([f["id"] for f in primera["resultados"]], [p.id for p in self.productos[:2]])
+        segunda = self._get(f"{url}&cursor={primera['siguiente']}").datos
+        self.assertEqual([f["id"] for f in segunda["resultados"]], [self.productos[2].id])
+        self.assertIsNone(segunda["siguiente"])
+
+    def test_updated_since_incluye_cambios_de_stock(self):
+        marca = timezone.now() + timedelta(seconds=1)
+        Producto.objects.filter(pk__in=[p.pk for p in self.productos]).update(updated_at=marca - timedelta(days=1))
+        ProductoStock.objects.update(updated_at=marca - timedelta(days=1))
+        Movimiento.objects.create(producto=self.productos[1], cantidad=1, precio_unitario=Decimal("5.00"))
+        ProductoStock.objects.filter(producto=self.productos[1]).update(updated_at=marca)
+
+        desde = (marca - timedelta(minutes=1)).isoformat().replace("+00:00", "Z")
+        con_stock = self._get(reverse("api_productos") + f"?fields=id,stock&updated_since={desde}").datos
+        self.assertEqual(con_stock["resultados"], [{"id": self.productos[1].id, "stock": 1}])
+        sin_stock = self._get(reverse("api_productos") + f"?fields=id&updated_since={desde}").datos
+        self.assertEqual(sin_stock["resultados"], [])
+        self.assertEqual(self._get(reverse("api_stock") + "?updated_since=ayer").status_code, 400)
+
+    def test_etag_sin_consultas(self):
+        url = reverse("api_tipos")
+        etag = self._get(url)["ETag"]
+        with self.assertSoloLeeVersiones():
+            self.assertEqual(self._get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class EstaticosTests(CatalogoMixin, TestCase):
+    usuario_nombre = "encargado"
+
+    def test_sin_tailwind_en_tiempo_de_ejecucion(self):
+        html = self.client.get(reverse("compra_create")).content.decode()
+        self.assertNotIn("cdn.tailwindcss.com", html)
+        self.assertNotIn("<script>", html)
+        self.assertIn("core/css/app", html)
+        self.assertIn("core/js/compra_unificada", html)
+
+
+class AutenticacionTests(CatalogoMixin, TestCase):
+    usuario_nombre = "encargada"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.otra = User.objects.create_user("cajera", password="x")
+        cls.grupo = Group.objects.create(name="ventas")
+        cls.grupo.user_set.add(cls.usuario)
+        cls.permiso = Permission.objects.get(codename="add_tokenapi")
+
+    def cachear(self):
+        for usuario in (self.usuario, self.otra):
+            BackendConCache().get_user(usuario.pk)
+
+    def en_cache(self):
+        return {
+            u.username for u in (self.usuario, self.otra)
+            if cache.l2.get(clave_usuario(u.pk)) is not None
+        }
+
+    def test_vistas_async_leen_el_usuario_de_la_cache(self):
+        self.cachear()
+        with CaptureQueriesContext(connection) as consultas:
+            usuario = async_to_sync(BackendConCache().aget_user)(self.usuario.pk)
+        self.assertEqual(usuario, self.usuario)
+        self.assertEqual([c["sql"] for c in consultas if "core_cache" not in c["sql"]], [])
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cached_db")
+    def test_logout_en_un_worker_cierra_la_sesion_en_los_demas(self):
+        clave = self.client.session.session_key
+        # otro worker: su propio "default" escalonado (otro L1) y la misma "compartida"
+        otro_worker = {
+            "default": CacheEscalonada("otro-worker", {"OPTIONS": {"L2": "compartida"}}),
+            "compartida": caches["compartida"],
+        }
+        with mock.patch("django.contrib.sessions.backends.cached_db.caches", otro_worker):
+            self.assertIn("_auth_user_id", SessionStore(clave).load())
+
+        self.client.logout()  # en este worker
+
+        with mock.patch("django.contrib.sessions.backends.cached_db.caches", otro_worker):
+            self.assertEqual(SessionStore(clave).load(), {})
+
+    def test_login_y_otros_campos_no_borran_usuarios(self):
+        self.cachear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(self.client.login(username="cajera", password="x"))
+            self.usuario.first_name = "Ana"
+            self.usuario.save()
+        self.assertEqual(self.en_cache(), {"encargada", "cajera"})
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.usuario.save(update_fields=["last_login"])
+        self.assertEqual(len(consultas), 1)  # solo el UPDATE
+
+    def test_contrasena_e_is_active_borran_solo_a_ese_usuario(self):
+        self.cachear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.otra.set_password("clave-nueva-456")
+            self.otra.save()
+        self.assertEqual(self.en_cache(), {"encargada"})
+
+        self.cachear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.otra.is_active = False
+            self.otra.save()
+        self.assertEqual(self.en_cache(), {"encargada"})
+        self.assertIsNone(BackendConCache().get_user(self.otra.pk))
+
+    def test_permisos_borran_a_los_usuarios_afectados(self):
+        casos = [
+            (lambda: self.grupo.permissions.add(self.permiso), {"encargada"}),
+            (lambda: self.grupo.user_set.add(self.otra), {"cajera"}),
+            (lambda: self.permiso.group_set.clear(), {"encargada", "cajera"}),
+            (lambda: self.permiso.user_set.add(self.otra), {"cajera"}),
+            (lambda: self.otra.user_permissions.clear(), {"cajera"}),
+            (lambda: self.usuario.groups.remove(self.grupo), {"encargada"}),
+        ]
+        for cambio, borrados in casos:
+            self.cachear()
+            with self.captureOnCommitCallbacks(execute=True):
+                cambio()
+            self.assertEqual(self.en_cache(), {"encargada", "cajera"} - borrados)
+
+        # el permiso nuevo del grupo se ve en el request siguiente
+        self.cachear()
+        self.assertFalse(BackendConCache().get_user(self.otra.pk).has_perm("core.add_tokenapi"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.grupo.permissions.add(self.permiso)
+        self.assertTrue(BackendConCache().get_user(self.otra.pk).has_perm("core.add_tokenapi"))
+
+    def test_el_usuario_no_pasa_por_el_l1(self):
+        self.assertEqual(self.client.get(reverse("tipo_list")).status_code, 200)
+        self.assertIsNone(cache.l1.get(clave_usuario(self.usuario.pk)))
+        self.assertIsNotNone(cache.l2.get(clave_usuario(self.usuario.pk)))
+
+        # otro worker cambia la contraseña y borra la clave: este lo ve ya
+        User.objects.filter(pk=self.usuario.pk).update(password=make_password("clave-nueva-456"))
+        autenticacion.olvidar(self.usuario.pk)
+        self.assertEqual(self.client.get(reverse("tipo_list")).status_code, 302)
+
+    def test_usuario_y_sesion_desde_la_cache(self):
+        self.client.get(reverse("tipo_list"))
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse("tipo_list"))
+        tablas = " ".join(c["sql"] for c in consultas)
+        self.assertNotIn("auth_user", tablas)
+        self.assertNotIn("django_session", tablas)
+
+    def test_cambiar_contrasena_cierra_la_sesion(self):
+        self.assertEqual(self.client.get(reverse("tipo_list")).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.set_password("clave-nueva-456")
+            self.usuario.save()
+        self.assertEqual(self.client.get(reverse("tipo_list")).status_code, 302)
+
+    def test_permisos_nuevos_se_ven_sin_reiniciar(self):
+        self.client.get(reverse("tipo_list"))
+        self.assertFalse(self.usuario.has_perm("core.add_tokenapi"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.user_permissions.add(Permission.objects.get(codename="add_tokenapi"))
+        respuesta = self.client.get(reverse("tipo_list"))
+        self.assertTrue(respuesta.wsgi_request.user.has_perm("core.add_tokenapi"))
+
+
+@override_settings(INSTRUMENTACION=True, INSTRUMENTACION_LENTA_MS=60_000, INSTRUMENTACION_REPETIDAS=3)
+class InstrumentacionTests(CatalogoMixin, TestCase):
+    usuario_nombre = "medidora"
+
+    def medir(self, vista, ruta="/medida/"):
+        return InstrumentacionMiddleware(vista)(RequestFactory().get(ruta))
+
+    def registro(self, logs):
+        (linea,) = logs.output
+        return json.loads(linea.split(":", 2)[2])
+
+    @override_settings(INSTRUMENTACION_REPETIDAS=1000)  # solo la cabecera, sin log
+    def test_server_timing_en_una_vista(self):
+        respuesta = self.client.get(reverse("inventario"))
+        partes = respuesta["Server-Timing"].split(", ")
+        self.assertRegex(partes[0], r'^db;dur=\d+\.\d;desc="\d+ consultas"$')
+        self.assertRegex(partes[-1], r"^total;dur=\d+\.\d$")
+
+    def test_server_timing_con_llamadas_externas(self):
+        def vista(request):
+            Producto.objects.count()
+            instrumentacion.registrar_externo("groq", 0.25)
+            instrumentacion.registrar_externo("groq", 0.5)
+            return HttpResponse()
+
+        with self.assertNoLogs("core.instrumentacion"):
+            respuesta = self.medir(vista)
+        self.assertIn('db;dur=', respuesta["Server-Timing"])
+        self.assertIn('desc="1 consultas"', respuesta["Server-Timing"])
+        self.assertIn('groq;dur=750.0;desc="2 llamadas"', respuesta["Server-Timing"])
+        self.assertIsNone(instrumentacion.actual())
+
+    @override_settings(INSTRUMENTACION_LENTA_MS=0)
+    def test_request_lento(self):
+        with self.assertLogs("core.instrumentacion", "WARNING") as logs:
+            self.medir(lambda request: HttpResponse(status=201), ruta="/lenta/")
+        registro = self.registro(logs)
+        self.assertEqual(registro["evento"], "request_lento")
+        self.assertEqual((registro["ruta"], registro["status"], registro["consultas"]), ("/lenta/", 201, 0))
+
+    def test_consultas_repetidas(self):
+        def vista(request):
+            for i in range(3):  # N+1: misma consulta, otro parámetro
+                list(Producto.objects.filter(pk=i).values_list("nombre"))
+            list(Producto.objects.filter(pk__in=[1, 2]).values_list("nombre"))
+            list(Producto.objects.filter(pk__in=[1, 2, 3]).values_list("nombre"))
+            return HttpResponse()
+
+        with self.assertLogs("core.instrumentacion", "WARNING") as logs:
+            self.medir(vista)
+        registro = self.registro(logs)
+        self.assertEqual(registro["evento"], "consultas_repetidas")
+        self.assertEqual(registro["consultas"], 5)
+        self.assertEqual([r["veces"] for r in registro["repetidas"]], [3])
+        self.assertIn('WHERE "producto_producto"."id" = %s', registro["repetidas"][0]["sql"])
+
+    def test_listas_in_de_distinto_largo_son_la_misma_consulta(self):
+        def vista(request):
+            for n in (1, 2, 5):
+                list(Producto.objects.filter(pk__in=range(n)).values_list("nombre"))
+            return HttpResponse()
+
+        with self.assertLogs("core.instrumentacion", "WARNING") as logs:
+            self.medir(vista)
+        (repetida,) = self.registro(logs)["repetidas"]
+        self.assertEqual(repetida["veces"], 3)
+        self.assertIn('WHERE "producto_producto"."id" IN (...)', repetida["sql"])
+
+    @override_settings(INSTRUMENTACION=False)
+    def test_apagado(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            InstrumentacionMiddleware(lambda request: HttpResponse())
+
+
+class EstadoBdTests(CatalogoMixin, TestCase):
+    usuario_nombre = "admin-bd"
+
+    def test_informa_conexiones_y_pool(self):
+        datos = self.client.get(reverse("bd_estado")).json()
+        self.assertTrue(datos["default"]["conn_health_checks"])
+        if connection.vendor != "postgresql" or not connection.settings_dict["OPTIONS"].get("pool"):
+            self.assertIsNone(datos["default"]["pool"])
+        else:
+            self.assertIn("pool_size", datos["default"]["pool"])
+
+
+class SqliteProduccionTests(unittest.TestCase):
+    """
+    unittest y no django.test: la carga corre en hilos sobre copias de la BD
+    registradas como alias temporales, que los TestCase de Django no permiten.
+    No escribe en la BD de tests.
+    """
+
+    def test_carga_mixta_sin_database_is_locked(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("solo SQLite")
+        resultado = carga_sqlite.medir_perfil(
+            "produccion", carga_sqlite.perfiles()["produccion"], segundos=1.0, lectores=3, escritores=3
+        )
+        self.assertGreater(resultado["lecturas"]["operaciones"], 0)
+        self.assertGreater(resultado["escrituras"]["operaciones"], 0)
+        self.assertEqual(resultado["escrituras"]["database_is_locked"], 0)
+        self.assertEqual(resultado["lecturas"]["database_is_locked"], 0)
@@ -1,13 +1,16 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.dashboard, name="dashboard"),
     path("inventario/", views.inventario, name="inventario"),
+    path("inventario/exportar/", views.inventario_exportar, name="inventario_exportar"),
 
     # compra
     path("compra/", views.compra_list, name="compra_list"),
     path("compra/registrar/", views.compra_create, name="compra_create"),
+    path("compra/importar/", views.compra_importar, name="compra_importar"),
+    path("compra/exportar/", views.compra_exportar, name="compra_exportar"),
     path("compra/<int:pk>/editar/", views.compra_update, name="compra_update"),
     path("compra/<int:pk>/eliminar/", views.compra_delete, name="compra_delete"),
     path("compra/<int:pk>/anular/", views.compra_anular, name="compra_anular"),
@@ -17,6 +20,7 @@ urlpatterns = [
     path("proveedores/crear/", views.proveedor_create, name="proveedor_create"),
     path("proveedores/<int:pk>/editar/", views.proveedor_update, name="proveedor_update"),
     path("proveedores/<int:pk>/eliminar/", views.proveedor_delete, name="proveedor_delete"),
+    path("proveedores/reporte/", views.reporte_proveedores, name="reporte_proveedores"),
 
     # tipos
     path("tipos/", views.tipo_list, name="tipo_list"),
@@ -30,11 +34,25 @@ urlpatterns = [
     path("venta/<int:pk>/analizar-riesgo/", views.analizar_riesgo_view, name="analizar_riesgo_ia"),
     path("dashboard/resumen-ia/", views.generar_resumen_view, name="generar_resumen_ia"),
     path("asistente/consultar/", views.chat_inventario_view, name="asistente_ia"),
+    path("ia/tarea/<int:pk>/", views.tarea_estado, name="tarea_estado"),
 
     # ventas / deudas / pagos
     path("venta/registrar/", views.venta_create, name="venta_create"),
     path("deudas/", views.deudas_list, name="deudas_list"),
+    path("deudas/exportar/", views.deudas_exportar, name="deudas_exportar"),
+    path("venta/exportar/", views.venta_exportar, name="venta_exportar"),
     path("venta/<int:pk>/", views.venta_detalle, name="venta_detalle"),
     path("venta/<int:venta_id>/pago/", views.pago_create, name="pago_create"),
     path("pago/<int:pk>/eliminar/", views.pago_delete, name="pago_delete"),
+
+    # API JSON de solo lectura (core/api.py)
+    path("api/v1/productos/", api.productos, name="api_productos"),
+    path("api/v1/stock/", api.stock, name="api_stock"),
+    path("api/v1/proveedores/", api.proveedores, name="api_proveedores"),
+    path("api/v1/tipos/", api.tipos, name="api_tipos"),
+
+    # sistema
+    path("sistema/cache/", views.cache_estado, name="cache_estado"),
+    path("sistema/clientes/", views.clientes_estado, name="clientes_estado"),
+    path("sistema/bd/", views.bd_estado, name="bd_estado"),
 ]
@@ -0,0 +1,255 @@
+"""
+Resumen diario de ventas (movimiento.VentaDiaria).
+
+Una fila por (día, producto, proveedor, tipo) con ventas, unidades, ingresos,
+costo y pagos cobrados. core.signals aplica el delta de cada venta o pago con
+un UPDATE con F(), igual que el libro de stock, así que "ventas del mes",
+"en lo que va de año" o una serie para gráficos suman unas pocas filas por día
+en vez de recorrer todas las ventas.
+
+El día es la fecha local (TIME_ZONE) de la venta; los pagos cuentan el día en
+que se cobraron. El costo es Venta.costo_unitario, el del producto al momento
+de la venta: editar o borrar una venta después de un cambio de costo resta lo
+mismo que sumó, y `reconstruir` llega a las mismas filas.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from movimiento.models import Venta, PagoVenta, VentaDiaria
+from producto.models import Producto
+
+CAMPOS = ("ventas", "unidades", "ingresos", "costo", "pagos")
+_DECIMAL = DecimalField(max_digits=18, decimal_places=2)
+_CERO = Decimal("0.00")
+
+
+def _dia(fecha):
+    return timezone.localdate(fecha) if timezone.is_aware(fecha) else fecha.date()
+
+
+def _catalogo(producto_id):
+    return Producto.objects.filter(pk=producto_id).values_list("proveedor_id", "tipo_id", "costo_unitario").first()
+
+
+def aporte_venta(venta):
+    """(clave, deltas) que una venta suma al resumen, o None si no aplica."""
+    datos = _catalogo(venta.producto_id)
+    if datos is None or venta.fecha is None:
+        return None
+    proveedor_id, tipo_id, costo_catalogo = datos
+    costo_unitario = costo_catalogo if venta.costo_unitario is None else venta.costo_unitario
+    cantidad = int(venta.cantidad or 0)
+    clave = (_dia(venta.fecha), venta.producto_id, proveedor_id, tipo_id)
+    return clave, {
+        "ventas": 1,
+        "unidades": cantidad,
+        "ingresos": (venta.precio_unitario or _CERO) * cantidad,
+        "costo": (costo_unitario or _CERO) * cantidad,
+    }
+
+
+def aporte_pago(pago):
+    """(clave, deltas) de un pago: el día del cobro y el producto de la venta."""
+    fila = (
+        Venta.objects.filter(pk=pago.venta_id)
+        .values_list("producto_id", "producto__proveedor_id", "producto__tipo_id")
+        .first()
+    )
+    if fila is None or pago.fecha is None:
+        return None
+    return (_dia(pago.fecha), *fila), {"pagos": pago.monto or _CERO}
+
+
+def negar(aporte):
+    if aporte is None:
+        return None
+    clave, deltas = aporte
+    return clave, {campo: -valor for campo, valor in deltas.items()}
+
+
+def aplicar(*aportes):
+    """
+    Suma los aportes a sus filas (un UPDATE por fila). Crea la fila si es el
+    primer movimiento del día. Los aportes de la misma clave se combinan antes,
+    así editar una venta sin cambiar cantidad, precio ni fecha no escribe nada.
+    """
+    combinados = {}
+    for aporte in aportes:
+        if aporte is None:
+            continue
+        clave, deltas = aporte
+        acumulado = combinados.setdefault(clave, {})
+        for campo, valor in deltas.items():
+            acumulado[campo] = acumulado.get(campo, 0) + valor
+
+    for clave, deltas in combinados.items():
+        deltas = {campo: valor for campo, valor in deltas.items() if valor}
+        if not deltas:
+            continue
+        dia, producto_id, proveedor_id, tipo_id = clave
+        filtro = {"dia": dia, "producto_id": producto_id, "proveedor_id": proveedor_id, "tipo_id": tipo_id}
+        cambios = {campo: F(campo) + valor for campo, valor in deltas.items()}
+        if VentaDiaria.objects.filter(**filtro).update(**cambios):
+            continue
+        try:
+            with transaction.atomic():
+                VentaDiaria.objects.create(**filtro, **deltas)
+        except IntegrityError:
+            # Otro request creó la fila entre el UPDATE y el INSERT.
+            VentaDiaria.objects.filter(**filtro).update(**cambios)
+
+
+def reasignar_producto(producto):
+    """Mueve las filas de un producto a su proveedor/tipo actual (cuando se editan)."""
+    VentaDiaria.objects.filter(producto_id=producto.pk).exclude(
+        proveedor_id=producto.proveedor_id, tipo_id=producto.tipo_id
+    ).update(proveedor_id=producto.proveedor_id, tipo_id=producto.tipo_id)
+
+
+# ---------- Reconstrucción ----------
+
+def _limites(desde, hasta):
+    """Rango [desde, hasta] de días como datetimes locales [inicio, fin)."""
+    rango = {}
+    if desde is not None:
+        rango["fecha__gte"] = timezone.make_aware(datetime.combine(desde, time.min))
+    if hasta is not None:
+        rango["fecha__lt"] = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+    return rango
+
+
+def calcular(desde=None, hasta=None):
+    """Agrega ventas y pagos del rango desde las tablas crudas: {clave: dict(campos)}."""
+    rango = _limites(desde, hasta)
+    filas = {}
+
+    def _fila(clave):
+        if clave not in filas:
+            filas[clave] = {"ventas": 0, "unidades": 0, "ingresos": _CERO, "costo": _CERO, "pagos": _CERO}
+        return filas[clave]
+
+    ventas = (
+        Venta.objects.filter(**rango)
+        .annotate(dia=TruncDate("fecha"))
+        .values("dia", "producto_id", "producto__proveedor_id", "producto__tipo_id")
+        .annotate(
+            n=Count("id"),
+            cant=Sum("cantidad"),
+            total=Sum(F("cantidad") * F("precio_unitario"), output_field=_DECIMAL),
+            costo_total=Sum(
+                F("cantidad") * Coalesce("costo_unitario", "producto__costo_unitario"), output_field=_DECIMAL
+            ),
+        )
+        .order_by()
+    )
+    for r in ventas:
+        fila = _fila((r["dia"], r["producto_id"], r["producto__proveedor_id"], r["producto__tipo_id"]))
+        fila.update(
+            ventas=r["n"],
+            unidades=int(r["cant"] or 0),
+            ingresos=r["total"] or _CERO,
+            costo=r["costo_total"] or _CERO,
+        )
+
+    pagos = (
+        PagoVenta.objects.filter(**rango)
+        .annotate(dia=TruncDate("fecha"))
+        .values("dia", "venta__producto_id", "venta__producto__proveedor_id", "venta__producto__tipo_id")
+        .annotate(total=Sum("monto"))
+        .order_by()
+    )
+    for r in pagos:
+        clave = (r["dia"], r["venta__producto_id"], r["venta__producto__proveedor_id"], r["venta__producto__tipo_id"])
+        _fila(clave)["pagos"] = r["total"] or _CERO
+    return filas
+
+
+def reconstruir(desde=None, hasta=None, batch_size=1000):
+    """Reescribe las filas del rango de días (todas si no se indica). Devuelve cuántas quedaron."""
+    filas = calcular(desde, hasta)
+    existentes = VentaDiaria.objects.all()
+    if desde is not None:
+        existentes = existentes.filter(dia__gte=desde)
+    if hasta is not None:
+        existentes = existentes.filter(dia__lte=hasta)
+    with transaction.atomic():
+        existentes.delete()
+        VentaDiaria.objects.bulk_create(
+            [
+                VentaDiaria(dia=dia, producto_id=pid, proveedor_id=prov, tipo_id=tipo, **campos)
+                for (dia, pid, prov, tipo), campos in filas.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(filas)
+
+
+# ---------- Consultas ----------
+
+def totales(desde, hasta, **filtros):
+    """Sumas del rango de días [desde, hasta]; `filtros` acota por producto_id, proveedor_id, tipo_id."""
+    sumas = VentaDiaria.objects.filter(dia__gte=desde, dia__lte=hasta, **filtros).aggregate(
+        **{campo: Sum(campo) for campo in CAMPOS}
+    )
+    return {
+        campo: (sumas[campo] or 0) if campo in ("ventas", "unidades") else (sumas[campo] or _CERO).quantize(_CERO)
+        for campo in CAMPOS
+    }
+
+
+def mes_a_la_fecha(hoy=None, **filtros):
+    hoy = hoy or timezone.localdate()
+    return totales(hoy.replace(day=1), hoy, **filtros)
+
+
+def comparar_mes_a_la_fecha(hoy=None, **filtros):
+    """Del 1 a hoy contra los mismos días del mes anterior (hasta su último día si es más corto)."""
+    hoy = hoy or timezone.localdate()
+    inicio = hoy.replace(day=1)
+    fin_anterior = inicio - timedelta(days=1)
+    anterior = (fin_anterior.replace(day=1), fin_anterior.replace(day=min(hoy.day, fin_anterior.day)))
+    return comparar(inicio, hoy, anterior=anterior, **filtros)
+
+
+def anio_a_la_fecha(hoy=None, **filtros):
+    hoy = hoy or timezone.localdate()
+    return totales(hoy.replace(month=1, day=1), hoy, **filtros)
+
+
+def _variacion(actual, anterior):
+    if not anterior:
+        return None
+    return round((Decimal(actual) - Decimal(anterior)) / Decimal(anterior) * 100, 1)
+
+
+def comparar(desde, hasta, anterior=None, **filtros):
+    """
+    Totales del período y de otro anterior, con la variación porcentual de cada
+    campo (None si el anterior es cero). `anterior` es (desde, hasta); por
+    defecto, los días inmediatamente previos de igual duración.
+    """
+    if anterior is None:
+        dias = (hasta - desde).days + 1
+        anterior = (desde - timedelta(days=dias), desde - timedelta(days=1))
+    actual = totales(desde, hasta, **filtros)
+    anterior = totales(*anterior, **filtros)
+    return {
+        "actual": actual,
+        "anterior": anterior,
+        "variacion": {campo: _variacion(actual[campo], anterior[campo]) for campo in CAMPOS},
+    }
+
+
+def serie(desde, hasta, **filtros):
+    """Una fila por día con movimiento en el rango, para gráficos de tendencia."""
+    return (
+        VentaDiaria.objects.filter(dia__gte=desde, dia__lte=hasta, **filtros)
+        .values("dia")
+        .annotate(**{campo: Sum(campo) for campo in CAMPOS})
+        .order_by("dia")
+    )
@@ -1,9 +1,14 @@
 from decimal import Decimal
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
-from django.db.models import Sum, F, Q, IntegerField, DecimalField, Value
+from django.db import connections, transaction
+from django.db.models import F, Value
 from django.db.models.functions import Coalesce, NullIf
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 from django.db.models.deletion import ProtectedError
 from django.views.decorators.http import require_POST
@@ -13,82 +18,52 @@ from proveedor.models import Proveedor
 from tipologia.models import TipoJoya
 from producto.models import Producto
 from movimiento.models import Movimiento, Venta, PagoVenta
-from core.services import (
-    obtener_usd_bs_rate, 
-    generar_descripcion_ia, 
-    asistente_inventario_ia,
-    sugerir_precio_ia,
-    analizar_riesgo_cobro_ia,
-    generar_resumen_negocio_ia
-)
+from core.busqueda import buscar_productos, filtrar_por_producto
+from core.cache import estadisticas as cache_estadisticas, sello as sello_cache
+from core.condicional import condicional, versiones_del_request
+from core.dashboard import cargar as cargar_dashboard
+from core.instrumentacion import estadisticas_pool
+from core.paginacion import PaginaKeyset
+from core.stock import StockInsuficiente
+from core.models import TareaIA
+from core.services import obtener_tasa, tasa_vencida, estadisticas_clientes
+from core.tareas import encolar as encolar_tarea
+
+# =========================
+# IA (encolada: la ejecuta `manage.py run_ai_worker`)
+# =========================
 
 @login_required
 @require_POST
 def sugerir_precio_view(request, pk):
     producto = get_object_or_404(Producto, pk=pk)
-    precio = sugerir_precio_ia(producto)
-    if precio:
-        producto.precio_sugerido_ia = precio
-        producto.save()
-        messages.success(request, f"Precio sugerido generado: {precio}")
-    else:
-        messages.error(request, "No se pudo generar la sugerencia de precio.")
-    return redirect("inventario")
+    tarea = encolar_tarea(TareaIA.Tipo.PRECIO, objeto_id=producto.id, usuario=request.user)
+    messages.info(request, "Sugerencia de precio en proceso.")
+    return redirect("tarea_estado", pk=tarea.id)
 
 @login_required
 @require_POST
 def analizar_riesgo_view(request, pk):
     venta = get_object_or_404(Venta, pk=pk)
-    analisis = analizar_riesgo_cobro_ia(venta)
-    venta.analisis_riesgo_ia = analisis
-    venta.save()
-    messages.success(request, "Análisis de riesgo completado.")
-    return redirect("venta_detalle", pk=venta.id)
+    tarea = encolar_tarea(TareaIA.Tipo.RIESGO, objeto_id=venta.id, usuario=request.user)
+    messages.info(request, "Análisis de riesgo en proceso.")
+    return redirect("tarea_estado", pk=tarea.id)
 
 @login_required
 @require_POST
 def generar_resumen_view(request):
-    try:
-        stats = obtener_estadisticas_inventario()
-        ventas_mes = Venta.objects.filter(fecha__month=Decimal("3")).aggregate(s=Sum(F("cantidad") * F("precio_unitario")))["s"] or Decimal("0.00")
-        
-        pagos_map = {
-            r["venta_id"]: Decimal(str(r["pagado"] or "0.00"))
-            for r in (
-                PagoVenta.objects
-                .values("venta_id")
-                .annotate(pagado=Coalesce(Sum("monto"), Decimal("0.00")))
-            )
-        }
-        total_deudas = Decimal("0.00")
-        for v in Venta.objects.filter(a_plazos=True):
-            t = v.precio_unitario * v.cantidad
-            p = pagos_map.get(v.id, Decimal("0.00"))
-            d = t - p
-            if d > 0:
-                total_deudas += d
-
-        datos = {
-            "valor_inventario": stats["valor_stock_usd"],
-            "total_deudas": total_deudas,
-            "ventas_mes": ventas_mes
-        }
-        resumen = generar_resumen_negocio_ia(datos)
-        return render(request, "core/dashboard.html", {"resumen_negocio": resumen})
-    except Exception as e:
-        messages.error(request, f"Error al generar resumen: {e}")
-        return redirect("dashboard")
+    tarea = encolar_tarea(TareaIA.Tipo.RESUMEN, usuario=request.user)
+    return redirect("tarea_estado", pk=tarea.id)
 
 @login_required
 @require_POST
 def chat_inventario_view(request):
     prompt = request.POST.get("prompt", "")
-    try:
-        respuesta = asistente_inventario_ia(prompt)
-        return render(request, "core/dashboard.html", {"respuesta_asistente": respuesta})
-    except Exception as e:
-        messages.error(request, f"Error del asistente: {e}")
+    if not prompt.strip():
+        messages.error(request, "Escribe una consulta para el asistente.")
         return redirect("dashboard")
+    tarea = encolar_tarea(TareaIA.Tipo.ASISTENTE, prompt=prompt, usuario=request.user)
+    return redirect("tarea_estado", pk=tarea.id)
 
 @login_required
 @require_POST
@@ -97,14 +72,29 @@ def generar_descripcion_view(request, pk):
     if producto.descripcion_ia:
         messages.info(request, "El producto ya tiene una descripción generada.")
         return redirect("inventario")
-    try:
-        descripcion = generar_descripcion_ia(producto)
-        producto.descripcion_ia = descripcion
-        producto.save()
-        messages.success(request, "Descripción generada con IA.")
-    except Exception as e:
-        messages.error(request, f"Error al generar descripción: {e}")
-    return redirect("inventario")
+    tarea = encolar_tarea(TareaIA.Tipo.DESCRIPCION, objeto_id=producto.id, usuario=request.user)
+    messages.info(request, "Descripción con IA en proceso.")
+    return redirect("tarea_estado", pk=tarea.id)
+
+@login_required
+def tarea_estado(request, pk):
+    """Estado de una tarea de IA. HTML que se recarga solo, o JSON con ?formato=json."""
+    tarea = get_object_or_404(TareaIA, pk=pk)
+    if request.GET.get("formato") == "json":
+        return JsonResponse({
+            "id": tarea.id,
+            "tipo": tarea.tipo,
+            "estado": tarea.estado,
+            "terminada": tarea.terminada,
+            "resultado": tarea.resultado,
+            "error": tarea.error,
+        })
+    volver_url = reverse("dashboard")
+    if tarea.tipo in (TareaIA.Tipo.DESCRIPCION, TareaIA.Tipo.PRECIO):
+        volver_url = reverse("inventario")
+    elif tarea.tipo == TareaIA.Tipo.RIESGO and tarea.objeto_id:
+        volver_url = reverse("venta_detalle", args=[tarea.objeto_id])
+    return render(request, "core/tarea_estado.html", {"tarea": tarea, "volver_url": volver_url})
 
 from .forms import (
     ProveedorForm,
@@ -112,235 +102,157 @@ from .forms import (
     ProductoForm,
     CompraUnificadaForm,
     CompraEditForm,
+    ImportarComprasForm,
     VentaForm,
     PagoVentaForm,
+    RangoFechasForm,
 )
+from core.importacion import importar_compras, ErrorImportacion
+from core.exportacion import respuesta_csv, filas_inventario, filas_compras, filas_ventas
+from core import reportes
 
 
 # =========================
 # Dashboard / Inventario
 # =========================
 
-from django.db.models import Count
-
-from decimal import Decimal
-from core.services import obtener_usd_bs_rate  # asegúrate que existe
-
-@login_required
-def dashboard(request):
-    # ---------- Tasa USD -> Bs ----------
-    try:
-        tasa = obtener_usd_bs_rate()  # Decimal
-        if tasa is None:
-            tasa = Decimal("0.00")
-        tasa = Decimal(str(tasa))
-    except Exception:
-        tasa = Decimal("0.00")
-
-    # ---------- Productos recientes / conteos ----------
-    try:
-        productos = Producto.objects.select_related("proveedor").all().order_by("nombre")[:15]
-    except Exception:
-        productos = []
+def _texto_monto(usd, bs):
+    if usd is None:
+        return "No disponible"
+    return f"${usd} USD / Bs {'no disponible' if bs is None else bs}"
 
-    try:
-        total_productos = Producto.objects.count()
-    except Exception:
-        total_productos = 0
 
-    try:
-        total_proveedores = Proveedor.objects.count()
-    except Exception:
-        total_proveedores = 0
+def _tasa_vencida_ahora(request):
+    # La tasa se vence sin que nadie escriba; obtener_tasa además pide el refresco.
+    return tasa_vencida(obtener_tasa())
 
-    # ---------- Mapas: compras (IN, no anuladas) y ventas por producto ----------
-    try:
-        compras_map = {
-            r["producto_id"]: int(r["total_in"] or 0)
-            for r in (
-                Movimiento.objects
-                .filter(tipo="IN", anulada=False)   # tus campos existen :contentReference[oaicite:5]{index=5}
-                .values("producto_id")
-                .annotate(total_in=Coalesce(Sum("cantidad"), 0))
-            )
-        }
-    except Exception:
-        compras_map = {}
 
-    try:
-        ventas_map = {
-            r["producto_id"]: int(r["total_out"] or 0)
-            for r in (
-                Venta.objects
-                .values("producto_id")
-                .annotate(total_out=Coalesce(Sum("cantidad"), 0))
-            )
-        }
-    except Exception:
-        ventas_map = {}
+@login_required
+@condicional("catalogo", "compras", "ventas", "tasa", extra=_tasa_vencida_ahora)
+async def dashboard(request):
+    # Los componentes (conteos, montos, productos, tasa) se cargan en paralelo
+    # con timeout por componente (core.dashboard). Lo que falla o no llega a
+    # tiempo queda en None y se muestra "no disponible", nunca como 0.
+    datos = await cargar_dashboard()
 
-    # ---------- Dinero en stock (USD) = stock_qty * costo_unitario ----------
-    dinero_stock_usd = Decimal("0.00")
-    try:
-        for p in Producto.objects.only("id", "costo_unitario"):
-            total_in = compras_map.get(p.id, 0)
-            total_out = ventas_map.get(p.id, 0)
-            stock_qty = total_in - total_out
-            if stock_qty < 0:
-                stock_qty = 0
-
-            costo = Decimal(str(p.costo_unitario or 0))
-            dinero_stock_usd += (costo * Decimal(stock_qty))
-    except Exception:
-        dinero_stock_usd = Decimal("0.00")
+    tasa_registro = datos["tasa"]
+    tasa = tasa_registro.tasa if tasa_registro is not None else None
 
-    # ---------- Dinero vendido (USD) = sum(venta.cantidad * venta.precio_unitario) ----------
-    dinero_vendido_usd = Decimal("0.00")
-    try:
-        dinero_vendido_usd = Decimal("0.00")
-        # Evitamos ExpressionWrapper para que sea 100% compatible con SQLite/Postgres sin líos.
-        for v in Venta.objects.only("cantidad", "precio_unitario"):
-            dinero_vendido_usd += (Decimal(str(v.precio_unitario or 0)) * Decimal(int(v.cantidad or 0)))
-    except Exception:
-        dinero_vendido_usd = Decimal("0.00")
+    q = Decimal("0.01")
+    context = {
+        "productos": datos["productos"],
+        "total_productos": datos["total_productos"],
+        "total_proveedores": datos["total_proveedores"],
+        "no_disponibles": datos["no_disponibles"],
+        "tasa_usd_bs": tasa,
+        "tasa_fecha": tasa_registro.created_at if tasa_registro else None,
+        "tasa_vencida": tasa_vencida(tasa_registro),
+    }
 
-    # ---------- Dinero deuda (USD) = sum(venta.total - pagos) SOLO a_plazos=True ----------
-    dinero_deuda_usd = Decimal("0.00")
-    try:
-        # pagos por venta en un solo query
-        pagos_map = {
-            r["venta_id"]: Decimal(str(r["pagado"] or "0.00"))
-            for r in (
-                PagoVenta.objects
-                .values("venta_id")
-                .annotate(pagado=Coalesce(Sum("monto"), Decimal("0.00")))
-            )
-        }
+    # ---------- Montos en USD y su conversión a Bs ----------
+    for nombre in ("dinero_stock", "dinero_vendido", "dinero_deuda"):
+        usd = datos[f"{nombre}_usd"]
+        if usd is not None:
+            usd = usd.quantize(q)
+        bs = (usd * tasa).quantize(q) if usd is not None and tasa is not None else None
+        context[f"{nombre}_usd"] = usd
+        context[f"{nombre}_bs"] = bs
+        # COMPATIBILIDAD con plantillas que usan dinero_stock, dinero_vendido, dinero_deuda
+        context[nombre] = _texto_monto(usd, bs)
 
-        for v in Venta.objects.filter(a_plazos=True).only("id", "cantidad", "precio_unitario"):
-            total = Decimal(str(v.precio_unitario or 0)) * Decimal(int(v.cantidad or 0))
-            pagado = pagos_map.get(v.id, Decimal("0.00"))
-            deuda = total - pagado
-            if deuda > 0:
-                dinero_deuda_usd += deuda
-    except Exception:
-        dinero_deuda_usd = Decimal("0.00")
+    # render es síncrono (la plantilla lee request.user de la sesión)
+    return await sync_to_async(render)(request, "core/dashboard.html", context)
 
-    # ---------- Conversiones a Bs ----------
-    dinero_stock_bs = (dinero_stock_usd * tasa)
-    dinero_vendido_bs = (dinero_vendido_usd * tasa)
-    dinero_deuda_bs = (dinero_deuda_usd * tasa)
+INVENTARIO_POR_PAGINA = 50
 
-    # redondeo bonito
-    q = Decimal("0.01")
-    dinero_stock_usd = dinero_stock_usd.quantize(q)
-    dinero_vendido_usd = dinero_vendido_usd.quantize(q)
-    dinero_deuda_usd = dinero_deuda_usd.quantize(q)
 
-    dinero_stock_bs = dinero_stock_bs.quantize(q)
-    dinero_vendido_bs = dinero_vendido_bs.quantize(q)
-    dinero_deuda_bs = dinero_deuda_bs.quantize(q)
+def _fragmentos(request, *espacios):
+    """
+    Contexto para los {% cache %} de las tablas: el sello cambia con cualquier
+    escritura en esos espacios, así el fragmento viejo deja de leerse. Las filas
+    solo se consultan (la página es perezosa) si el fragmento no está en caché.
+    El sello sale de las mismas versiones que el ETag (core.condicional).
+    """
+    sello = sello_cache(*espacios, instantanea=versiones_del_request(request, *espacios))
+    return {"sello": sello, "fragmentos_timeout": settings.FRAGMENTOS_TIMEOUT}
 
-    context = {
-        "productos": productos,
-        "total_productos": total_productos,
-        "total_proveedores": total_proveedores,
-
-        # NUEVO (USD + Bs)
-        "dinero_stock_usd": dinero_stock_usd,
-        "dinero_stock_bs": dinero_stock_bs,
-        "dinero_vendido_usd": dinero_vendido_usd,
-        "dinero_vendido_bs": dinero_vendido_bs,
-        "dinero_deuda_usd": dinero_deuda_usd,
-        "dinero_deuda_bs": dinero_deuda_bs,
-        "tasa_usd_bs": tasa,
 
-        # COMPATIBILIDAD con tu dashboard.html actual (usa dinero_stock, dinero_vendido, dinero_deuda) :contentReference[oaicite:6]{index=6}
-        "dinero_stock": f"${dinero_stock_usd} USD / Bs {dinero_stock_bs}",
-        "dinero_vendido": f"${dinero_vendido_usd} USD / Bs {dinero_vendido_bs}",
-        "dinero_deuda": f"${dinero_deuda_usd} USD / Bs {dinero_deuda_bs}",
-    }
+def _tasa_o_none():
+    try:
+        tasa = obtener_tasa()
+    except Exception:
+        return None
+    return tasa.tasa if tasa is not None else None
 
-    return render(request, "core/dashboard.html", context)
 
-@login_required
-def inventario(request):
-    q = (request.GET.get("q") or "").strip()
-    proveedor_id = (request.GET.get("proveedor") or "").strip()
-    tipo_id = (request.GET.get("tipo") or "").strip()
-    solo_stock = request.GET.get("solo_stock") == "on"
+def _inventario_filtrado(params):
+    """Productos con los filtros de inventario (los usa también la exportación)."""
+    q = (params.get("q") or "").strip()
+    proveedor_id = (params.get("proveedor") or "").strip()
+    tipo_id = (params.get("tipo") or "").strip()
+    solo_stock = params.get("solo_stock") == "on"
 
     productos = (
         Producto.objects
         .select_related("proveedor", "tipo")
         .all()
-        .order_by("nombre")
     )
 
     if q:
-        productos = productos.filter(nombre__icontains=q)
+        # búsqueda indexada y sin acentos (core.busqueda); el orden lo da la paginación
+        productos = buscar_productos(q, queryset=productos, ordenar=False)
     if proveedor_id:
         productos = productos.filter(proveedor_id=proveedor_id)
     if tipo_id:
         productos = productos.filter(tipo_id=tipo_id)
 
     # ----------------------------
-    # STOCK = SUM(compras IN no anuladas) - SUM(ventas)
-    # (OJO: related_name en models.py es movimientos / ventas)
+    # STOCK y COSTO PROM salen del libro de stock (producto.ProductoStock)
+    # costo_prom = SUM(IN cantidad * precio_unitario) / SUM(IN cantidad)
     # ----------------------------
-    total_in = Coalesce(
-        Sum(
-            "movimientos__cantidad",
-            filter=Q(movimientos__tipo="IN", movimientos__anulada=False),
-        ),
-        Value(0),
-        output_field=IntegerField(),
-    )
-
-    total_out = Coalesce(
-        Sum("ventas__cantidad"),
-        Value(0),
-        output_field=IntegerField(),
-    )
-
-    # ----------------------------
-    # COSTO PROM = SUM(IN cantidad * precio_unitario) / SUM(IN cantidad)
-    # ----------------------------
-    total_cost_in = Coalesce(
-        Sum(
-            F("movimientos__cantidad") * F("movimientos__precio_unitario"),
-            filter=Q(movimientos__tipo="IN", movimientos__anulada=False),
-            output_field=DecimalField(max_digits=18, decimal_places=2),
-        ),
-        Value(0),
-        output_field=DecimalField(max_digits=18, decimal_places=2),
-    )
-
     productos = productos.annotate(
-        _total_in=total_in,
-        _total_out=total_out,
-    ).annotate(
-        stock=F("_total_in") - F("_total_out"),
-        costo_prom=total_cost_in / NullIf(F("_total_in"), 0),
+        stock=Coalesce(F("existencia__stock"), Value(0)),
+        costo_prom=F("existencia__costo_entrada") / NullIf(F("existencia__cantidad_entrada"), 0),
     )
 
     if solo_stock:
         productos = productos.filter(stock__gt=0)
 
+    filtros = {"q": q, "proveedor": proveedor_id, "tipo": tipo_id, "solo_stock": solo_stock}
+    return productos, filtros
+
+
+@login_required
+@condicional("catalogo", "compras", "ventas")
+def inventario(request):
+    productos, filtros = _inventario_filtrado(request.GET)
+
+    # Paginación por cursor sobre (nombre, id): cada página cuesta lo mismo
+    # sin importar cuántos productos haya antes (índice producto_nombre_id_idx).
+    pagina = PaginaKeyset(
+        productos,
+        orden=("nombre", "id"),
+        cursor=request.GET.get("cursor"),
+        por_pagina=INVENTARIO_POR_PAGINA,
+    )
+
     context = {
-        "productos": productos,
+        "productos": pagina,
+        "pagina": pagina,
         "proveedores": Proveedor.objects.all().order_by("nombre"),
         "tipos": TipoJoya.objects.all().order_by("nombre"),
-        "filters": {
-            "q": q,
-            "proveedor": proveedor_id,
-            "tipo": tipo_id,
-            "solo_stock": solo_stock
-        },
+        "filters": filtros,
+        **_fragmentos(request, "catalogo", "compras", "ventas"),
     }
     return render(request, "core/inventario.html", context)
 
 
+@login_required
+def inventario_exportar(request):
+    productos, _ = _inventario_filtrado(request.GET)
+    return respuesta_csv(request, "inventario", filas_inventario(productos, _tasa_o_none()))
+
+
 
 # =========================
 # Proveedores CRUD
@@ -398,6 +310,24 @@ def proveedor_delete(request, pk):
 
     return render(request, "core/confirm_delete.html", {"obj": proveedor, "title": "Eliminar proveedor"})
 
+@login_required
+@condicional("catalogo", "compras", "ventas")
+def reporte_proveedores(request):
+    # Agregados cacheados (core.reportes); se invalidan con cada compra o venta.
+    form = RangoFechasForm(request.GET or None)
+    desde = hasta = None
+    if form.is_bound and form.is_valid():
+        desde, hasta = form.cleaned_data["desde"], form.cleaned_data["hasta"]
+    espacios = ("catalogo", "compras", "ventas")
+    reporte = reportes.reporte_proveedores(desde, hasta, instantanea=versiones_del_request(request, *espacios))
+    return render(request, "core/reporte_proveedores.html", {
+        "form": form,
+        "rows": reporte["filas"],
+        "totales": reporte["totales"],
+        "desde": desde,
+        "hasta": hasta,
+    })
+
 
 
 # =========================
@@ -513,7 +443,8 @@ def compra_create(request):
     if request.method == "POST":
         form = CompraUnificadaForm(request.POST)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
             messages.success(request, "Compra registrada.")
             return redirect("inventario")
     else:
@@ -522,21 +453,67 @@ def compra_create(request):
     return render(request, "core/compra_unificada.html", {"form": form})
 
 @login_required
-def compra_list(request):
-    q = (request.GET.get("q") or "").strip()
+def compra_importar(request):
+    resultado = None
+    if request.method == "POST":
+        form = ImportarComprasForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data["archivo"]
+            try:
+                resultado = importar_compras(
+                    archivo.file, archivo.name, crear_catalogo=form.cleaned_data["crear_catalogo"]
+                )
+            except ErrorImportacion as e:
+                form.add_error("archivo", str(e))
+            else:
+                if resultado.compras:
+                    messages.success(request, f"{resultado.compras} compras importadas.")
+                if resultado.errores:
+                    messages.warning(request, f"{len(resultado.errores)} filas no se importaron.")
+    else:
+        form = ImportarComprasForm()
 
-    compras = (
-    Movimiento.objects
-    .filter(tipo="IN", anulada=False)  
-    .select_related("producto", "producto__proveedor", "producto__tipo")
-    .order_by("-fecha")
-)
+    return render(request, "core/compra_importar.html", {"form": form, "resultado": resultado})
 
+COMPRAS_POR_PAGINA = 50
+
+
+def _compras_filtradas(params):
+    q = (params.get("q") or "").strip()
+
+    compras = (
+        Movimiento.objects
+        .filter(tipo="IN", anulada=False)
+        .select_related("producto", "producto__proveedor", "producto__tipo")
+        .order_by("-fecha", "-id")
+    )
 
     if q:
-        compras = compras.filter(producto__nombre__icontains=q)
+        compras = filtrar_por_producto(compras, q)
+    return compras, q
+
+
+@login_required
+@condicional("catalogo", "compras")
+def compra_list(request):
+    compras, q = _compras_filtradas(request.GET)
+    pagina = PaginaKeyset(
+        compras,
+        orden=("-fecha", "-id"),
+        cursor=request.GET.get("cursor"),
+        por_pagina=COMPRAS_POR_PAGINA,
+    )
+    return render(request, "core/compra_list.html", {
+        "compras": pagina,
+        "pagina": pagina,
+        "q": q,
+        **_fragmentos(request, "catalogo", "compras"),
+    })
 
-    return render(request, "core/compra_list.html", {"compras": compras, "q": q})
+@login_required
+def compra_exportar(request):
+    compras, _ = _compras_filtradas(request.GET)
+    return respuesta_csv(request, "compras", filas_compras(compras, _tasa_o_none()))
 
 @login_required
 def compra_update(request, pk):
@@ -545,9 +522,14 @@ def compra_update(request, pk):
     if request.method == "POST":
         form = CompraEditForm(request.POST, instance=compra)
         if form.is_valid():
-            form.save()
-            messages.success(request, "Compra actualizada.")
-            return redirect("compra_list")
+            try:
+                with transaction.atomic():
+                    form.save()
+            except StockInsuficiente as e:
+                form.add_error("cantidad", f"Ya se vendieron esas unidades. {e}")
+            else:
+                messages.success(request, "Compra actualizada.")
+                return redirect("compra_list")
     else:
         form = CompraEditForm(instance=compra)
 
@@ -558,8 +540,13 @@ def compra_delete(request, pk):
     compra = get_object_or_404(Movimiento, pk=pk, tipo="IN")
 
     if request.method == "POST":
-        compra.delete()
-        messages.success(request, "Compra eliminada.")
+        try:
+            with transaction.atomic():
+                compra.delete()
+        except StockInsuficiente as e:
+            messages.error(request, f"No se puede eliminar: ya se vendieron esas unidades. {e}")
+        else:
+            messages.success(request, "Compra eliminada.")
         return redirect("compra_list")
 
     return render(request, "core/confirm_delete.html", {"obj": compra, "title": "Eliminar compra"})
@@ -569,8 +556,13 @@ def compra_delete(request, pk):
 def compra_anular(request, pk):
     compra = get_object_or_404(Movimiento, pk=pk, tipo="IN")
     compra.anulada = True
-    compra.save(update_fields=["anulada"])
-    messages.success(request, "Compra anulada (no se eliminó).")
+    try:
+        with transaction.atomic():
+            compra.save(update_fields=["anulada"])
+    except StockInsuficiente as e:
+        messages.error(request, f"No se puede anular: ya se vendieron esas unidades. {e}")
+    else:
+        messages.success(request, "Compra anulada (no se eliminó).")
     return redirect("compra_list")
 
 
@@ -583,45 +575,71 @@ def venta_create(request):
     if request.method == "POST":
         form = VentaForm(request.POST)
         if form.is_valid():
-            venta = form.save(commit=False)
-            venta.save()
-
-            pago_inicial = form.cleaned_data.get("pago_inicial") or Decimal("0.00")
-            if pago_inicial > 0:
-                PagoVenta.objects.create(venta=venta, monto=pago_inicial, nota="Pago inicial")
-
-            messages.success(request, "Venta registrada.")
-            return redirect("dashboard")
+            # El form ya avisó si no hay stock, pero quien decide es el UPDATE
+            # condicional de core.stock al guardar: si otra venta se llevó las
+            # piezas entre medio, se deshace todo y se muestra el error.
+            try:
+                with transaction.atomic():
+                    venta = form.save(commit=False)
+                    venta.save()
+
+                    pago_inicial = form.cleaned_data.get("pago_inicial") or Decimal("0.00")
+                    if pago_inicial > 0:
+                        PagoVenta.objects.create(venta=venta, monto=pago_inicial, nota="Pago inicial")
+            except StockInsuficiente as e:
+                form.add_error("cantidad", str(e))
+            else:
+                messages.success(request, "Venta registrada.")
+                return redirect("dashboard")
     else:
         form = VentaForm()
 
     return render(request, "core/venta_form.html", {"form": form})
 
+DEUDAS_POR_PAGINA = 50
+
+
+def _deudas():
+    # Ventas con saldo abierto (índice parcial venta_saldo_abierto_idx)
+    return (
+        Venta.objects
+        .filter(saldo__gt=0)
+        .select_related("producto", "producto__proveedor")
+    )
+
+
 @login_required
+@condicional("catalogo", "ventas")
 def deudas_list(request):
-    # Ventas con deuda > 0 (calculado)
-    ventas = Venta.objects.select_related("producto", "producto__proveedor").all().order_by("-fecha")
-    con_deuda = []
-    for v in ventas:
-        total = (v.precio_unitario or Decimal("0.00")) * v.cantidad
-        pagado = PagoVenta.objects.filter(venta=v).aggregate(s=Sum("monto"))["s"] or Decimal("0.00")
-        deuda = total - pagado
-        if deuda > 0:
-            v._total = total
-            v._pagado = pagado
-            v._deuda = deuda
-            con_deuda.append(v)
-
-    return render(request, "core/deudas_list.html", {"ventas": con_deuda})
+    ventas = _deudas()
+    pagina = PaginaKeyset(
+        ventas,
+        orden=("-fecha", "-id"),
+        cursor=request.GET.get("cursor"),
+        por_pagina=DEUDAS_POR_PAGINA,
+    )
+    return render(request, "core/deudas_list.html", {
+        "ventas": pagina,
+        "pagina": pagina,
+        **_fragmentos(request, "catalogo", "ventas"),
+    })
+
+@login_required
+def deudas_exportar(request):
+    return respuesta_csv(request, "deudas", filas_ventas(_deudas(), _tasa_o_none()))
+
+@login_required
+def venta_exportar(request):
+    return respuesta_csv(request, "ventas", filas_ventas(Venta.objects.all(), _tasa_o_none()))
 
 @login_required
 def venta_detalle(request, pk):
-    venta = get_object_or_404(Venta, pk=pk)
+    venta = get_object_or_404(Venta.objects.select_related("producto"), pk=pk)
     pagos = PagoVenta.objects.filter(venta=venta).order_by("-fecha")
 
-    total = (venta.precio_unitario or Decimal("0.00")) * venta.cantidad
-    pagado = pagos.aggregate(s=Sum("monto"))["s"] or Decimal("0.00")
-    deuda = total - pagado
+    total = venta.total
+    pagado = venta.monto_pagado
+    deuda = venta.saldo
 
     return render(request, "core/venta_detalle.html", {
         "venta": venta,
@@ -640,7 +658,8 @@ def pago_create(request, venta_id):
         if form.is_valid():
             pago = form.save(commit=False)
             pago.venta = venta
-            pago.save()
+            with transaction.atomic():
+                pago.save()
             messages.success(request, "Pago registrado.")
             return redirect("venta_detalle", pk=venta.id)
     else:
@@ -654,8 +673,36 @@ def pago_delete(request, pk):
     venta_id = pago.venta_id
 
     if request.method == "POST":
-        pago.delete()
+        with transaction.atomic():
+            pago.delete()
         messages.success(request, "Pago eliminado.")
         return redirect("venta_detalle", pk=venta_id)
 
     return render(request, "core/confirm_delete.html", {"obj": pago, "title": "Eliminar pago"})
+
+
+# =========================
+# Sistema
+# =========================
+
+@login_required
+def cache_estado(request):
+    """Contadores de la caché de este worker (L1/L2/miss)."""
+    return JsonResponse(cache_estadisticas())
+
+@login_required
+def clientes_estado(request):
+    """Latencia y reuso de conexiones de los clientes HTTP de este worker."""
+    return JsonResponse(estadisticas_clientes())
+
+@login_required
+def bd_estado(request):
+    """Pool de conexiones a la BD de este worker (vacío sin PostgreSQL/DB_POOL)."""
+    return JsonResponse({
+        alias: {
+            "conn_max_age": connections[alias].settings_dict["CONN_MAX_AGE"],
+            "conn_health_checks": connections[alias].settings_dict["CONN_HEALTH_CHECKS"],
+            "pool": estadisticas_pool().get(alias),
+        }
+        for alias in connections
+    })
@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+Es la que sirve el Procfile (gunicorn con workers de uvicorn): las vistas
+async (el dashboard, ver core.dashboard) corren en el event loop del worker
+sin un loop por request. wsgi.py queda para `runserver` y servidores WSGI.
 """
 
 import os
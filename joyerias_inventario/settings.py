@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.middleware.InstrumentacionMiddleware",  # solo si INSTRUMENTACION=1
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,9 +75,50 @@ DATABASES = {
     "default": dj_database_url.config(
         default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
         conn_max_age=600,
+        # una conexión que murió (reinicio de la BD) se descarta antes de
+        # usarla en vez de terminar en un 500; con pool, se verifica al prestarla
+        conn_health_checks=True,
     )
 }
 
+# PostgreSQL: pool de psycopg por proceso (DB_POOL=0 vuelve a las conexiones
+# persistentes). Cada worker de gunicorn tiene su pool, así que la BD ve hasta
+# workers * DB_POOL_MAX conexiones; el dashboard usa varias a la vez por request.
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql" and os.environ.get("DB_POOL", "1") == "1":
+    DATABASES["default"]["CONN_MAX_AGE"] = 0  # el pool reemplaza a las persistentes
+    DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+        "min_size": int(os.environ.get("DB_POOL_MIN", "2")),
+        "max_size": int(os.environ.get("DB_POOL_MAX", "10")),
+        # segundos esperando una conexión libre antes de fallar
+        "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+        # se cierran las ociosas que sobran de min_size y se renuevan las viejas
+        "max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", "300")),
+        "max_lifetime": float(os.environ.get("DB_POOL_MAX_LIFETIME", "1800")),
+    }
+
+# SQLite para una sola tienda (SQLITE_PRODUCCION=1). WAL deja leer mientras
+# otro escribe; BEGIN IMMEDIATE toma el lock de escritura al empezar la
+# transacción, así que una escritura espera su turno (busy_timeout) en vez de
+# fallar con "database is locked" al pasar de leer a escribir.
+# `manage.py benchmark_sqlite` compara este perfil con el de por defecto.
+SQLITE_PRODUCCION_OPCIONES = {
+    "transaction_mode": "IMMEDIATE",
+    "init_command": ";".join([
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA busy_timeout={int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))}",
+        "PRAGMA synchronous=NORMAL",  # en WAL no pierde integridad, solo quizás el último commit ante un corte de luz
+        f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_MB', '128')) * 1024 * 1024}",
+        f"PRAGMA cache_size=-{int(os.environ.get('SQLITE_CACHE_MB', '32')) * 1024}",  # negativo = KiB
+        "PRAGMA temp_store=MEMORY",
+    ]),
+}
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3" and os.environ.get("SQLITE_PRODUCCION", "0") == "1":
+    DATABASES["default"].setdefault("OPTIONS", {}).update(SQLITE_PRODUCCION_OPCIONES)
+
+# Los índices con `include` (cubrientes en PostgreSQL) se crean sin esas columnas
+# en SQLite; el aviso no aporta nada en desarrollo.
+SILENCED_SYSTEM_CHECKS = ["models.W040"]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -100,12 +142,90 @@ USE_TZ = True
 STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# En producción, WhiteNoise sirve los estáticos de collectstatic con nombre
+# con hash (caché de un año), ya comprimidos en gzip y brotli. En desarrollo
+# se sirven tal cual, sin necesitar collectstatic.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+        if DEBUG
+        else "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
+# L1 en memoria de cada worker + L2 compartido (tabla core_cache en la BD, o
+# archivos en disco con CACHE_L2=file). Ver core/cache.py.
+#
+# Los fragmentos {% cache %} de las tablas (uno por querystring y página) van
+# en su propio nivel, "fragmentos", con otra tabla. Al pasar MAX_ENTRIES,
+# Django borra 1/CULL_FREQUENCY de las claves por orden de clave, no por
+# antigüedad: separados, ese borrado no se lleva sesiones, usuarios ni las
+# versiones de core.cache. DatabaseCache además cuenta las filas (COUNT(*))
+# en cada set, así que la tabla no debería crecer sin límite.
+def _cache_l2(tabla, max_entradas):
+    opciones = {
+        "MAX_ENTRIES": max_entradas,
+        "CULL_FREQUENCY": int(os.environ.get("CACHE_CULL_FREQUENCY", "3")),
+    }
+    if os.environ.get("CACHE_L2", "db") == "file":
+        directorio = os.environ.get("CACHE_FILE_DIR", str(BASE_DIR / ".cache"))
+        if tabla != "core_cache":
+            directorio = os.path.join(directorio, tabla)
+        return {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": directorio,
+            "OPTIONS": opciones,
+        }
+    return {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": tabla,
+        "OPTIONS": opciones,
+    }
+
+
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-    }
+        "BACKEND": "core.cache.CacheEscalonada",
+        "OPTIONS": {
+            "L2": "compartida",
+            "L1_TIMEOUT": int(os.environ.get("CACHE_L1_TIMEOUT", "5")),
+        },
+    },
+    # sesiones, usuarios, versiones, tokens de la API, reportes
+    "compartida": _cache_l2("core_cache", int(os.environ.get("CACHE_MAX_ENTRIES", "20000"))),
+    "fragmentos": {
+        "BACKEND": "core.cache.CacheEscalonada",
+        # LOCATION distinto: un L1 propio, no el de "default"
+        "LOCATION": "fragmentos",
+        "OPTIONS": {
+            "L2": "fragmentos_l2",
+            "L1_TIMEOUT": int(os.environ.get("CACHE_L1_TIMEOUT", "5")),
+        },
+    },
+    "fragmentos_l2": _cache_l2(
+        "core_cache_fragmentos", int(os.environ.get("CACHE_FRAGMENTOS_MAX_ENTRIES", "5000"))
+    ),
 }
 
+# Sesiones: "cached_db" (caché compartida con respaldo en la BD, por defecto),
+# "cookie" (firmadas en la propia cookie, sin almacenamiento) o "db".
+SESIONES = os.environ.get("SESIONES", "cached_db")
+SESSION_ENGINE = {
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cookie": "django.contrib.sessions.backends.signed_cookies",
+    "db": "django.contrib.sessions.backends.db",
+}[SESIONES]
+# El nivel compartido, sin el L1 de "default": un logout en un worker borraría
+# la sesión de su L1 y del L2, pero los demás la seguirían leyendo de su L1
+# hasta L1_TIMEOUT.
+SESSION_CACHE_ALIAS = "compartida"
+
+# El usuario de cada request sale de la caché compartida (core.autenticacion);
+# se borra al cambiar su contraseña, is_active, grupos o permisos.
+AUTHENTICATION_BACKENDS = ["core.autenticacion.BackendConCache"]
+USUARIO_CACHE_TIMEOUT = int(os.environ.get("USUARIO_CACHE_TIMEOUT", str(60 * 15)))
+
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
@@ -122,3 +242,44 @@ if not DEBUG:
     SECURE_REFERRER_POLICY = "same-origin"
 
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
+GROQ_TIMEOUT = float(os.environ.get("GROQ_TIMEOUT", "60"))
+GROQ_REINTENTOS = int(os.environ.get("GROQ_REINTENTOS", "2"))
+
+# Tasa USD -> Bs: fuente (se puede apuntar a `manage.py simular_dolarapi`) y vigencia
+DOLAR_API_URL = os.environ.get("DOLAR_API_URL", "https://ve.dolarapi.com/v1/dolares")
+TASA_VIGENCIA_SEGUNDOS = int(os.environ.get("TASA_VIGENCIA_SEGUNDOS", str(60 * 30)))
+# Si la fuente falla, espera antes del próximo refresco automático (se duplica
+# con cada fallo seguido, hasta el máximo)
+TASA_REINTENTO_SEGUNDOS = int(os.environ.get("TASA_REINTENTO_SEGUNDOS", "60"))
+TASA_REINTENTO_MAX_SEGUNDOS = int(os.environ.get("TASA_REINTENTO_MAX_SEGUNDOS", str(60 * 15)))
+
+# Clientes HTTP compartidos por proceso (core.services.clientes)
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "10"))
+HTTP_TIMEOUT_CONEXION = float(os.environ.get("HTTP_TIMEOUT_CONEXION", "3.05"))
+HTTP_TIMEOUT_LECTURA = float(os.environ.get("HTTP_TIMEOUT_LECTURA", "15"))
+HTTP_REINTENTOS = int(os.environ.get("HTTP_REINTENTOS", "2"))
+
+# Medición por request (core.middleware.InstrumentacionMiddleware): cabecera
+# Server-Timing y log JSON de requests lentos o con consultas repetidas.
+INSTRUMENTACION = os.environ.get("INSTRUMENTACION", "0") == "1"
+INSTRUMENTACION_LENTA_MS = int(os.environ.get("INSTRUMENTACION_LENTA_MS", "500"))
+INSTRUMENTACION_REPETIDAS = int(os.environ.get("INSTRUMENTACION_REPETIDAS", "5"))
+
+# Segundos que viven los fragmentos {% cache %} de las tablas (caché
+# "fragmentos"); igual se invalidan antes con cualquier escritura (core.cache.sello).
+FRAGMENTOS_TIMEOUT = int(os.environ.get("FRAGMENTOS_TIMEOUT", str(60 * 10)))
+
+# API JSON (core.api): filas por página y segundos que se recuerda la
+# validez de un token (se olvida antes si el token se edita o elimina).
+API_POR_PAGINA = int(os.environ.get("API_POR_PAGINA", "500"))
+API_MAX_POR_PAGINA = int(os.environ.get("API_MAX_POR_PAGINA", "2000"))
+API_TOKEN_CACHE = int(os.environ.get("API_TOKEN_CACHE", "60"))
+
+# Dashboard: segundos máximos por componente (core.dashboard); lo que tarde
+# más se muestra como "no disponible".
+DASHBOARD_TIMEOUT = float(os.environ.get("DASHBOARD_TIMEOUT", "2.0"))
+# hilos (y como mucho conexiones a la BD) por proceso para esos componentes
+DASHBOARD_HILOS = int(os.environ.get("DASHBOARD_HILOS", "16"))
+
+# hilos de `manage.py run_ai_worker`
+AI_WORKERS = int(os.environ.get("AI_WORKERS", "2"))
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:20
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def poblar_saldos(apps, schema_editor):
+    Venta = apps.get_model('movimiento', 'Venta')
+    PagoVenta = apps.get_model('movimiento', 'PagoVenta')
+
+    pagos = {
+        r['venta_id']: r['s']
+        for r in PagoVenta.objects.values('venta_id').annotate(s=Sum('monto'))
+    }
+    ventas = []
+    for v in Venta.objects.only('id', 'cantidad', 'precio_unitario').iterator(chunk_size=2000):
+        v.monto_pagado = pagos.get(v.id) or Decimal('0.00')
+        v.saldo = (v.precio_unitario or Decimal('0.00')) * v.cantidad - v.monto_pagado
+        ventas.append(v)
+        if len(ventas) >= 2000:
+            Venta.objects.bulk_update(ventas, ['monto_pagado', 'saldo'])
+            ventas = []
+    Venta.objects.bulk_update(ventas, ['monto_pagado', 'saldo'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movimiento', '0004_venta_analisis_riesgo_ia'),
+        ('producto', '0006_producto_nombre_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='monto_pagado',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='saldo',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.RunPython(poblar_saldos, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(condition=models.Q(('saldo__gt', 0)), fields=['-fecha', '-id'], name='venta_saldo_abierto_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movimiento', '0005_venta_monto_pagado_saldo'),
+        ('producto', '0006_producto_nombre_id_idx'),
+    ]
+
+    operations = [
+        # primero los índices compuestos, después se quitan los de las FK que cubren
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['producto', 'tipo', 'anulada'], include=('cantidad', 'precio_unitario'), name='mov_producto_tipo_anulada_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(condition=models.Q(('anulada', False)), fields=['tipo', '-fecha'], name='mov_vigentes_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagoventa',
+            index=models.Index(fields=['venta', 'monto'], name='pagoventa_venta_monto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['a_plazos', '-fecha'], name='venta_aplazos_fecha_idx'),
+        ),
+        migrations.AlterField(
+            model_name='movimiento',
+            name='producto',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='producto.producto'),
+        ),
+        migrations.AlterField(
+            model_name='pagoventa',
+            name='venta',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='pagos', to='movimiento.venta'),
+        ),
+    ]
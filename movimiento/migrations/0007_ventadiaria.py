@@ -0,0 +1,85 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:40
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def poblar_resumen(apps, schema_editor):
+    Venta = apps.get_model('movimiento', 'Venta')
+    PagoVenta = apps.get_model('movimiento', 'PagoVenta')
+    VentaDiaria = apps.get_model('movimiento', 'VentaDiaria')
+    decimal = DecimalField(max_digits=18, decimal_places=2)
+
+    filas = {}
+
+    def fila(clave):
+        return filas.setdefault(clave, VentaDiaria(
+            dia=clave[0], producto_id=clave[1], proveedor_id=clave[2], tipo_id=clave[3],
+        ))
+
+    ventas = (
+        Venta.objects.annotate(dia=TruncDate('fecha'))
+        .values('dia', 'producto_id', 'producto__proveedor_id', 'producto__tipo_id')
+        .annotate(
+            n=Count('id'),
+            cant=Sum('cantidad'),
+            total=Sum(F('cantidad') * F('precio_unitario'), output_field=decimal),
+            costo=Sum(F('cantidad') * F('producto__costo_unitario'), output_field=decimal),
+        )
+        .order_by()
+    )
+    for r in ventas:
+        f = fila((r['dia'], r['producto_id'], r['producto__proveedor_id'], r['producto__tipo_id']))
+        f.ventas = r['n']
+        f.unidades = r['cant'] or 0
+        f.ingresos = r['total'] or Decimal('0.00')
+        f.costo = r['costo'] or Decimal('0.00')
+
+    pagos = (
+        PagoVenta.objects.annotate(dia=TruncDate('fecha'))
+        .values('dia', 'venta__producto_id', 'venta__producto__proveedor_id', 'venta__producto__tipo_id')
+        .annotate(total=Sum('monto'))
+        .order_by()
+    )
+    for r in pagos:
+        f = fila((r['dia'], r['venta__producto_id'], r['venta__producto__proveedor_id'], r['venta__producto__tipo_id']))
+        f.pagos = r['total'] or Decimal('0.00')
+
+    VentaDiaria.objects.bulk_create(filas.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movimiento', '0006_indices_consultas'),
+        ('producto', '0006_producto_nombre_id_idx'),
+        ('proveedor', '0001_initial'),
+        ('tipologia', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('ventas', models.IntegerField(default=0)),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('costo', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('pagos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='producto.producto')),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='proveedor.proveedor')),
+                ('tipo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='tipologia.tipojoya')),
+            ],
+            options={
+                'ordering': ['-dia'],
+                'indexes': [models.Index(fields=['proveedor', 'dia'], name='ventadiaria_proveedor_dia_idx')],
+                'constraints': [models.UniqueConstraint(fields=('dia', 'producto', 'proveedor', 'tipo'), name='uniq_venta_diaria')],
+            },
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.2 on 2026-10-18 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movimiento', '0007_ventadiaria'),
+        ('producto', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='movimiento',
+            name='mov_vigentes_fecha_idx',
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(condition=models.Q(('anulada', False)), fields=['tipo', '-fecha', '-id'], name='mov_vigentes_fecha_id_idx'),
+        ),
+    ]
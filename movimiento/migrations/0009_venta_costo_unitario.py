@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def poblar_costos(apps, schema_editor):
+    # Las ventas anteriores no guardaron su costo: se usa el actual del
+    # producto, que es el que ya sumaba el resumen diario.
+    Venta = apps.get_model('movimiento', 'Venta')
+    Producto = apps.get_model('producto', 'Producto')
+    Venta.objects.filter(costo_unitario__isnull=True).update(
+        costo_unitario=Subquery(Producto.objects.filter(pk=OuterRef('producto_id')).values('costo_unitario')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movimiento', '0008_indice_compras_fecha_id'),
+        ('producto', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='costo_unitario',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.RunPython(poblar_costos, migrations.RunPython.noop),
+    ]
@@ -9,10 +9,12 @@ class Movimiento(models.Model):
 
     tipo = models.CharField(max_length=3, choices=Tipo.choices, default=Tipo.ENTRADA)
 
+    # Sin índice propio: lo cubre mov_producto_tipo_anulada_idx (producto va primero).
     producto = models.ForeignKey(
         'producto.Producto',
         on_delete=models.PROTECT,
-        related_name='movimientos'
+        related_name='movimientos',
+        db_index=False,
     )
 
     cantidad = models.PositiveIntegerField(validators=[MinValueValidator(1)])
@@ -24,6 +26,24 @@ class Movimiento(models.Model):
 
     class Meta:
         ordering = ["-fecha"]
+        indexes = [
+            # stock por producto: filtra (producto, tipo, anulada) y suma cantidad/precio.
+            # En PostgreSQL las columnas de `include` hacen el índice cubriente.
+            models.Index(
+                fields=["producto", "tipo", "anulada"],
+                include=["cantidad", "precio_unitario"],
+                name="mov_producto_tipo_anulada_idx",
+            ),
+            # compra_list: compras vigentes paginadas por (-fecha, -id). El id va en el
+            # índice para que el desempate del cursor no necesite ordenar aparte.
+            # Parcial sobre anulada=False porque Django escribe ese filtro como
+            # `NOT anulada`, que SQLite no busca en un índice compuesto.
+            models.Index(
+                fields=["tipo", "-fecha", "-id"],
+                condition=models.Q(anulada=False),
+                name="mov_vigentes_fecha_id_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.producto} x{self.cantidad}"
@@ -40,14 +60,54 @@ class Venta(models.Model):
 
     cantidad = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     precio_unitario = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    # costo_unitario del producto al vender (lo fija save()); el resumen diario
+    # lo usa para que editar o borrar la venta reste lo mismo que sumó
+    costo_unitario = models.DecimalField(max_digits=12, decimal_places=2, null=True, editable=False)
 
     a_plazos = models.BooleanField(default=False)
     fecha = models.DateTimeField(auto_now_add=True)
     nota = models.CharField(max_length=255, blank=True)
     analisis_riesgo_ia = models.TextField(null=True)
 
+    # Mantenidos por core.signals al crear/editar/eliminar pagos (UPDATE con F()).
+    monto_pagado = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    saldo = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+
     class Meta:
         ordering = ["-fecha"]
+        indexes = [
+            # cuentas por cobrar: solo ventas con saldo abierto (índice parcial donde se soporte)
+            models.Index(
+                fields=["-fecha", "-id"],
+                condition=models.Q(saldo__gt=0),
+                name="venta_saldo_abierto_idx",
+            ),
+            models.Index(fields=["a_plazos", "-fecha"], name="venta_aplazos_fecha_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            if self.costo_unitario is None:
+                self.costo_unitario = self.producto.costo_unitario
+            self.saldo = self.total - (self.monto_pagado or Decimal("0.00"))
+            super().save(*args, **kwargs)
+            return
+
+        # monto_pagado solo lo mueven los pagos (UPDATE con F()): la copia en
+        # memoria puede ser anterior a un pago, así que no se escribe y el
+        # saldo se calcula en el UPDATE con el valor de la fila.
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            update_fields = {f.attname for f in self._meta.concrete_fields if not f.primary_key}
+        campos = set(update_fields) - {"monto_pagado", "saldo"}
+        cambia_total = bool({"cantidad", "precio_unitario"} & campos)
+        if cambia_total:
+            self.saldo = models.Value(self.total) - models.F("monto_pagado")
+            campos.add("saldo")
+        kwargs["update_fields"] = campos
+        super().save(*args, **kwargs)
+        if cambia_total:
+            self.refresh_from_db(fields=["monto_pagado", "saldo"])
 
     @property
     def total(self):
@@ -55,23 +115,23 @@ class Venta(models.Model):
 
     @property
     def pagado(self):
-        # suma de pagos
-        return sum((p.monto for p in self.pagos.all()), Decimal("0.00"))
+        return self.monto_pagado
 
     @property
     def deuda(self):
-        d = self.total - self.pagado
-        return d if d > 0 else Decimal("0.00")
+        return self.saldo if self.saldo > 0 else Decimal("0.00")
 
     def __str__(self):
         return f"Venta - {self.producto} x{self.cantidad}"
 
 
 class PagoVenta(models.Model):
+    # Sin índice propio: lo cubre pagoventa_venta_monto_idx.
     venta = models.ForeignKey(
         'movimiento.Venta',
         on_delete=models.CASCADE,
-        related_name='pagos'
+        related_name='pagos',
+        db_index=False,
     )
     monto = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(Decimal("0.01"))])
     fecha = models.DateTimeField(auto_now_add=True)
@@ -79,6 +139,45 @@ class PagoVenta(models.Model):
 
     class Meta:
         ordering = ["-fecha"]
+        indexes = [
+            # SUM(monto) por venta sin leer la tabla
+            models.Index(fields=["venta", "monto"], name="pagoventa_venta_monto_idx"),
+        ]
 
     def __str__(self):
         return f"Pago {self.monto} - {self.venta}"
+
+
+class VentaDiaria(models.Model):
+    """
+    Resumen de ventas y cobros por día y producto. Lo mantiene core.ventas_diarias
+    con cada venta o pago (UPDATE con F()) y se puede reconstruir por rango de
+    fechas con `manage.py reconstruir_ventas_diarias`.
+    """
+    dia = models.DateField()
+    producto = models.ForeignKey('producto.Producto', on_delete=models.CASCADE, related_name='ventas_diarias')
+    proveedor = models.ForeignKey('proveedor.Proveedor', on_delete=models.CASCADE, related_name='ventas_diarias')
+    tipo = models.ForeignKey('tipologia.TipoJoya', on_delete=models.CASCADE, related_name='ventas_diarias')
+
+    ventas = models.IntegerField(default=0)
+    unidades = models.IntegerField(default=0)
+    # SUM(cantidad * precio_unitario) de las ventas del día
+    ingresos = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal("0.00"))
+    # SUM(cantidad * costo_unitario) con el costo de cada venta al venderse
+    costo = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal("0.00"))
+    # pagos recibidos ese día (por la fecha del pago, no de la venta)
+    pagos = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        ordering = ["-dia"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dia", "producto", "proveedor", "tipo"], name="uniq_venta_diaria"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["proveedor", "dia"], name="ventadiaria_proveedor_dia_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} - {self.producto_id}: {self.unidades} u."
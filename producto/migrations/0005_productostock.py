@@ -0,0 +1,69 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, Sum, DecimalField
+
+
+def poblar_stock(apps, schema_editor):
+    Producto = apps.get_model('producto', 'Producto')
+    ProductoStock = apps.get_model('producto', 'ProductoStock')
+    Movimiento = apps.get_model('movimiento', 'Movimiento')
+    Venta = apps.get_model('movimiento', 'Venta')
+
+    compras = {
+        r['producto_id']: r
+        for r in Movimiento.objects.filter(tipo='IN', anulada=False).values('producto_id').annotate(
+            cant=Sum('cantidad'),
+            costo=Sum(F('cantidad') * F('precio_unitario'), output_field=DecimalField(max_digits=18, decimal_places=2)),
+        )
+    }
+    ventas = {
+        r['producto_id']: r['cant']
+        for r in Venta.objects.values('producto_id').annotate(cant=Sum('cantidad'))
+    }
+
+    filas = []
+    for pid, costo_unitario in Producto.objects.values_list('id', 'costo_unitario'):
+        c = compras.get(pid, {})
+        entrada = int(c.get('cant') or 0)
+        salida = int(ventas.get(pid) or 0)
+        stock = entrada - salida
+        filas.append(ProductoStock(
+            producto_id=pid,
+            cantidad_entrada=entrada,
+            cantidad_salida=salida,
+            stock=stock,
+            costo_entrada=c.get('costo') or Decimal('0.00'),
+            valor_costo=Decimal(max(stock, 0)) * (costo_unitario or Decimal('0.00')),
+        ))
+    ProductoStock.objects.bulk_create(filas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('producto', '0004_producto_precio_sugerido_ia'),
+        ('movimiento', '0004_venta_analisis_riesgo_ia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductoStock',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='existencia', serialize=False, to='producto.producto')),
+                ('cantidad_entrada', models.IntegerField(default=0)),
+                ('cantidad_salida', models.IntegerField(default=0)),
+                ('stock', models.IntegerField(default=0)),
+                ('costo_entrada', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('valor_costo', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Stock de producto',
+                'verbose_name_plural': 'Stock de productos',
+            },
+        ),
+        migrations.RunPython(poblar_stock, migrations.RunPython.noop),
+    ]
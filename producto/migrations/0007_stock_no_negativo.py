@@ -0,0 +1,50 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+NOTA_AJUSTE = 'Ajuste de inventario: stock negativo al activar la restricción de stock'
+
+
+def ajustar_stock_negativo(apps, schema_editor):
+    """
+    Productos vendidos de más antes de la restricción: se registra una entrada
+    de ajuste (precio 0, con nota) que deja su stock en 0, así el libro sigue
+    cuadrando con compras y ventas.
+    """
+    ProductoStock = apps.get_model('producto', 'ProductoStock')
+    Movimiento = apps.get_model('movimiento', 'Movimiento')
+
+    for fila in ProductoStock.objects.filter(stock__lt=0):
+        faltante = -fila.stock
+        Movimiento.objects.create(
+            tipo='IN',
+            producto_id=fila.producto_id,
+            cantidad=faltante,
+            precio_unitario=0,
+            nota=NOTA_AJUSTE,
+        )
+        ProductoStock.objects.filter(pk=fila.pk).update(
+            cantidad_entrada=F('cantidad_entrada') + faltante,
+            stock=0,
+            valor_costo=0,
+        )
+    if schema_editor.connection.vendor == 'postgresql':
+        # Las FK diferidas de los INSERT no deben quedar pendientes antes del ALTER TABLE.
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('producto', '0006_producto_nombre_id_idx'),
+        ('movimiento', '0007_ventadiaria'),
+    ]
+
+    operations = [
+        migrations.RunPython(ajustar_stock_negativo, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productostock',
+            constraint=models.CheckConstraint(condition=models.Q(('stock__gte', 0)), name='productostock_stock_no_negativo'),
+        ),
+    ]
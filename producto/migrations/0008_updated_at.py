@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('producto', '0007_stock_no_negativo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['updated_at'], name='producto_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productostock',
+            index=models.Index(fields=['updated_at'], name='productostock_updated_at_idx'),
+        ),
+    ]
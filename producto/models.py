@@ -21,12 +21,64 @@ class Producto(models.Model):
     activo = models.BooleanField(default=True)
     descripcion_ia = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["nombre"]
         constraints = [
             models.UniqueConstraint(fields=["nombre", "proveedor", "tipo"], name="uniq_producto_por_proveedor_tipo")
         ]
+        indexes = [
+            # orden + cursor de inventario (paginación keyset)
+            models.Index(fields=["nombre", "id"], name="producto_nombre_id_idx"),
+            # sincronización incremental de la API (updated_since)
+            models.Index(fields=["updated_at"], name="producto_updated_at_idx"),
+        ]
 
     def __str__(self):
         return f"{self.nombre} ({self.proveedor})"
+
+
+class ProductoStock(models.Model):
+    """
+    Existencias desnormalizadas de un producto.
+    Las mantiene core.stock en la misma transacción que cada compra/venta,
+    y se puede reconstruir con `manage.py reconstruir_stock`.
+    """
+    producto = models.OneToOneField(
+        'producto.Producto',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='existencia'
+    )
+
+    cantidad_entrada = models.IntegerField(default=0)
+    cantidad_salida = models.IntegerField(default=0)
+    stock = models.IntegerField(default=0)
+    # SUM(cantidad * precio_unitario) de compras vigentes, para el costo promedio
+    costo_entrada = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    # max(stock, 0) * producto.costo_unitario
+    valor_costo = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Stock de producto"
+        verbose_name_plural = "Stock de productos"
+        indexes = [
+            models.Index(fields=["updated_at"], name="productostock_updated_at_idx"),
+        ]
+        constraints = [
+            # Última barrera contra sobreventa: core.stock ya descuenta con un
+            # UPDATE condicional (WHERE stock >= cantidad).
+            models.CheckConstraint(condition=models.Q(stock__gte=0), name="productostock_stock_no_negativo"),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id}: {self.stock}"
+
+    @property
+    def costo_promedio(self):
+        if not self.cantidad_entrada:
+            return None
+        return self.costo_entrada / self.cantidad_entrada
@@ -6,6 +6,7 @@ class Proveedor(models.Model):
     nota = models.TextField(blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["nombre"]
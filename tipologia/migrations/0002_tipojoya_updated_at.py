@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tipologia', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tipojoya',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
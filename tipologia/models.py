@@ -4,6 +4,7 @@ class TipoJoya(models.Model):
     nombre = models.CharField(max_length=80, unique=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Tipo de joya"